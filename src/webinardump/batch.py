@@ -0,0 +1,143 @@
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+
+from .dumpers import Dumper
+from .net import RequestLimits
+from .utils import LOGGER
+
+
+class BatchJob:
+    """Dump job from a jobs file."""
+
+    __slots__ = ('dumper', 'id', 'params')
+
+    def __init__(self, *, id: str, dumper: str, params: dict[str, str]):
+        self.id = id
+        self.dumper = dumper
+        self.params = params
+
+    def __str__(self):
+        return f'{self.id} ({self.dumper})'
+
+
+def read_jobs(path: Path) -> list[BatchJob]:
+    """Reads jobs from a file.
+
+    Either JSON lines:
+        {"dumper": "webinar.ru", "url_video": "...", "url_playlist": "..."}
+
+    or CSV with a header:
+        dumper,url_video,url_playlist
+        webinar.ru,...,...
+
+    Optional `id` field allows to identify a job, otherwise its line number is used.
+    Other fields are passed to `Dumper.run()`.
+
+    :param path: Jobs file path.
+
+    """
+    lines = [line for line in path.read_text().splitlines() if line.strip()]
+
+    if lines and lines[0].lstrip().startswith('{'):
+        rows = [json.loads(line) for line in lines]
+
+    else:
+        rows = list(csv.DictReader(lines))
+
+    return [get_job(row, id_default=f'{idx}') for idx, row in enumerate(rows, 1)]
+
+
+def get_job(row: dict, *, id_default: str) -> BatchJob:
+    """Returns a job from a row of job fields. See `read_jobs()`.
+
+    :param row: Job fields.
+    :param id_default: Job identifier to use if the row has no `id` field.
+
+    """
+    params = {key: val for key, val in row.items() if val}
+    job_id = f"{params.pop('id', id_default)}"
+    dumper = params.pop('dumper', '')
+    assert dumper, f'No dumper is set for job {job_id}'
+    return BatchJob(id=job_id, dumper=dumper, params=params)
+
+
+class BatchRunner:
+    """Runs jobs from a jobs file concurrently, sharing request limits.
+
+    Jobs status is kept in a file next to the jobs file (`<jobs file>.status.json`),
+    so that a rerun skips finished jobs and resumes the others.
+
+    """
+
+    status_pending: str = 'pending'
+    status_running: str = 'running'
+    status_done: str = 'done'
+    status_failed: str = 'failed'
+
+    def __init__(
+        self,
+        jobs_file: Path,
+        *,
+        dumper_kwargs: dict,
+        jobs: int = 2,
+        limits: RequestLimits | None = None,
+    ):
+        """
+        :param jobs_file: Jobs file path. See `read_jobs()`.
+        :param dumper_kwargs: Keyword arguments to instantiate dumpers with.
+        :param jobs: Number of jobs to run concurrently. With more than one job,
+            the next job's manifest and playlist fetches overlap previous job's download.
+        :param limits: Request limits shared by all jobs.
+            By default, dumpers concurrency is used as a global limit.
+
+        """
+        self._jobs = read_jobs(jobs_file)
+        self._jobs_concurrent = jobs
+        self._dumper_kwargs = dumper_kwargs
+        self._limits = limits or RequestLimits(total=dumper_kwargs.get('concurrent', 10))
+        self._status_file = jobs_file.with_name(f'{jobs_file.name}.status.json')
+        self._lock = Lock()
+        self.status: dict[str, dict] = self._read_status()
+
+    def _read_status(self) -> dict[str, dict]:
+        status_file = self._status_file
+        return json.loads(status_file.read_text()) if status_file.exists() else {}
+
+    def _set_status(self, job: BatchJob, status: str, **info) -> None:
+        LOGGER.info(f'Job {job}: {status}')
+
+        with self._lock:
+            self.status[job.id] = {'status': status, **info}
+            self._status_file.write_text(json.dumps(self.status, ensure_ascii=False, indent=2))
+
+    def _run_job(self, job: BatchJob) -> None:
+        self._set_status(job, self.status_running)
+
+        try:
+            dumper = Dumper.get_by_alias(job.dumper)(**self._dumper_kwargs, limits=self._limits)
+            fpath = dumper.run(job.params)
+
+        except Exception as e:  # noqa: BLE001 failure of one job shouldn't stop the others
+            LOGGER.exception(f'Job {job} failed')
+            self._set_status(job, self.status_failed, error=f'{e!r}')
+
+        else:
+            self._set_status(job, self.status_done, path=f'{fpath}')
+
+    def run(self) -> dict[str, dict]:
+        """Runs jobs which are not done yet. Returns jobs status."""
+
+        jobs = [job for job in self._jobs if self.status.get(job.id, {}).get('status') != self.status_done]
+
+        LOGGER.info(f'Jobs to run: {len(jobs)} of {len(self._jobs)}')
+
+        for job in jobs:
+            self._set_status(job, self.status_pending)
+
+        with ThreadPoolExecutor(max_workers=self._jobs_concurrent) as executor:
+            executor.map(self._run_job, jobs)
+
+        return self.status
@@ -0,0 +1,165 @@
+import json
+import os
+from contextlib import suppress
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from time import time
+
+from requests import Response, Session
+from requests.structures import CaseInsensitiveDict
+
+from .utils import LOGGER
+
+
+class HttpCache:
+    """On-disk cache for small HTTP responses: pages, manifests and playlists.
+
+    Entries are keyed by request method, URL and body. Fresh entries (within TTL)
+    are returned without requests, stale ones are revalidated using ETag/Last-Modified.
+    Least recently used entries are evicted when cache size exceeds the limit.
+
+    Safe to share between threads and processes.
+
+    """
+
+    def __init__(self, path: Path, *, ttl: int = 3600, size_max: int = 32 * 1024 * 1024):
+        """
+        :param path: Cache directory.
+        :param ttl: Seconds an entry is considered fresh.
+        :param size_max: Max cache size in bytes.
+
+        """
+        path.mkdir(parents=True, exist_ok=True)
+
+        self._path = path
+        self._ttl = ttl
+        self._size_max = size_max
+        self._lock = Lock()
+
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+
+    def _get_entry_path(self, method: str, url: str, data: str | bytes | None) -> Path:
+        key = sha256(f'{method} {url}\n'.encode())
+        if data:
+            key.update(data.encode() if isinstance(data, str) else data)
+        return self._path / key.hexdigest()
+
+    @staticmethod
+    def _read(path: Path) -> tuple[dict, bytes] | None:
+        try:
+            meta, _, body = path.read_bytes().partition(b'\n')
+            meta = json.loads(meta)
+
+        except (OSError, ValueError):
+            return None
+
+        return meta, body
+
+    def _write(self, path: Path, meta: dict, body: bytes) -> None:
+        path_tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        path_tmp.write_bytes(json.dumps(meta).encode() + b'\n' + body)
+        path_tmp.replace(path)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+
+        for path in self._path.iterdir():
+            if path.suffix == '.tmp':
+                continue  # being written
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # removed by a concurrent process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size_total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if size_total <= self._size_max:
+                break
+
+            LOGGER.debug(f'Evicting cached {path.name}')
+            path.unlink(missing_ok=True)
+            size_total -= size
+
+    @staticmethod
+    def _make_response(meta: dict, body: bytes) -> Response:
+        response = Response()
+        response.status_code = 200
+        response.url = meta['url']
+        response.encoding = meta['encoding']
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response._content = body
+        return response
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def request(
+        self,
+        session: Session,
+        method: str,
+        url: str,
+        *,
+        data: str | bytes | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> Response:
+        """Performs a request using cached response where possible.
+
+        :param session: Session to perform the request with.
+        :param method: HTTP method.
+        :param url: URL.
+        :param data: Request body.
+        :param headers: Additional headers to send.
+
+        """
+        path = self._get_entry_path(method, url, data)
+        entry = self._read(path)
+        headers = {**(headers or {})}
+
+        if entry:
+            meta, body = entry
+
+            if time() - meta['stored'] < self._ttl:
+                LOGGER.debug(f'Using cached {url}')
+                self._count('hits')
+                with suppress(FileNotFoundError):
+                    os.utime(path)  # mark as recently used
+                return self._make_response(meta, body)
+
+            if etag := meta['headers'].get('etag'):
+                headers['If-None-Match'] = etag
+
+            if modified := meta['headers'].get('last-modified'):
+                headers['If-Modified-Since'] = modified
+
+        response = session.request(method, url, data=data, headers=headers)
+
+        if entry and response.status_code == 304:
+            LOGGER.debug(f'Cached {url} is not modified')
+            self._count('revalidated')
+            meta['stored'] = time()
+            self._write(path, meta, body)
+            return self._make_response(meta, body)
+
+        self._count('misses')
+
+        if response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', ''):
+            self._write(
+                path,
+                {
+                    'url': url,
+                    'stored': time(),
+                    'encoding': response.encoding,
+                    'headers': {
+                        key.lower(): val for key, val in response.headers.items()
+                        if key.lower() in {'content-type', 'etag', 'last-modified'}
+                    },
+                },
+                response.content,
+            )
+
+        return response
@@ -2,7 +2,9 @@ import argparse
 import logging
 from pathlib import Path
 
-from .dumpers import Dumper
+from .dumpers.registry import CONTAINERS, ENGINES, get_dumpers
+
+RATE_SUFFIXES = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
 
 
 def get_user_input(param: str, hint: str, *, choices: list[str] | None = None) -> str:
@@ -18,29 +20,172 @@ def get_user_input(param: str, hint: str, *, choices: list[str] | None = None) -
         return data
 
 
+def parse_shard(value: str) -> tuple[int, int]:
+    shard_num, _, shards_total = value.partition('/')
+
+    if not (shard_num.isdigit() and shards_total.isdigit() and 0 < int(shard_num) <= int(shards_total)):
+        raise argparse.ArgumentTypeError(f'Expected shard as K/N, got {value}')
+
+    return int(shard_num), int(shards_total)
+
+
+def parse_rate(value: str) -> float:
+    number = value.strip().upper()
+    multiplier = RATE_SUFFIXES.get(number[-1:], 1)
+
+    if multiplier > 1:
+        number = number[:-1]
+
+    try:
+        return float(number) * multiplier
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Expected rate as a number with K, M or G suffix, got {value}') from None
+
+
+def parse_host_limit(value: str) -> tuple[str, tuple[float, float]]:
+    host, _, limits = value.partition('=')
+    rate, _, requests = limits.partition(':')
+
+    if not (host and limits) or (requests and not requests.replace('.', '', 1).isdigit()):
+        raise argparse.ArgumentTypeError(f'Expected host limit as HOST=RATE[:RPS], got {value}')
+
+    return host.strip().lower(), (parse_rate(rate) if rate else 0, float(requests or 0))
+
+
 def main():
     parser = argparse.ArgumentParser(prog='webinardump')
     parser.add_argument('-t', '--target', type=Path, default=Path(), help='Directory to dump to')
     parser.add_argument('--timeout', type=int, default=3, help='Request timeout')
     parser.add_argument('--rmax', type=int, default=10, help='Max concurrent requests number')
+    parser.add_argument('--rmin', type=int, default=1, help='Min concurrent requests number (for --adaptive)')
+    parser.add_argument(
+        '--adaptive', help='Adapt concurrent requests number to server responsiveness', action='store_true')
+    parser.add_argument(
+        '--engine', choices=ENGINES, default='thread', help='Download engine. async requires httpx')
+    parser.add_argument(
+        '--session-per-worker', help='Use separate HTTP session for each download thread', action='store_true')
+    parser.add_argument(
+        '--container', choices=CONTAINERS, default='mp4', help='Video container. ts is kept without remuxing')
+    parser.add_argument('--live', help='Record live stream until it ends', action='store_true')
+    parser.add_argument('--pipelined', help='Concatenate video while downloading', action='store_true')
+    parser.add_argument('--batch', type=Path, help='Jobs file to run non-interactively (JSON lines or CSV)')
+    parser.add_argument('--serve', help='Run as a daemon accepting jobs at host:port or Unix socket path')
+    parser.add_argument('--jobs', type=int, default=2, help='Number of batch or daemon jobs to run concurrently')
+    parser.add_argument(
+        '--rhost', type=int, default=0, help='Max concurrent requests number per host in batch or daemon')
+    parser.add_argument('--shards', type=int, default=0, help='Number of processes to split download between')
+    parser.add_argument('--shard', type=parse_shard, help='Download only this part of video (K/N)')
+    parser.add_argument('--metrics-prom', type=Path, help='File to write metrics into in Prometheus text format')
+    parser.add_argument('--cache', type=Path, help='Directory to cache pages, manifests and playlists in')
+    parser.add_argument('--cache-ttl', type=int, default=3600, help='Seconds to use cached responses without checks')
+    parser.add_argument('--store', type=Path, help='Directory of chunk store shared by runs')
+    parser.add_argument('--store-max', type=float, default=10, help='Max chunk store size in GiB')
+    parser.add_argument('--bw', type=parse_rate, default=0, help='Max download rate, bytes/s (e.g. 512K, 10M)')
+    parser.add_argument('--rps', type=float, default=0, help='Max requests per second')
+    parser.add_argument(
+        '--host-limit',
+        type=parse_host_limit,
+        action='append',
+        default=[],
+        help='Max download rate and requests per second for a host: HOST=RATE[:RPS]. * - for each host',
+    )
+    parser.add_argument(
+        '--hedge',
+        type=float,
+        default=0,
+        help='Latency percentile (0-1) after which a slow chunk request is duplicated',
+    )
+    parser.add_argument('--hedge-budget', type=float, default=0.05, help='Max share of extra requests for --hedge')
+    parser.add_argument('--retries', type=int, default=4, help='Max retries of a failed chunk')
+    parser.add_argument(
+        '--deadline', type=float, default=0, help='Minutes to download video in. Lower quality is chosen if needed')
+    parser.add_argument(
+        '--bitrate-max', type=parse_rate, default=0, help='Max video bitrate to choose, bits/s (e.g. 2.5M)')
     parser.add_argument('--debug', help='Show debug information', action='store_true')
 
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO, format='%(levelname)-8s: %(message)s')
 
+    dumper_kwargs = {
+        'target_dir': args.target,
+        'timeout': args.timeout,
+        'concurrent': args.rmax,
+        'pipelined': args.pipelined,
+        'engine': args.engine,
+        'session_per_worker': args.session_per_worker,
+        'adaptive': args.adaptive,
+        'concurrent_min': args.rmin,
+        'metrics_prometheus': args.metrics_prom,
+        'container': args.container,
+        'cache_dir': args.cache,
+        'cache_ttl': args.cache_ttl,
+        'live': args.live,
+        'store_dir': args.store,
+        'store_size_max': int(args.store_max * 1024 ** 3),
+        'hedge': args.hedge,
+        'hedge_budget': args.hedge_budget,
+        'chunk_retries': args.retries,
+        'deadline': args.deadline * 60,
+        'bitrate_max': int(args.bitrate_max),
+    }
+
+    if args.bw or args.rps or args.host_limit:
+        from .net import RateLimiter  # noqa: PLC0415
+
+        # shared by all batch and daemon jobs
+        dumper_kwargs['rate_limiter'] = RateLimiter(
+            bytes_per_second=args.bw,
+            requests_per_second=args.rps,
+            hosts=dict(args.host_limit),
+        )
+
+    if args.batch:
+        from .batch import BatchRunner  # noqa: PLC0415
+        from .net import RequestLimits  # noqa: PLC0415
+
+        status = BatchRunner(
+            args.batch,
+            dumper_kwargs=dumper_kwargs,
+            jobs=args.jobs,
+            limits=RequestLimits(total=args.rmax, per_host=args.rhost),
+        ).run()
+
+        failed = [job_id for job_id, info in status.items() if info['status'] != BatchRunner.status_done]
+        if failed:
+            raise SystemExit(f'Failed jobs: {", ".join(failed)}')
+        return
+
+    if args.serve:
+        from .daemon import Daemon  # noqa: PLC0415
+        from .net import RequestLimits  # noqa: PLC0415
+
+        Daemon(
+            dumper_kwargs=dumper_kwargs,
+            jobs=args.jobs,
+            limits=RequestLimits(total=args.rmax, per_host=args.rhost),
+        ).serve(args.serve)
+        return
+
     dumper_choices = []
     print('Available dumpers:')
 
-    for idx, dumper in enumerate(Dumper.registry, 1):
+    dumpers = get_dumpers()
+
+    for idx, dumper in enumerate(dumpers, 1):
         print(f'{idx} — {dumper.title}')
         dumper_choices.append(f'{idx}')
 
     chosen = get_user_input('', 'Select dumper number', choices=dumper_choices)
 
-    dumper = Dumper.registry[int(chosen)-1](
-        target_dir=args.target,
-        timeout=args.timeout,
-        concurrent=args.rmax,
-    )
+    dumper_cls = dumpers[int(chosen)-1].load()
+
+    if args.shards > 1:
+        from .shard import run_sharded  # noqa: PLC0415
+
+        params = dumper_cls(**dumper_kwargs)._get_args(get_param_hook=get_user_input)
+        run_sharded(dumper_cls, dumper_kwargs=dumper_kwargs, params=params, shards=args.shards)
+        return
+
+    dumper = dumper_cls(**dumper_kwargs, shard=args.shard)
     dumper.run(get_user_input)
@@ -0,0 +1,275 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from pathlib import Path
+from socketserver import BaseServer, ThreadingMixIn, UnixStreamServer
+from threading import Lock
+from time import time
+
+from .batch import BatchJob, get_job
+from .dumpers import Dumper
+from .dumpers.registry import BUILTIN
+from .net import RequestLimits
+from .utils import LOGGER
+
+
+class Daemon:
+    """Long-running service accepting dump jobs over HTTP (TCP or Unix socket).
+
+    Dumper instances are kept between jobs (an idle one is reused by the next job for
+    the same dumper), so that their HTTP sessions keep connections open and jobs start
+    without imports, DNS lookups and TLS handshakes. All jobs share a worker pool and request limits.
+
+    API (JSON):
+        POST /jobs  {"dumper": "...", "id": "...", <params as for `Dumper.run()`>} -> job
+        GET /jobs -> jobs by identifier
+        GET /jobs/<id> -> job status, progress and metrics
+        GET /metrics -> number of jobs by status and counters summed over jobs
+
+    """
+
+    status_pending: str = 'pending'
+    status_running: str = 'running'
+    status_done: str = 'done'
+    status_failed: str = 'failed'
+
+    def __init__(
+        self,
+        *,
+        dumper_kwargs: dict,
+        jobs: int = 2,
+        limits: RequestLimits | None = None,
+    ):
+        """
+        :param dumper_kwargs: Keyword arguments to instantiate dumpers with.
+        :param jobs: Number of jobs to run concurrently.
+        :param limits: Request limits shared by all jobs.
+            By default, dumpers concurrency is used as a global limit.
+
+        """
+        self._dumper_kwargs = dumper_kwargs
+        self._limits = limits or RequestLimits(total=dumper_kwargs.get('concurrent', 10))
+        self._executor = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix='webinardump-job')
+        self._lock = Lock()
+        self._ids = count(1)
+        self._idle: dict[type[Dumper], list[Dumper]] = {}
+        self._dumpers: dict[str, Dumper] = {}  # by job identifier
+        self.status: dict[str, dict] = {}
+
+    def _set_status(self, job: BatchJob, status: str, **info) -> None:
+        LOGGER.info(f'Job {job}: {status}')
+
+        with self._lock:
+            self.status[job.id] = {**self.status.get(job.id, {}), 'status': status, **info}
+
+    def _acquire(self, job: BatchJob, dumper_cls: type[Dumper]) -> Dumper:
+        with self._lock:
+            idle = self._idle.get(dumper_cls)
+            dumper = idle.pop() if idle else None
+
+        if dumper is None:
+            dumper = dumper_cls(**self._dumper_kwargs, limits=self._limits)
+
+        with self._lock:
+            self._dumpers[job.id] = dumper
+
+        return dumper
+
+    def _release(self, job: BatchJob) -> None:
+        with self._lock:
+            dumper = self._dumpers.pop(job.id, None)
+            if dumper is None:
+                return  # failed to instantiate
+
+            # final metrics are kept by the job, since the dumper is reused
+            self.status[job.id]['metrics'] = dumper.metrics.summary()
+            self._idle.setdefault(type(dumper), []).append(dumper)
+
+    def _run_job(self, job: BatchJob, dumper_cls: type[Dumper]) -> None:
+        self._set_status(job, self.status_running, started=time())
+
+        try:
+            fpath = self._acquire(job, dumper_cls).run(job.params)
+
+        except Exception as e:  # noqa: BLE001 failure of one job shouldn't stop the others
+            LOGGER.exception(f'Job {job} failed')
+            self._set_status(job, self.status_failed, error=f'{e!r}', finished=time())
+
+        else:
+            self._set_status(job, self.status_done, path=f'{fpath}', finished=time())
+
+        finally:
+            self._release(job)
+
+    def submit(self, fields: dict) -> dict:
+        """Schedules a job. Returns job info.
+
+        :param fields: Job fields: `dumper`, optional `id` and dumper parameters. See `batch.read_jobs()`.
+
+        """
+        job = get_job(fields, id_default=f'{next(self._ids)}')
+        dumper_cls = Dumper.get_by_alias(job.dumper)
+
+        with self._lock:
+            status = self.status.get(job.id, {}).get('status')
+            if status in {self.status_pending, self.status_running}:
+                raise ValueError(f'Job {job.id} is already {status}')
+
+            self.status[job.id] = {'status': self.status_pending, 'dumper': dumper_cls.title, 'submitted': time()}
+
+        LOGGER.info(f'Job {job}: {self.status_pending}')
+        self._executor.submit(self._run_job, job, dumper_cls)
+
+        return self.get_job(job.id)
+
+    def get_job(self, job_id: str) -> dict | None:
+        """Returns job info: status, progress and metrics. None if there is no such job.
+
+        :param job_id: Job identifier.
+
+        """
+        with self._lock:
+            info = self.status.get(job_id)
+
+            if info is None:
+                return None
+
+            info = dict(info)
+            dumper = self._dumpers.get(job_id)
+
+        if dumper is not None:
+            info['metrics'] = dumper.metrics.summary()
+
+        counters = info.get('metrics', {}).get('counters', {})
+
+        if total := counters.get('chunks_total'):
+            done = sum(counters.get(name, 0) for name in ('chunks_downloaded', 'chunks_skipped', 'chunks_stored'))
+            info['progress'] = round(done / total, 3)
+
+        return {'id': job_id, **info}
+
+    def get_jobs(self) -> dict[str, dict]:
+        """Returns info of all jobs by their identifiers. See `get_job()`."""
+
+        with self._lock:
+            job_ids = list(self.status)
+
+        return {job_id: self.get_job(job_id) for job_id in job_ids}
+
+    def get_metrics(self) -> dict:
+        """Returns number of jobs by status and metrics counters summed over all jobs."""
+
+        jobs = {}
+        counters = {}
+
+        for info in self.get_jobs().values():
+            jobs[info['status']] = jobs.get(info['status'], 0) + 1
+
+            for name, val in info.get('metrics', {}).get('counters', {}).items():
+                counters[name] = counters.get(name, 0) + val
+
+        return {'jobs': jobs, 'counters': counters}
+
+    def serve(self, address: str) -> None:
+        """Serves the API until interrupted.
+
+        :param address: host:port to listen on, or a Unix socket path.
+
+        """
+        for dumper in BUILTIN:
+            dumper.load()  # so that the first job doesn't wait for imports
+
+        server = get_server(address, daemon=self)
+        LOGGER.info(f'Accepting jobs at {address} ...')
+
+        try:
+            server.serve_forever()
+
+        finally:
+            server.server_close()
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        """Waits for running jobs and drops pending ones."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """Daemon API request handler."""
+
+    def __init__(self, *args, daemon: Daemon, **kwargs):
+        self.daemon = daemon
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format: str, *args) -> None:
+        LOGGER.debug(format % args)  # client address is meaningless for a Unix socket
+
+    def _respond(self, data: dict, *, status: int = 200) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', f'{len(body)}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        daemon = self.daemon
+        path = self.path.rstrip('/')
+
+        if path == '/jobs':
+            self._respond(daemon.get_jobs())
+
+        elif path.startswith('/jobs/'):
+            job = daemon.get_job(path.removeprefix('/jobs/'))
+            self._respond(job or {'error': 'Unknown job'}, status=200 if job else 404)
+
+        elif path == '/metrics':
+            self._respond(daemon.get_metrics())
+
+        else:
+            self._respond({'error': 'Not found'}, status=404)
+
+    def do_POST(self) -> None:
+        if self.path.rstrip('/') != '/jobs':
+            self._respond({'error': 'Not found'}, status=404)
+            return
+
+        try:
+            fields = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+            assert isinstance(fields, dict), 'Expected job fields as an object'
+            job = self.daemon.submit(fields)
+
+        except (ValueError, LookupError, AssertionError) as e:
+            self._respond({'error': f'{e}'}, status=400)
+
+        else:
+            self._respond(job, status=202)
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """HTTP server listening on a Unix socket."""
+
+    daemon_threads = True
+
+
+def get_server(address: str, *, daemon: Daemon) -> BaseServer:
+    """Returns API server bound to the address.
+
+    :param address: host:port to listen on, or a Unix socket path.
+    :param daemon: Daemon to serve.
+
+    """
+    def handler(*args) -> DaemonRequestHandler:
+        return DaemonRequestHandler(*args, daemon=daemon)
+
+    host, _, port = address.rpartition(':')
+
+    if port.isdigit():
+        return ThreadingHTTPServer((host or '127.0.0.1', int(port)), handler)
+
+    path = Path(address)
+    if path.is_socket():
+        path.unlink()  # left by a previous run
+
+    return ThreadingUnixHTTPServer(f'{path}', handler)
@@ -1,9 +1,29 @@
-from .base import Dumper
-from .webinarru import WebinarRu
-from .yadisk import YandexDisk
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .base import Dumper
+    from .webinarru import WebinarRu
+    from .yadisk import YandexDisk
 
 __all__ = [
     'Dumper',
     'WebinarRu',
     'YandexDisk',
 ]
+
+_modules = {
+    'Dumper': 'base',
+    'WebinarRu': 'webinarru',
+    'YandexDisk': 'yadisk',
+}
+
+
+def __getattr__(name: str):
+    # dumpers are imported on demand, not to import network and HTML stacks on CLI startup
+    module = _modules.get(name)
+
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    return getattr(import_module(f'.{module}', __name__), name)
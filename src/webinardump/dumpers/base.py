@@ -1,14 +1,20 @@
+import asyncio
 import json
+import os
+import re
 import shutil
-from collections.abc import Callable
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from contextlib import chdir
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext, suppress
 from datetime import UTC, datetime
+from functools import partial
+from itertools import islice
 from pathlib import Path
 from random import choice
-from threading import Lock
-from time import sleep
-from typing import ClassVar
+from socket import gethostname
+from threading import Thread
+from time import monotonic, sleep
+from typing import IO, TYPE_CHECKING, ClassVar, TypeVar
 from urllib.parse import quote, unquote
 
 import requests
@@ -16,7 +22,49 @@ from bs4 import BeautifulSoup
 from requests import Session
 from requests.adapters import HTTPAdapter, Retry
 
-from ..utils import LOGGER, call, get_files_sorted
+from ..cache import HttpCache
+from ..metrics import Metrics
+from ..net import (
+    ConcurrencyController,
+    HedgePolicy,
+    Race,
+    RateLimiter,
+    RequestLimits,
+    RetryScheduler,
+    SessionPool,
+    is_congestion,
+    is_connection_failure,
+    is_transient,
+)
+from ..playlist import Playlist, RangeRequest, Segment, parse_playlist, plan_range_requests
+from ..store import ChunkStore
+from ..utils import (
+    LOGGER,
+    BackgroundFeed,
+    ChunkSequencer,
+    ProgressJournal,
+    QueueSink,
+    call,
+    call_piped,
+    concat_files,
+    get_files_sorted,
+    get_progress,
+    get_shard_range,
+    is_lock_stale,
+    split_stream,
+)
+from ..variants import ThroughputHistory, VariantCandidate, VariantPolicy
+from .registry import CONTAINERS, ENGINES, get_dumper
+
+if TYPE_CHECKING:
+    import httpx
+
+T = TypeVar('T')
+
+RE_SCRIPT_OPEN = re.compile(r'<script\b[^>]*>\s*', re.IGNORECASE)
+RE_SCRIPT_CLOSE = re.compile(r'</script', re.IGNORECASE)
+RE_CHUNK_FILE = re.compile(r'\d+_(?!.*\.(?:hedge|tmp)$).+')  # see `_chunk_path()`
+RE_CHUNK_FILE_TEMP = re.compile(r'(\d+)_.+\.(?:hedge|tmp)')  # chunk being written, e.g. by a hedge
 
 
 class Dumper:
@@ -39,32 +87,171 @@ class Dumper:
         'Accept-Encoding': 'gzip, deflate, sdch, br',
     }
 
-    _media_ext: ClassVar[set[str]] = {'.ts', '.m4s'}
+    _media_ext: ClassVar[set[str]] = {'.ts', '.m4s', '.aac'}
+
+    engines: ClassVar[tuple[str, ...]] = ENGINES
+
+    containers: ClassVar[tuple[str, ...]] = CONTAINERS
 
     registry: ClassVar[list[type['Dumper']]] = []
+    """Deprecated. Dumper subclasses imported so far. Third-party dumpers are to be
+    registered with entry points instead, see `registry.get_dumpers()`.
+
+    """
 
     def __init_subclass__(cls):
         super().__init_subclass__()
         cls.registry.append(cls)
 
-    def __init__(self, *, target_dir: Path, timeout: int = 3, concurrent: int = 10, sleepy: bool = False) -> None:
+    def __init__(
+        self,
+        *,
+        target_dir: Path,
+        timeout: int = 3,
+        concurrent: int = 10,
+        sleepy: bool = False,
+        pipelined: bool = False,
+        engine: str = 'thread',
+        session_per_worker: bool = False,
+        adaptive: bool = False,
+        concurrent_min: int = 1,
+        limits: RequestLimits | None = None,
+        rate_limiter: RateLimiter | None = None,
+        shard: tuple[int, int] | None = None,
+        metrics_prometheus: Path | None = None,
+        container: str = 'mp4',
+        cache_dir: Path | None = None,
+        cache_ttl: int = 3600,
+        live: bool = False,
+        store_dir: Path | None = None,
+        store_size_max: int = 10 * 1024 ** 3,
+        hedge: float = 0,
+        hedge_budget: float = 0.05,
+        chunk_retries: int = 4,
+        deadline: float = 0,
+        bitrate_max: int = 0,
+    ) -> None:
+        """
+        :param target_dir: Directory to dump to.
+        :param timeout: Request timeout.
+        :param concurrent: Max concurrent requests number.
+        :param sleepy: Pause randomly after each chunk download.
+        :param pipelined: Concatenate video while downloading (no intermediate chunk files).
+            Note that interrupted pipelined download can not be resumed.
+        :param engine: Download engine: thread (default) or async (requires httpx).
+        :param session_per_worker: Keep a separate HTTP session for each download thread
+            instead of sharing one.
+        :param adaptive: Adapt concurrent requests number between `concurrent_min` and `concurrent`
+            to server latency and throttling.
+        :param concurrent_min: Min concurrent requests number for adaptive mode.
+        :param limits: Request limits shared with other dumpers (e.g. in batch mode).
+        :param rate_limiter: Bandwidth and request rate limits shared with other dumpers.
+        :param shard: Download only the given part of video chunks: (shard number starting from 1, shards total).
+            Shards may run in different processes or on different hosts sharing target directory.
+            The shard finishing last concatenates the video.
+        :param metrics_prometheus: File to write download metrics into in Prometheus text format
+            (e.g. for node exporter textfile collector). JSON metrics are always written next to the video.
+        :param container: Resulting video container: mp4 (default) or ts.
+            ts chunks are kept as is in ts container (no remuxing with ffmpeg).
+            m4s chunks always result in (fragmented) mp4.
+        :param cache_dir: Directory to cache pages, manifests and playlists in,
+            so that reruns and resumes do not fetch them again.
+        :param cache_ttl: Seconds cached responses are used without revalidation.
+        :param live: Record a live stream: poll the playlist and download new chunks
+            as they appear until the stream ends. Interrupted recording can not be resumed.
+        :param store_dir: Directory of chunk store shared by runs and titles:
+            chunks already in the store are linked into the dump instead of being downloaded.
+            Not used in pipelined mode.
+        :param store_size_max: Max chunk store size in bytes.
+        :param hedge: Latency percentile (0-1) of a host after which a duplicate of a slow chunk request
+            is sent, and whichever response comes first is taken. 0 - do not hedge requests.
+            Used by thread engine for chunks not addressed by byte ranges.
+        :param hedge_budget: Max share of extra requests made by hedging in a run.
+        :param chunk_retries: Max retries of a chunk failed transiently (throttling, 5xx, timeouts).
+            Chunks are retried with backoff while other ones are downloaded. Chunks failed finally
+            are listed in failed.json in the chunks directory, and the download fails after all other
+            chunks are downloaded. Pipelined download fails on the first chunk failure.
+        :param deadline: Seconds to download video in. If set, the best video variant (quality)
+            expected to be downloaded in time is chosen, judging by its bitrate and download throughput.
+            Throughput is measured in past runs (kept in cache_dir) or by downloading the first chunks.
+        :param bitrate_max: Max bitrate of video variant to choose, bits/s. 0 - no limit.
+
+        """
         self._target_dir = target_dir
         self._timeout = timeout
         self._concurrent = concurrent
+        self._concurrent_min = concurrent_min
+        self._adaptive = adaptive
+        self._limits = limits
+        self._rate_limiter = rate_limiter
+
+        if shard:
+            shard_num, shards_total = shard
+            assert 1 <= shard_num <= shards_total, f'Invalid shard: {shard_num}/{shards_total}'
+            assert not pipelined, 'Sharded download can not be pipelined'
+
+        if live:
+            assert not shard, 'Live recording can not be sharded'
+            assert not pipelined, 'Live recording can not be pipelined'
+            assert engine == 'thread', 'Live recording requires thread engine'
+
+        self._shard = shard
+        self._live = live
         self._user_input_map = self._user_input_map or {}
-        self._session = self._get_session()
+        self._sessions = SessionPool(
+            partial(self._get_session, pool_size=1 if session_per_worker else concurrent),
+            per_worker=session_per_worker,
+        )
         self._sleepy = sleepy
+        self._pipelined = pipelined
+        self._metrics_prometheus = metrics_prometheus
+        self._cache = HttpCache(cache_dir, ttl=cache_ttl) if cache_dir else None
+        self._store = ChunkStore(store_dir, size_max=store_size_max) if store_dir else None
+        self._hedging = HedgePolicy(percentile=hedge, budget=hedge_budget) if hedge else None
+        self._chunk_retries = chunk_retries
+        self._variant_policy = (
+            VariantPolicy(deadline=deadline, bitrate_max=bitrate_max) if deadline or bitrate_max else None)
+        self._throughput = ThroughputHistory(cache_dir / 'throughput.json') if cache_dir else None
+
+        self.metrics = Metrics()
+        """Metrics of the last run."""
+
+        self._sink: IO[bytes] | None = None  # set while streaming
+
+        assert engine in self.engines, f'Unsupported engine: {engine}'
+        self._engine = engine
+
+        assert container in self.containers, f'Unsupported container: {container}'
+        self._container = container
 
     def __str__(self):
         return self.title
 
-    def _get_session(self) -> Session:
-        # todo при ошибках сессия в нитях блокируется. можно попробовать несколько сессий
+    @classmethod
+    def get_by_alias(cls, alias: str) -> type['Dumper']:
+        """Returns a registered dumper class by its title, class name
+        or number (starting from 1) in the registry. See `registry.get_dumper()`.
+
+        :param alias: Dumper alias.
+
+        """
+        return get_dumper(alias)
+
+    @property
+    def _session(self) -> Session:
+        return self._sessions.get()
+
+    def _get_session(self, *, pool_size: int = 10) -> Session:
+        """Returns a new HTTP session.
+
+        :param pool_size: Max number of connections to keep per host.
+
+        """
         session = requests.Session()
         session.headers = self._headers
         retries = Retry(total=3, backoff_factor=0.1, status_forcelist=[500])
-        session.mount('http://', HTTPAdapter(max_retries=retries))
-        session.mount('https://', HTTPAdapter(max_retries=retries))
+        session.mount('http://', HTTPAdapter(max_retries=retries, pool_maxsize=pool_size))
+        session.mount('https://', HTTPAdapter(max_retries=retries, pool_maxsize=pool_size))
         return session
 
     def _get_args(self, *, get_param_hook: Callable[[str, str], str]) -> dict:
@@ -75,8 +262,136 @@ class Dumper:
 
         return input_data
 
-    def _chunks_get_list(self, url: str, *, url_prefix: str = '') -> list[str]:
-        """Get video chunks names from playlist file at URL.
+    def _chunks_get_segments(self, url: str, *, url_prefix: str = '') -> list[Segment]:
+        """Get video chunks from playlist file at URL. See `_chunks_get_tracks`.
+
+        :param url: File URL.
+        :param url_prefix: File URL prefix.
+
+        """
+        return self._chunks_get_tracks(url, url_prefix=url_prefix)[0]
+
+    def _variant_select(
+        self,
+        candidates: list[VariantCandidate],
+        *,
+        headers: dict[str, str] | None = None,
+    ) -> VariantCandidate:
+        """Returns the best video variant fitting variant policy (see `VariantPolicy`).
+        Variants are tried from the best one, so that download switches down before it is started.
+        The worst variant is returned if none fits.
+
+        Advertised bitrate is used if known, and throughput of the host is taken from past runs.
+        Otherwise, the first chunks of a variant are downloaded to measure them:
+        throughput is only measured if the policy has a deadline.
+
+        :param candidates: Variants ordered from the best one.
+        :param headers: Additional headers to send for chunks.
+
+        """
+        policy = self._variant_policy
+
+        if policy is None or len(candidates) < 2:
+            return candidates[0]
+
+        throughput = self._throughput.get(candidates[0].url) if self._throughput else 0
+
+        for candidate in candidates[:-1]:
+            bitrate = candidate.bitrate
+            segments = self._chunks_get_segments(candidate.url)
+            duration = sum(segment.duration for segment in segments)
+            size = bitrate / 8 * duration
+
+            if not bitrate or (policy.deadline and not (throughput and size)):
+                probed = segments[:policy.probe]
+
+                try:
+                    probed_size, probed_duration, elapsed = self._variant_probe(
+                        candidate.url.rpartition('/')[0], probed, headers=headers)
+
+                except requests.RequestException as e:
+                    LOGGER.warning(f'Unable to probe variant {candidate}: {e}')
+                    break  # as if it fits: download will tell
+
+                throughput = throughput or (probed_size / elapsed if elapsed else 0)
+                bitrate = bitrate or (probed_size * 8 / probed_duration if probed_duration else 0)
+                size = bitrate / 8 * duration or (probed_size / len(probed) * len(segments) if probed else 0)
+
+            LOGGER.debug(
+                f'Variant {candidate}: {round(bitrate / 1000)} kbit/s, {round(size / 1024 ** 2)} MiB, '
+                f'throughput {round(throughput / 1024)} KiB/s')
+
+            if policy.fits(candidate, bitrate=bitrate, size=size, throughput=throughput, elapsed=self.metrics.elapsed):
+                break
+
+            LOGGER.info('Switching to a lower quality variant ...')
+
+        else:
+            candidate = candidates[-1]
+
+        LOGGER.info(f'Chosen variant: {candidate}')
+        return candidate
+
+    def _variant_probe(
+        self,
+        url_root: str,
+        segments: list[Segment],
+        *,
+        headers: dict[str, str] | None = None,
+    ) -> tuple[int, float, float]:
+        """Downloads the given chunks concurrently.
+        Returns their size in bytes, their duration and seconds spent.
+
+        :param url_root: URL to prepend to chunk names.
+        :param segments: Chunks to download.
+        :param headers: Additional headers to send.
+
+        """
+        rate_limiter = self._rate_limiter
+
+        def get(session: Session, *, url: str, headers_segment: dict[str, str]) -> int:
+            response = session.get(url, headers=headers_segment, timeout=self._timeout)
+            response.raise_for_status()
+            return len(response.content)
+
+        def fetch(segment: Segment) -> int:
+            url = self._chunk_url(url_root, segment.uri)
+            headers_segment = dict(headers or {})
+
+            if segment.byterange:
+                length, offset = segment.byterange
+                headers_segment['Range'] = f'bytes={offset}-{offset + length - 1}'
+
+            size = self._request_guarded(
+                url, controller=controller, func=partial(get, url=url, headers_segment=headers_segment))
+
+            if rate_limiter:
+                rate_limiter.received(url, size)
+
+            self.metrics.inc('bytes_probed', size)
+            return size
+
+        if not segments:
+            return 0, 0, 0
+
+        controller = self._get_controller(concurrent=min(len(segments), self._concurrent))
+
+        started = monotonic()
+
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            size = sum(executor.map(fetch, segments))
+
+        return size, sum(segment.duration for segment in segments), monotonic() - started
+
+    def _chunks_get_tracks(
+        self,
+        url: str,
+        *,
+        url_prefix: str = '',
+        headers: dict[str, str] | None = None,
+    ) -> tuple[list[Segment], list[Segment]]:
+        """Get video chunks and separate audio chunks (if any) from playlist file at URL.
+        Initialization sections are returned as separate chunks.
 
         * Links to other playlists:
             #EXTM3U
@@ -98,48 +413,305 @@ class Dumper:
 
         :param url: File URL.
         :param url_prefix: File URL prefix.
+        :param headers: Additional headers to send for chunks (if probed to choose a variant).
 
         """
         LOGGER.info(f'Getting video chunks from playlist {url} ...')
 
-        sub_playlist = self._get_response_simple(url)
-        playlists = []
-        chunk_lists = []
-        media_ext = self._media_ext
+        playlist = parse_playlist(self._get_response_simple(url))
 
-        for line in sub_playlist.splitlines():
-            line = line.strip()
+        if playlist.variants:
+            url_root = url.rpartition('/')[0]
+            variant = playlist.variants[0]
 
-            if 'EXT-X-MAP:URI' in line:
-                # naive parsing. todo: respect EXT-X-DISCONTINUITY and EXT-X-MEDIA:TYPE=AUDIO,...,AUTOSELECT=YES
-                line = line.rpartition("=")[2].strip('"')
+            if self._variant_policy and len(playlist.variants) > 1:
+                LOGGER.info('Sub playlists found. Choosing one ...')
+                variants = sorted(playlist.variants, key=lambda item: item.bandwidth, reverse=True)
+                candidates = [
+                    VariantCandidate(
+                        f'{url_root}/{item.uri}',
+                        bitrate=item.bandwidth,
+                        label='x'.join(f'{val}' for val in item.resolution or ()) or item.uri,
+                    )
+                    for item in variants
+                ]
+                variant = variants[candidates.index(self._variant_select(candidates, headers=headers))]
 
-            if line.endswith('.m3u8'):
-                playlists.append(line)
-                continue
+            else:
+                LOGGER.info('Sub playlists found. Will use the first one ...')
 
-            path = Path(line.partition('?')[0])
-            if path.suffix not in media_ext:
-                continue
+            def get_sub_playlist(uri: str) -> list[Segment]:
+                return self._chunks_get_segments(f'{url_root}/{uri}', url_prefix=uri.rpartition('/')[0])
+
+            video = get_sub_playlist(variant.uri)
+            audio = []
+            renditions = [
+                rendition for rendition in playlist.renditions
+                # rendition without URI is muxed into variant stream
+                if rendition.type == 'AUDIO' and rendition.group_id == variant.audio
+                and rendition.uri and rendition.uri != variant.uri
+            ]
+
+            if renditions:
+                rendition = next((rendition for rendition in renditions if rendition.default), renditions[0])
+                LOGGER.info(f'Separate audio found: {rendition.name or rendition.uri}')
+                audio = get_sub_playlist(rendition.uri)
+
+            return video, audio
+
+        chunk_lists = list(self._chunks_filter(playlist.segments, url_prefix=url_prefix))
+
+        assert chunk_lists, 'No video chunks found in playlist file'
+
+        return chunk_lists, []
+
+    def _chunks_filter(self, segments: Iterable[Segment], *, url_prefix: str = '') -> Iterator[Segment]:
+        """Yields supported media segments prefixing their URIs.
+        Initialization sections are yielded as separate segments whatever their extension is (e.g. init.mp4).
+        So are segments addressed by byte ranges (e.g. of a single fragmented mp4 file).
+
+        :param segments: Segments from playlist.
+        :param url_prefix: URL prefix.
+
+        """
+        media_ext = self._media_ext
+        init_key = None
+
+        def prepare(segment: Segment, *, init: bool = False) -> Segment | None:
+            name = segment.uri
+
+            if not init and segment.byterange is None and Path(name.partition('?')[0]).suffix not in media_ext:
+                LOGGER.debug(f'Skipping unsupported chunk {name}')
+                return None
 
             if url_prefix:
-                line = f'{url_prefix}/{line}'
+                segment.uri = f'{url_prefix}/{name}'
 
-            chunk_lists.append(line)
+            return segment
 
-        if playlists:
+        for segment in segments:
+            init = segment.init
+            key = (init.uri, init.byterange) if init else None
+
+            if key != init_key:
+                # initialization section may change after a discontinuity
+                init_key = key
+                if init:
+                    yield prepare(
+                        Segment(init.uri, byterange=init.byterange, discontinuity=segment.discontinuity),
+                        init=True,
+                    )
+
+            if segment := prepare(segment):
+                yield segment
+
+    def _chunks_poll(self, url: str) -> Iterator[Segment]:
+        """Yields video chunks of a live playlist at URL as they appear.
+
+        The playlist is polled every target duration (half of it if nothing has changed)
+        until the stream ends. Chunks seen before (by media sequence number) are not yielded again.
+        Transient failures of a poll are retried with backoff for a few target durations.
+
+        :param url: Playlist URL.
+
+        """
+        playlist = None
+
+        def fetch(url: str) -> Playlist:
+            duration = (playlist and playlist.target_duration) or 10
+            backoff = RetryScheduler(backoff=duration / 4, backoff_max=duration)
+            deadline = monotonic() + duration * 3  # chunks are still in the playlist by then usually
+            attempt = 0
+
+            while True:
+                try:
+                    # no cache here, playlist changes
+                    return parse_playlist(self._handle_response_simple(self._session.get(url, timeout=self._timeout)))
+
+                except requests.RequestException as e:
+                    attempt += 1
+                    delay = backoff.get_delay(e, attempt=attempt)
+
+                    if not is_transient(e) or monotonic() + delay > deadline:
+                        raise
+
+                    self.metrics.inc('errors')
+                    LOGGER.warning(f'Failed to poll live playlist: {e}. Retrying in {delay:.1f}s ...')
+                    sleep(delay)
+
+        LOGGER.info(f'Polling live playlist {url} ...')
+
+        url_prefix = ''
+        playlist = fetch(url)
+
+        if playlist.variants:
             LOGGER.info('Sub playlists found. Will use the first one ...')
+            sub_playlist = playlist.variants[0].uri
+            url, url_prefix = f'{url.rpartition("/")[0]}/{sub_playlist}', sub_playlist.rpartition('/')[0]
+            playlist = fetch(url)
+
+        def poll() -> Iterator[Segment]:
+            nonlocal playlist
+            sequence_next = None
+
+            while True:
+                started = monotonic()
+                segments = playlist.segments
+
+                if sequence_next is not None and segments and segments[0].sequence > sequence_next:
+                    LOGGER.warning(f'Chunks {sequence_next}-{segments[0].sequence - 1} left playlist before download')
+
+                new = [segment for segment in segments if sequence_next is None or segment.sequence >= sequence_next]
+
+                if new:
+                    sequence_next = new[-1].sequence + 1
+                    yield from new
+
+                if playlist.endlist:
+                    LOGGER.info('Live stream has ended')
+                    return
+
+                delay = playlist.target_duration if new else playlist.target_duration / 2
+                sleep(max(delay - (monotonic() - started), 0))
+                playlist = fetch(url)
+
+        yield from self._chunks_filter(poll(), url_prefix=url_prefix)
+
+    def _chunks_iter(self, chunk_names: Iterable[str], *, start_chunk: str) -> Iterator[tuple[int, str]]:
+        """Yields chunk indexes and names to download respecting start chunk and shard.
+
+        :param chunk_names: Chunk names from playlist. Iterator for a live playlist.
+        :param start_chunk: Chunk name to start download from.
+
+        """
+        idx_min, idx_max = 1, len(chunk_names) if isinstance(chunk_names, list) else float('inf')
+
+        if shard := self._shard:
+            idx_min, idx_max = get_shard_range(len(chunk_names), shard=shard)
 
-            sub_playlist = playlists[0]
-            sub_playlist_url_prefix = sub_playlist.rpartition('/')[0]
-            sub_playlist_url = f'{url.rpartition("/")[0]}/{sub_playlist}'
+        for idx, chunk_name in enumerate(chunk_names, 1):
 
-            chunk_lists = self._chunks_get_list(sub_playlist_url, url_prefix=sub_playlist_url_prefix)
+            if chunk_name == start_chunk:
+                start_chunk = ''  # clear to allow further download
+
+            if start_chunk or idx < idx_min:
+                continue
+
+            if idx > idx_max:
+                break
+
+            yield idx, chunk_name
+
+    def _chunk_url(self, url_video_root: str, chunk_name: str) -> str:
+        """Returns chunk URL.
+
+        :param url_video_root: URL to prepend to relative chunk names.
+        :param chunk_name: Chunk name from playlist.
+
+        """
+        if '://' in chunk_name:
+            return chunk_name
+        return f'{url_video_root.rstrip("/")}/{chunk_name}'
+
+    @staticmethod
+    def _chunk_path(dump_dir: Path, *, name: str, file_idx: int) -> Path:
+        """Returns chunk file path.
+
+        :param dump_dir: Directory to download chunks into.
+        :param name: Chunk name without GET-args.
+        :param file_idx: Chunk index.
+
+        """
+        return dump_dir / f'{file_idx}_{name.rpartition("/")[2]}'  # drop url prefix
+
+    def _chunk_prepare(
+        self,
+        *,
+        name: str,
+        file_idx: int,
+        url: str,
+        dump_dir: Path,
+        journal: ProgressJournal,
+        headers: dict[str, str] | None,
+    ) -> tuple[Path, int, dict[str, str]] | None:
+        """Returns chunk file path, its size already on disk and request headers.
+        None is returned if the chunk has already been downloaded.
+
+        :param name: Chunk name without GET-args.
+        :param file_idx: Chunk index.
+        :param url: Chunk URL.
+        :param dump_dir: Directory to download chunks into.
+        :param journal: Progress journal.
+        :param headers: Additional headers to send.
+
+        """
+        filepath = self._chunk_path(dump_dir, name=name, file_idx=file_idx)
+        filename = filepath.name
+
+        size_disk = filepath.stat().st_size if filepath.exists() else 0
+        size_done = journal.done.get(name)
+
+        # size is not recorded in a legacy journal, so the file is only required to be there
+        if size_done is not None and (size_done == size_disk or (size_done == journal.size_unknown and size_disk)):
+            LOGGER.info(f'File {name} has already been downloaded before. Skipping.')
+            self.metrics.inc('chunks_skipped')
+            return None
+
+        if store := self._store:
+            # a file shared with the store is complete and must not be written into
+            if (size_disk and filepath.stat().st_nlink > 1) or store.link(url, filepath):
+                LOGGER.info(f'File {name} is taken from the store. Skipping.')
+                self.metrics.inc('chunks_stored')
+                journal.add(name, filepath.stat().st_size)
+                return None
+
+        headers_chunk = {**(headers or {})}
+
+        if size_disk:
+            # partially downloaded before
+            LOGGER.info(f'Trying to resume download of {filename} from byte {size_disk} {url} ...')
+            headers_chunk['Range'] = f'bytes={size_disk}-'
 
         else:
-            assert chunk_lists, 'No video chunks found in playlist file'
+            LOGGER.info(f'Trying to download {filename} {url} ...')
+
+        return filepath, size_disk, headers_chunk
+
+    def _iter_limited(self, chunks: Iterable[bytes], *, url: str) -> Iterable[bytes]:
+        """Returns response body chunks respecting bandwidth limits if any.
+
+        :param chunks: Response body chunks.
+        :param url: Requested URL.
+
+        """
+        if rate_limiter := self._rate_limiter:
+            return rate_limiter.iter_limited(chunks, url=url)
+        return chunks
 
-        return chunk_lists
+    def _chunk_received(self, response: 'requests.Response | httpx.Response', *, started: float) -> None:
+        """Registers chunk response metrics: time to first byte and retries made.
+
+        :param response: Chunk response.
+        :param started: Request start (monotonic).
+
+        """
+        metrics = self.metrics
+        metrics.observe('ttfb_seconds', monotonic() - started)
+
+        retries = getattr(getattr(response, 'raw', None), 'retries', None)  # urllib3 retries only
+        if retries and retries.history:
+            metrics.inc('retries', len(retries.history))
+
+    def _get_controller(self, *, concurrent: int) -> ConcurrencyController:
+        """Returns concurrency controller for downloads.
+
+        :param concurrent: Max concurrent requests number.
+
+        """
+        return ConcurrencyController(
+            minimum=min(self._concurrent_min, concurrent) if self._adaptive else concurrent,
+            maximum=concurrent,
+        )
 
     def _chunks_download(
         self,
@@ -150,116 +722,1007 @@ class Dumper:
         start_chunk: str,
         headers: dict[str, str] | None = None,
         concurrent: int = 10,
+        sequencer: ChunkSequencer | None = None,
+        byteranges: list[tuple[int, int] | None] | None = None,
+        controller: ConcurrencyController | None = None,
     ) -> None:
+        """Downloads video chunks.
+
+        :param url_video_root: URL to prepend to chunk names.
+        :param dump_dir: Directory to download chunks into.
+        :param chunk_names: Chunk names from playlist.
+        :param start_chunk: Chunk name to start download from.
+        :param headers: Additional headers to send.
+        :param concurrent: Max concurrent requests number.
+        :param sequencer: If set, chunks are passed into it
+            instead of being written into files in dump_dir.
+        :param byteranges: Chunks byte ranges as (length, offset) if playlist addresses chunks by ranges.
+        :param controller: Concurrency controller shared with other downloads (e.g. other tracks of the video).
+            If not set, a new one for `concurrent` requests is used.
+
+        """
+        shard_suffix = f'.{self._shard[0]}' if self._shard else ''  # one file per shard process
+        journal = None if sequencer else ProgressJournal(dump_dir / f'files{shard_suffix}.txt')
+        # pipelined download can't go on without a chunk
+        retries = None if sequencer else RetryScheduler(attempts=self._chunk_retries + 1)
+
+        controller = controller or self._get_controller(concurrent=concurrent)
+
+        idx_min, idx_max = 1, float('inf')
+
+        if isinstance(chunk_names, list):  # unknown for a live playlist
+            idx_max = len(chunk_names)
+            if self._shard:
+                idx_min, idx_max = get_shard_range(len(chunk_names), shard=self._shard)
+            self.metrics.inc('chunks_total', idx_max - idx_min + 1)
+
+        if journal:
+            # left by an interrupted run; other shards' ones may be in use
+            for path in dump_dir.iterdir():
+                if (match := RE_CHUNK_FILE_TEMP.fullmatch(path.name)) and idx_min <= int(match[1]) <= idx_max:
+                    LOGGER.debug(f'Removing {path.name} left unfinished')
+                    path.unlink(missing_ok=True)
+
+        download = self._chunks_download_async if self._engine == 'async' else self._chunks_download_threads
+
+        if byteranges:
+            LOGGER.debug('Chunks are addressed by byte ranges. Using ranged requests')
+            download = partial(self._chunks_download_ranges, byteranges=byteranges)
+
+        with journal or nullcontext():
+            download(
+                url_video_root=url_video_root,
+                chunks=self._chunks_iter(chunk_names, start_chunk=start_chunk),
+                chunks_total=len(chunk_names) if isinstance(chunk_names, list) else 0,
+                dump_dir=dump_dir,
+                headers=headers,
+                controller=controller,
+                journal=journal,
+                sequencer=sequencer,
+                retries=retries,
+            )
+
+        if controller.adaptive:
+            history = ', '.join(f'{seconds}s: {limit}' for seconds, limit in controller.history)
+            LOGGER.info(f'Concurrency over time: {history}')
+
+        if retries and retries.failed:
+            path_report = dump_dir / f'failed{shard_suffix}.json'
+            retries.write_report(path_report)
+            raise RuntimeError(f'Failed to download {len(retries.failed)} chunk(s). See {path_report}')
+
+    def _request_guarded(self, url: str, *, controller: ConcurrencyController, func: Callable[[Session], T]) -> T:
+        """Performs a request in a thread respecting concurrency controller and request limits.
+        Recycles session on connection failures.
 
-        chunks_total = len(chunk_names)
+        :param url: URL to request.
+        :param controller: Concurrency controller.
+        :param func: Callable performing the request using the given session.
 
-        progress_file = (dump_dir / 'files.txt')
-        progress_file.touch()
+        """
+        limits = self._limits
+        rate_limiter = self._rate_limiter
+        sessions = self._sessions
+        metrics = self.metrics
+
+        controller.acquire()
+        session = sessions.get()
+
+        try:
+            with limits.slot(url) if limits else nullcontext():
+                if rate_limiter:
+                    rate_limiter.request(url)
+                started = monotonic()
+                result = func(session)
+
+        except Exception as e:
+            metrics.inc('errors')
+            controller.release(congested=is_congestion(e))
+            if is_connection_failure(e):  # not on error responses: the connections are fine
+                sessions.recycle(session)
+            raise
+
+        latency = monotonic() - started
+        metrics.inc('requests')
+        metrics.observe('request_seconds', latency)
+        controller.release(latency=latency)
+
+        return result
+
+    def _threads_run(
+        self,
+        tasks: Iterable[tuple[str, int, Callable[[], None], str]],
+        *,
+        chunks_total: int,
+        concurrent: int,
+        sequencer: ChunkSequencer | None,
+        retries: RetryScheduler | None = None,
+    ) -> None:
+        """Runs download tasks in a pool of threads logging progress.
+
+        Tasks are taken from the iterable as others complete, so that only a window
+        of tasks is in flight at a time, and no new tasks are started after a failure.
+        If chunks number is unknown (live), the iterable may block waiting for new chunks,
+        so it is consumed in background and tasks are taken as they appear.
+        With retries scheduler, failed tasks are resubmitted when their retry is due instead,
+        and the tasks failed finally are left for the scheduler to report.
+
+        With hedging, a task whose request runs longer than the hedging policy allows is run once more
+        in parallel, and the task completes when the attempt which has won the race completes.
+        Callables of tasks with URL are then called with `race` keyword argument to coordinate
+        their attempts (see `Race`) and return False if their attempt has lost.
+        Each run of a task (e.g. a retry) gets a new race.
+
+        :param tasks: Tasks as (description, chunks number, callable, URL requested by the task).
+            Tasks with empty URL are not hedged.
+        :param chunks_total: Chunks number overall. 0 - unknown (live).
+        :param concurrent: Threads number.
+        :param sequencer: Sequencer to abort on error.
+        :param retries: Retries scheduler for failed tasks.
+
+        """
+        feed = None if chunks_total else BackgroundFeed(tasks)
+        tasks = iter(tasks)
+        window = concurrent * 2  # some tasks are queued to keep threads busy
+        future_task_map: dict[Future, dict] = {}
+        hedging = self._hedging
+
+        def run(task: dict) -> bool | None:
+            race = task['race'] = Race() if hedging and task['url'] else None
+            task['hedged'] = False
+
+            if race:
+                return task['func'](race=race)
+            return task['func']()
+
+        executor = ThreadPoolExecutor(max_workers=concurrent)
+        executor_hedges = ThreadPoolExecutor(max_workers=concurrent) if hedging else None
+        completed = False
+
+        def submit() -> None:
+            tasks_in_flight = len({id(task) for task in future_task_map.values()})
+
+            while retries and tasks_in_flight < window and (task := retries.pop_due()):
+                future_task_map[executor.submit(run, task)] = task
+                tasks_in_flight += 1
+
+            number = window - tasks_in_flight
+            for description, chunks_num, func, url in (feed.take(number) if feed else islice(tasks, number)):
+                task = {'description': description, 'chunks_num': chunks_num, 'func': func, 'url': url}
+                future_task_map[executor.submit(run, task)] = task
+
+        def hedge() -> None:
+            now = monotonic()
+
+            for task in list(future_task_map.values()):
+                race = task.get('race')
+                # time waiting for a request slot is not latency, and a won race is over
+                if race is None or race.started is None or race.settled or task['hedged']:
+                    continue
+
+                delay = hedging.get_delay(task['url'])
+                if delay is None or now - race.started < delay:
+                    continue
+
+                if not hedging.try_spend():
+                    return
+
+                task['hedged'] = True
+                self.metrics.inc('hedged')
+                future_task_map[executor_hedges.submit(task['func'], race=race)] = task
+
+        try:
+            submit()
+
+            if future_task_map or feed:
+                LOGGER.info(f'Downloading up to {concurrent} files concurrently ...')
 
-        files_done = dict.fromkeys(progress_file.read_text().splitlines())
-        lock = Lock()
+            counter = 0
+            while (
+                future_task_map
+                or (retries and retries.get_wait() is not None)
+                or (feed and not feed.exhausted)
+            ):
+                timeout = 0.05 if hedging else None
 
-        def dump(*, name: str, file_idx: int, url: str, session: Session, sleepy: bool, timeout: int) -> None:
+                if feed and not feed.exhausted:
+                    timeout = min(timeout or 0.1, 0.1)  # to pick up new tasks
+
+                if retries and (retry_wait := retries.get_wait()) is not None:
+                    timeout = min(timeout or retry_wait, retry_wait)
+
+                if not future_task_map:
+                    sleep(timeout)  # only retries or tasks to appear are left
+
+                done, _ = wait(future_task_map, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    task = future_task_map.pop(future, None)
+                    if task is None:
+                        continue  # another attempt of the task has already succeeded
+
+                    attempts = [future for future, other in future_task_map.items() if other is task]
+
+                    race = task.get('race')
+
+                    try:
+                        result = future.result()
+
+                    except Exception as e:
+                        # an attempt may fail after having won (e.g. writing the file), then the others have lost
+                        if attempts and not (race and race.settled):
+                            LOGGER.debug(f'Attempt failed, waiting for another one ({task["description"]})')
+                            continue
+
+                        for attempt in attempts:
+                            del future_task_map[attempt]
+
+                        if retries:
+                            if retries.schedule(task['description'], task, e, transient=is_transient(e)):
+                                self.metrics.inc('chunks_retried')
+                            else:
+                                self.metrics.inc('chunks_failed')
+                            continue
+
+                        for future_pending in future_task_map:
+                            future_pending.cancel()
+                        if sequencer:
+                            sequencer.abort()  # release workers waiting for their turn
+                        raise
+
+                    if result is False:
+                        continue  # the attempt has lost, the task completes with the winner
+
+                    for attempt in attempts:
+                        del future_task_map[attempt]
+
+                    counter += task['chunks_num']
+                    LOGGER.info(f'Got {counter}{get_progress(counter, chunks_total)} ({task["description"]}) ...')
+
+                if hedging:
+                    hedge()
+
+                submit()
+
+            completed = True
+
+        finally:
+            if feed:
+                feed.close()
+            # abandoned attempts of hedged tasks are not waited for: they don't touch results
+            executor.shutdown(wait=not completed)
+            if executor_hedges:
+                executor_hedges.shutdown(wait=not completed)
+
+        if counter:
+            LOGGER.debug(f'Connections: {self._sessions.stats}')
+
+    def _chunks_download_threads(
+        self,
+        *,
+        url_video_root: str,
+        chunks: Iterator[tuple[int, str]],
+        chunks_total: int,
+        dump_dir: Path,
+        headers: dict[str, str] | None,
+        controller: ConcurrencyController,
+        journal: ProgressJournal | None,
+        sequencer: ChunkSequencer | None,
+        retries: RetryScheduler | None,
+    ) -> None:
+        """Downloads video chunks using a pool of threads."""
+        sleepy = self._sleepy
+        timeout = self._timeout
+
+        hedging = self._hedging
+
+        def dump(*, name: str, file_idx: int, url: str, race: Race | None = None) -> bool:
+            # returns False if the attempt has lost the race, so that the task completes with the winner
+            won, data = self._request_guarded(
+                url,
+                controller=controller,
+                func=partial(fetch, name=name, file_idx=file_idx, url=url, race=race),
+            )
+
+            if data is not None:
+                sequencer.put(file_idx, data)
+
+            if sleepy and won:
+                sleep(choice([1, 0.5, 0.7, 0.6]))
+
+            return won
+
+        def iter_body(r: requests.Response, *, url: str, race: Race | None, chunk_size: int) -> Iterable[bytes]:
+            chunks = self._iter_limited(r.iter_content(chunk_size=chunk_size), url=url)
+            return race.iter_unsettled(chunks) if race else chunks
+
+        def won(*, url: str, race: Race | None, attempt: int, started: float) -> bool:
+            # whether the attempt wins (always without hedging)
+            if race and not race.claim():
+                LOGGER.debug(f'Abandoning attempt {attempt} for {url}')
+                return False
+
+            if hedging:
+                hedging.observe(url, monotonic() - started)
+                if attempt:
+                    self.metrics.inc('hedges_won')
+
+            return True
+
+        def fetch(
+            session: Session, *, name: str, file_idx: int, url: str, race: Race | None
+        ) -> tuple[bool, bytes | None]:
+            # returns whether the attempt has won and data to pass into the sequencer
 
             name = name.partition('?')[0]  # drop GET-args
+            metrics = self.metrics
+            attempt = race.start() if race else 0
 
-            if name in files_done:
-                LOGGER.info(f'File {name} has already been downloaded before. Skipping.')
-                return
+            if sequencer:
+                LOGGER.debug(f'Trying to download {file_idx} {url} ...')
 
-            filename = name.rpartition('/')[2]  # drop url prefix
-            filename = f'{file_idx}_{filename}'
+                started = monotonic()
+                with session.get(url, headers=headers or {}, stream=True, timeout=timeout) as r:
+                    self._chunk_received(r, started=started)
+                    r.raise_for_status()
+                    data = b''.join(iter_body(r, url=url, race=race, chunk_size=65536))
 
-            LOGGER.info(f'Trying to download {filename} {url} ...')
+                if not won(url=url, race=race, attempt=attempt, started=started):
+                    return False, None
+
+                metrics.inc('chunks_downloaded')
+                metrics.inc('bytes_downloaded', len(data))
+                return True, data
+
+            if attempt:
+                return fetch_hedge(session, name=name, file_idx=file_idx, url=url, race=race, attempt=attempt), None
+
+            prepared = self._chunk_prepare(
+                name=name, file_idx=file_idx, url=url, dump_dir=dump_dir, journal=journal, headers=headers
+            )
+            if not prepared:
+                # nothing to hedge
+                return (race.claim() if race else True), None
+
+            filepath, size_disk, headers_chunk = prepared
+
+            started = monotonic()
+            with session.get(url, headers=headers_chunk, stream=True, timeout=timeout) as r:
+                self._chunk_received(r, started=started)
+
+                if size_disk and r.status_code == 416:
+                    LOGGER.debug(f'File {filepath.name} is already complete')
+
+                else:
+                    r.raise_for_status()
+                    # server may ignore Range and respond with the whole file
+                    resumed = r.status_code == 206
 
+                    with race.lock if race else nullcontext():
+                        if race and race.settled:
+                            return False, None  # a hedge has already put the file in place
+                        f = filepath.open('ab' if resumed else 'wb')
+
+                    with f:
+                        f.writelines(iter_body(r, url=url, race=race, chunk_size=8192))
+
+            if not won(url=url, race=race, attempt=attempt, started=started):
+                return False, None
+
+            size = filepath.stat().st_size
+
+            if r.status_code != 416:
+                metrics.inc('chunks_downloaded')
+                metrics.inc('bytes_downloaded', size - (size_disk if resumed else 0))
+
+            if self._store:
+                self._store.add(url, filepath)
+
+            journal.add(name, size)
+            return True, None
+
+        def fetch_hedge(session: Session, *, name: str, file_idx: int, url: str, race: Race, attempt: int) -> bool:
+            # the original request may still write into the chunk file, so a hedge downloads into another one
+            filepath = self._chunk_path(dump_dir, name=name, file_idx=file_idx)
+            filepath_hedge = filepath.with_name(f'{filepath.name}.{attempt}.hedge')
+
+            LOGGER.info(f'Hedging slow request for {filepath.name} {url} ...')
+
+            started = monotonic()
             with session.get(url, headers=headers or {}, stream=True, timeout=timeout) as r:
+                self._chunk_received(r, started=started)
                 r.raise_for_status()
-                with (dump_dir / filename).open('wb') as f:
-                    f.writelines(r.iter_content(chunk_size=8192))
 
-            files_done[name] = True
-            with lock:
-                progress_file.write_text('\n'.join(files_done))
+                with filepath_hedge.open('wb') as f:
+                    f.writelines(iter_body(r, url=url, race=race, chunk_size=8192))
 
-            if sleepy:
-                sleep(choice([1, 0.5, 0.7, 0.6]))
+            with race.lock:
+                if not won(url=url, race=race, attempt=attempt, started=started):
+                    filepath_hedge.unlink(missing_ok=True)
+                    return False
 
-        with ThreadPoolExecutor(max_workers=concurrent) as executor:
+                filepath_hedge.replace(filepath)
 
-            future_url_map = {}
+            size = filepath.stat().st_size
 
-            for idx, chunk_name in enumerate(chunk_names, 1):
+            self.metrics.inc('chunks_downloaded')
+            self.metrics.inc('bytes_downloaded', size)
 
-                if chunk_name == start_chunk:
-                    start_chunk = ''  # clear to allow further download
+            if self._store:
+                self._store.add(url, filepath)
 
-                if start_chunk:
-                    continue
+            journal.add(name, size)
+            return True
 
-                chunk_url = f'{url_video_root.rstrip("/")}/{chunk_name}'
-                submitted = executor.submit(
+        tasks = (
+            (
+                chunk_name.partition('?')[0],
+                1,
+                partial(
                     dump,
                     name=chunk_name,
                     file_idx=idx,
-                    url=chunk_url,
-                    session=self._session,
-                    sleepy=self._sleepy,
-                    timeout=self._timeout,
-                )
+                    url=self._chunk_url(url_video_root, chunk_name),
+                ),
+                self._chunk_url(url_video_root, chunk_name),
+            )
+            for idx, chunk_name in chunks
+        )
 
-                future_url_map[submitted] = (chunk_name, chunk_url)
+        self._threads_run(
+            tasks, chunks_total=chunks_total, concurrent=controller.maximum, sequencer=sequencer, retries=retries
+        )
 
-            if future_url_map:
-                LOGGER.info(f'Downloading up to {concurrent} files concurrently ...')
+    def _chunks_download_ranges(
+        self,
+        *,
+        url_video_root: str,
+        chunks: Iterator[tuple[int, str]],
+        chunks_total: int,
+        byteranges: list[tuple[int, int] | None],
+        dump_dir: Path,
+        headers: dict[str, str] | None,
+        controller: ConcurrencyController,
+        journal: ProgressJournal | None,
+        sequencer: ChunkSequencer | None,
+        retries: RetryScheduler | None,
+    ) -> None:
+        """Downloads video chunks addressed by byte ranges using a pool of threads.
+        Adjacent ranges of the same resource are merged into larger requests.
+
+        """
+        sleepy = self._sleepy
+        timeout = self._timeout
+        store = self._store
+
+        def get_filepath(idx: int, name: str) -> Path:
+            return dump_dir / f'{idx}_{name.partition("?")[0].rpartition("/")[2]}'
+
+        def is_done(idx: int, name: str) -> bool:
+            # the same resource is shared by many chunks, so chunk file name is used as a journal key
+            filepath = get_filepath(idx, name)
+            size_done = journal.done.get(filepath.name)
+            return size_done is not None and filepath.exists() and size_done == filepath.stat().st_size
+
+        def get_segments() -> Iterator[tuple[int, str, tuple[int, int] | None]]:
+            for idx, chunk_name in chunks:
+                if journal and is_done(idx, chunk_name):
+                    LOGGER.info(f'File {chunk_name} ({idx}) has already been downloaded before. Skipping.')
+                    self.metrics.inc('chunks_skipped')
+                    continue
+
+                byterange = byteranges[idx - 1]
+
+                if store and journal:
+                    filepath = get_filepath(idx, chunk_name)
+                    if store.link(self._chunk_url(url_video_root, chunk_name), filepath, byterange=byterange):
+                        LOGGER.info(f'File {chunk_name} ({idx}) is taken from the store. Skipping.')
+                        self.metrics.inc('chunks_stored')
+                        journal.add(filepath.name, filepath.stat().st_size)
+                        continue
+
+                yield idx, chunk_name, byterange
+
+        def dump(request: RangeRequest, *, url: str) -> None:
+            parts = self._request_guarded(url, controller=controller, func=partial(fetch, request=request, url=url))
+
+            for idx, data in parts:
+                sequencer.put(idx, data)
+
+            if sleepy:
+                sleep(choice([1, 0.5, 0.7, 0.6]))
+
+        def fetch(session: Session, *, request: RangeRequest, url: str) -> list[tuple[int, bytes]]:
+            LOGGER.info(f'Trying to download {len(request.parts)} chunk(s) {request.range_header} {url} ...')
+
+            headers_range = {**(headers or {})}
+
+            if range_header := request.range_header:
+                headers_range['Range'] = range_header
+
+            parts = []
+            metrics = self.metrics
+
+            started = monotonic()
+            with session.get(url, headers=headers_range, stream=True, timeout=timeout) as r:
+                self._chunk_received(r, started=started)
+                r.raise_for_status()
+
+                if range_header and r.status_code != 206:
+                    raise RuntimeError(f'Server does not support byte ranges for {url}')
+
+                for (idx, _), data in zip(
+                    request.parts,
+                    split_stream(
+                        self._iter_limited(r.iter_content(chunk_size=65536), url=url),
+                        [length for _, length in request.parts],
+                    ),
+                    strict=True,
+                ):
+                    metrics.inc('chunks_downloaded')
+                    metrics.inc('bytes_downloaded', len(data))
+
+                    if sequencer:
+                        parts.append((idx, data))
+                        continue
+
+                    filepath = get_filepath(idx, request.uri)
+                    filepath.write_bytes(data)
+
+                    if store:
+                        store.add(url, filepath, byterange=byteranges[idx - 1])
+
+                    journal.add(filepath.name, len(data))
+
+            return parts
+
+        tasks = (
+            (
+                f'{request.uri.partition("?")[0]} {request.range_header}',
+                len(request.parts),
+                partial(dump, request, url=self._chunk_url(url_video_root, request.uri)),
+                '',  # parts are written as they arrive, so requests are not hedged
+            )
+            for request in plan_range_requests(get_segments())
+        )
+
+        self._threads_run(
+            tasks, chunks_total=chunks_total, concurrent=controller.maximum, sequencer=sequencer, retries=retries
+        )
+
+    def _get_async_client(self, *, concurrent: int) -> 'httpx.AsyncClient':
+        """Returns non-blocking HTTP client for async engine.
+
+        :param concurrent: Max concurrent requests number.
+
+        """
+        try:
+            import httpx  # noqa: PLC0415
+
+        except ImportError as e:  # pragma: nocover
+            raise RuntimeError('Async engine requires httpx. Install it with `webinardump[async]`') from e
+
+        return httpx.AsyncClient(
+            headers=self._headers,
+            timeout=self._timeout,
+            limits=httpx.Limits(max_connections=concurrent, max_keepalive_connections=concurrent),
+            transport=httpx.AsyncHTTPTransport(retries=3),
+        )
+
+    def _chunks_download_async(self, **kwargs) -> None:
+        """Downloads video chunks using asyncio event loop. See `_chunks_download_coro`."""
+        asyncio.run(self._chunks_download_coro(**kwargs))
+
+    async def _chunks_download_coro(
+        self,
+        *,
+        url_video_root: str,
+        chunks: Iterator[tuple[int, str]],
+        chunks_total: int,
+        dump_dir: Path,
+        headers: dict[str, str] | None,
+        controller: ConcurrencyController,
+        journal: ProgressJournal | None,
+        sequencer: ChunkSequencer | None,
+        retries: RetryScheduler | None,
+    ) -> None:
+        """Downloads video chunks using a fixed number of worker coroutines
+        sharing one chunks iterator, so memory does not depend on chunks number.
+
+        """
+        from httpx import TransportError  # noqa: PLC0415
+
+        sleepy = self._sleepy
+        limits = self._limits
+        rate_limiter = self._rate_limiter
+        metrics = self.metrics
+        concurrent = controller.maximum
+        counter = 0
+        changed = asyncio.Condition()  # request slot is freed or sequencer advanced
+
+        async def notify() -> None:
+            async with changed:
+                changed.notify_all()
+
+        async def dump(client: 'httpx.AsyncClient', *, name: str, file_idx: int, url: str) -> None:
+
+            async with changed:
+                while not controller.try_acquire():
+                    # slots may also be freed outside of this loop by downloads sharing the controller
+                    with suppress(TimeoutError):
+                        await asyncio.wait_for(changed.wait(), timeout=0.1)
+
+            if limits:
+                await limits.acquire_async(url)
+
+            try:
+                if rate_limiter:
+                    await rate_limiter.request_async(url)
+
+                started = monotonic()
+                data = await fetch(client, name=name, file_idx=file_idx, url=url)
+
+            except Exception as e:
+                metrics.inc('errors')
+                controller.release(congested=is_congestion(e) or isinstance(e, TransportError))
+                await notify()
+                raise
+
+            finally:
+                if limits:
+                    limits.release(url)
+
+            latency = monotonic() - started
+            metrics.inc('requests')
+            metrics.observe('request_seconds', latency)
+            controller.release(latency=latency)
+            await notify()
+
+            if data is not None:
+                # wait for previous chunks here not to occupy threads
+                async with changed:
+                    await changed.wait_for(lambda: sequencer.accepts(file_idx))
+
+                await asyncio.to_thread(sequencer.put, file_idx, data)
+                await notify()
+
+            if sleepy:
+                await asyncio.sleep(choice([1, 0.5, 0.7, 0.6]))
+
+        async def fetch(client: 'httpx.AsyncClient', *, name: str, file_idx: int, url: str) -> bytes | None:
+
+            name = name.partition('?')[0]  # drop GET-args
+
+            if sequencer:
+                LOGGER.debug(f'Trying to download {file_idx} {url} ...')
+
+                started = monotonic()
+                response = await client.get(url, headers=headers or {})
+                self._chunk_received(response, started=started)
+                response.raise_for_status()
+
+                if rate_limiter:
+                    await rate_limiter.received_async(url, len(response.content))
+
+                metrics.inc('chunks_downloaded')
+                metrics.inc('bytes_downloaded', len(response.content))
+                return response.content
+
+            prepared = self._chunk_prepare(
+                name=name, file_idx=file_idx, url=url, dump_dir=dump_dir, journal=journal, headers=headers
+            )
+            if not prepared:
+                return None
 
-                counter = 1
-                for future in as_completed(future_url_map):
-                    chunk_name, chunk_url = future_url_map[future]
-                    future.result()
-                    percent = round(counter * 100 / chunks_total, 1)
-                    counter += 1
-                    LOGGER.info(f'Got {counter}/{chunks_total} ({chunk_name.partition("?")[0]}) [{percent}%] ...')
+            filepath, size_disk, headers_chunk = prepared
 
-    def _video_concat(self, path: Path) -> Path:
+            started = monotonic()
+            async with client.stream('GET', url, headers=headers_chunk) as r:
+                self._chunk_received(r, started=started)
 
-        LOGGER.info('Concatenating video ...')
+                if size_disk and r.status_code == 416:
+                    LOGGER.debug(f'File {filepath.name} is already complete')
+
+                else:
+                    r.raise_for_status()
+                    # server may ignore Range and respond with the whole file
+                    resumed = r.status_code == 206
+                    with filepath.open('ab' if resumed else 'wb') as f:
+                        async for data in r.aiter_bytes(chunk_size=8192):
+                            if rate_limiter:
+                                await rate_limiter.received_async(url, len(data))
+                            f.write(data)
+
+                    metrics.inc('chunks_downloaded')
+                    metrics.inc('bytes_downloaded', filepath.stat().st_size - (size_disk if resumed else 0))
+
+            if self._store:
+                await asyncio.to_thread(self._store.add, url, filepath)
+
+            journal.add(name, filepath.stat().st_size)
+            return None
+
+        def get_chunk() -> tuple[int, str] | None:
+            # retries which are due go first
+            return (retries and retries.pop_due()) or next(chunks, None)
+
+        async def worker(client: 'httpx.AsyncClient') -> None:
+            nonlocal counter
+
+            while True:
+                chunk = get_chunk()
+
+                if chunk is None:
+                    if retries and (retry_wait := retries.get_wait()) is not None:
+                        await asyncio.sleep(retry_wait)
+                        continue
+                    return
+
+                idx, chunk_name = chunk
+                name = chunk_name.partition('?')[0]
+
+                try:
+                    await dump(client, name=chunk_name, file_idx=idx, url=self._chunk_url(url_video_root, chunk_name))
+
+                except Exception as e:
+                    if not retries:
+                        raise
+
+                    if retries.schedule(name, chunk, e, transient=is_transient(e) or isinstance(e, TransportError)):
+                        metrics.inc('chunks_retried')
+                    else:
+                        metrics.inc('chunks_failed')
+                    continue
+
+                counter += 1
+                LOGGER.info(f'Got {counter}{get_progress(counter, chunks_total)} ({name}) ...')
+
+        LOGGER.info(f'Downloading up to {concurrent} files concurrently (async) ...')
+
+        async with self._get_async_client(concurrent=concurrent) as client:
+            workers = [asyncio.create_task(worker(client)) for _ in range(concurrent)]
+
+            try:
+                await asyncio.gather(*workers)
+
+            except Exception:
+                for task in workers:
+                    task.cancel()
+
+                if sequencer:
+                    sequencer.abort()  # release workers waiting for their turn
+
+                raise
+
+    def _video_format(self, chunk_name: str, *, container: str = '') -> tuple[str, bool]:
+        """Returns resulting video file name and whether chunks require remuxing with ffmpeg.
+        Otherwise chunks are just concatenated: both fragmented mp4 and ts allow that.
+
+        :param chunk_name: Any of chunk names.
+        :param container: Container to use instead of the configured one.
+
+        """
+        suffix = Path(chunk_name.partition('?')[0]).suffix
+
+        if suffix in {'.m4s', '.mp4'}:  # fragmented mp4 (a single file is addressed by byte ranges)
+            return 'all_chunks.mp4', False
+
+        # presumably ts (or raw aac)
+        if (container or self._container) == 'ts':
+            return f'all_chunks{suffix or ".ts"}', False
+
+        # ts in mp4 requires AAC ADTS to ASC conversion
+        return 'all_chunks.mp4', True
+
+    def _video_concat(self, path: Path, *, container: str = '') -> Path:
+        """Concatenates chunks downloaded into the directory.
+
+        :param path: Directory with chunks.
+        :param container: Container to use instead of the configured one.
+
+        """
+        LOGGER.info(f'Concatenating {path.name} ...')
+
+        # chunk files only: initialization sections may have any extension
+        filenames = get_files_sorted(path, pattern=RE_CHUNK_FILE)
+
+        # the last one is a media chunk, the first one may be an initialization section
+        fname_video, remux = self._video_format(filenames[-1], container=container)
+
+        if not remux:
+            return concat_files((path / fname for fname in filenames), path / fname_video)
 
-        fname_video = 'all_chunks.mp4'
         fname_index = 'all_chunks.txt'
 
-        mode_m4s = False
+        with (path / fname_index).open('w') as f:
+            f.writelines([f'file {fname}\n' for fname in filenames])
 
-        filenames = get_files_sorted(path, suffixes=self._media_ext)
+        call(f'ffmpeg -y -f concat -i {fname_index} -c copy -bsf:a aac_adtstoasc {fname_video}', path=path)
 
-        for filename in filenames:
-            if filename.endswith('m4s'):
-                mode_m4s = True
-                break
+        return path / fname_video
 
-        def create_index(line_tpl: str = '%s'):
-            with (path / fname_index).open('w') as f:
-                f.writelines([f'{line_tpl % fname}\n' for fname in filenames])
+    def _video_stream(
+        self,
+        *,
+        url_video_root: str,
+        dump_dir: Path,
+        chunk_names: list[str],
+        start_chunk: str,
+        headers: dict[str, str] | None = None,
+        byteranges: list[tuple[int, int] | None] | None = None,
+        controller: ConcurrencyController | None = None,
+        container: str = '',
+    ) -> Path:
+        """Downloads video chunks piping them in order right into ffmpeg.
+        Concatenation overlaps with download, no intermediate chunk files are created.
+
+        :param url_video_root: URL to prepend to chunk names.
+        :param dump_dir: Directory to put resulting file into.
+        :param chunk_names: Chunk names from playlist.
+        :param start_chunk: Chunk name to start download from.
+        :param headers: Additional headers to send.
+        :param byteranges: Chunks byte ranges as (length, offset) if playlist addresses chunks by ranges.
+        :param controller: Concurrency controller shared with other downloads.
+        :param container: Container to use instead of the configured one.
+
+        """
+        LOGGER.info('Downloading and concatenating video ...')
+
+        fname_video, remux = self._video_format(chunk_names[-1], container=container)
 
-        if mode_m4s:
-            fname_raw = 'all_chunks.mp4'
-            create_index()
-            call(f'xargs cat < {fname_index} >> {fname_raw}', path=path)
-            call(f'ffmpeg -y -i {fname_raw} -c copy {fname_video}', path=path)
+        if remux:
+            cmd = f'ffmpeg -y -f mpegts -i pipe:0 -c copy -bsf:a aac_adtstoasc {fname_video}'
+            sink = call_piped(cmd, path=dump_dir)
 
         else:
-            # presumably ts
-            create_index('file %s')
-            call(f'ffmpeg -y -f concat -i {fname_index} -c copy -bsf:a aac_adtstoasc {fname_video}', path=path)
+            sink = (dump_dir / fname_video).open('wb')
+
+        with sink as stream:
+            self._chunks_stream(
+                stream,
+                url_video_root=url_video_root,
+                chunk_names=chunk_names,
+                start_chunk=start_chunk,
+                headers=headers,
+                byteranges=byteranges,
+                controller=controller,
+            )
+
+        return dump_dir / fname_video
+
+    def _chunks_stream(
+        self,
+        sink: IO[bytes],
+        *,
+        url_video_root: str,
+        chunk_names: Iterable[str],
+        start_chunk: str,
+        headers: dict[str, str] | None = None,
+        byteranges: list[tuple[int, int] | None] | None = None,
+        controller: ConcurrencyController | None = None,
+    ) -> None:
+        """Downloads video chunks writing them into the sink in order.
+        Downloads are held while the sink is behind, so memory use is bounded.
+
+        :param sink: Binary file-like object to write into.
+        :param url_video_root: URL to prepend to chunk names.
+        :param chunk_names: Chunk names from playlist.
+        :param start_chunk: Chunk name to start download from.
+        :param headers: Additional headers to send.
+        :param byteranges: Chunks byte ranges as (length, offset) if playlist addresses chunks by ranges.
+        :param controller: Concurrency controller shared with other downloads.
+
+        """
+        concurrent = self._concurrent
+        start_idx = 1
+
+        if isinstance(chunk_names, list) and start_chunk in chunk_names:
+            start_idx = chunk_names.index(start_chunk) + 1
+
+        sequencer = ChunkSequencer(sink, start=start_idx, window=concurrent * 2)
+
+        self._chunks_download(
+            url_video_root=url_video_root,
+            dump_dir=self._target_dir,  # nothing is written there in pipelined mode
+            chunk_names=chunk_names,
+            start_chunk=start_chunk,
+            headers=headers,
+            concurrent=concurrent,
+            sequencer=sequencer,
+            byteranges=byteranges,
+            controller=controller,
+        )
+
+        assert not sequencer.pending, 'Some video chunks are missing'
+
+    def _video_mux(self, path: Path, *, video: Path, audio: Path) -> Path:
+        """Muxes video and separate audio into one file without reencoding.
+
+        :param path: Directory to put resulting file into.
+        :param video: Video file.
+        :param audio: Audio file.
+
+        """
+        LOGGER.info('Muxing video and audio ...')
+
+        fname_video = f'all_tracks.{self._container}'
+        # ADTS AAC (from ts or raw aac) requires conversion for mp4
+        bsf = ' -bsf:a aac_adtstoasc' if self._container == 'mp4' and audio.suffix != '.mp4' else ''
+
+        call(
+            f'ffmpeg -y -i {video.relative_to(path)} -i {audio.relative_to(path)} '
+            f'-map 0:v -map 1:a -c copy{bsf} {fname_video}',
+            path=path,
+        )
 
         return path / fname_video
 
     def _get_soup(self, content: str) -> BeautifulSoup:
         return BeautifulSoup(content, 'html.parser')
 
-    def _extract_js_objects(self, contents: str, *, key: str = '') -> list[dict]:
+    def _extract_js_objects(self, contents: str, *, key: str = '', first: bool = False) -> list[dict]:
         """Returns a list of js-objects (as dicts) for html contents.
 
+        Script tags are scanned without parsing the whole document.
+        Falls back to full parsing if nothing is found.
+
+        :param contents: Html.
+        :param key: Object key to filter objects.
+        :param first: Stop on the first object found.
+        """
+        found = self._extract_js_objects_scan(contents, key=key, first=first)
+
+        if not found:
+            # markup may be unusual, e.g. with `>` in script attributes
+            found = self._extract_js_objects_soup(contents, key=key)
+
+        return found[:1] if first else found
+
+    def _extract_js_objects_scan(self, contents: str, *, key: str = '', first: bool = False) -> list[dict]:
+        """Returns a list of js-objects (as dicts) scanning script tags in html contents.
+        Only scripts looking like objects are copied and parsed.
+
+        :param contents: Html.
+        :param key: Object key to filter objects.
+        :param first: Stop on the first object found.
+        """
+        found = []
+        key_quoted = f'"{key}"'
+        pos = 0
+
+        while match := RE_SCRIPT_OPEN.search(contents, pos):
+            start = match.end()
+            match_close = RE_SCRIPT_CLOSE.search(contents, start)
+
+            if match_close is None:
+                break
+
+            end = pos = match_close.start()
+
+            if contents[start] != '{':
+                continue
+
+            text = contents[start:end].rstrip()
+
+            if not text.endswith('}') or (key and key_quoted not in text):
+                continue
+
+            try:
+                obj = json.loads(text)
+
+            except json.decoder.JSONDecodeError:
+                continue
+
+            if not key or key in obj:
+                found.append(obj)
+                if first:
+                    break
+
+        return found
+
+    def _extract_js_objects_soup(self, contents: str, *, key: str = '') -> list[dict]:
+        """Returns a list of js-objects (as dicts) parsing html contents.
+
         :param contents: Html.
         :param key: Object key to filter objects.
         """
@@ -303,12 +1766,104 @@ class Dumper:
         :param dump: Dump response to file
 
         """
-        response = self._session.get(url)
+        response = self._request_simple('GET', url)
         return self._handle_response_simple(response, json=json, dump=dump)
 
+    def _request_simple(
+        self,
+        method: str,
+        url: str,
+        *,
+        data: str | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> requests.Response:
+        """Performs a request for a page, a manifest or a playlist.
+        Uses HTTP cache if enabled.
+
+        :param method: HTTP method.
+        :param url: URL.
+        :param data: Request body.
+        :param headers: Additional headers to send.
+
+        """
+        if cache := self._cache:
+            return cache.request(self._session, method, url, data=data, headers=headers)
+
+        return self._session.request(method, url, data=data, headers=headers)
+
     def _sanitize_title(self, title: str) -> str:
         return unquote(title)
 
+    def _shard_complete(self, dump_dir: Path) -> bool:
+        """Marks the current shard as done. Returns True if all shards are done
+        and this shard is chosen to concatenate the video.
+
+        :param dump_dir: Directory with chunks.
+
+        """
+        shard_num, shards_total = self._shard
+
+        (dump_dir / f'shard_{shard_num}_of_{shards_total}.done').touch()
+
+        waiting = [
+            num for num in range(1, shards_total + 1)
+            if not (dump_dir / f'shard_{num}_of_{shards_total}.done').exists()
+        ]
+
+        if waiting:
+            LOGGER.info(f'Shard {shard_num}/{shards_total} is done. Waiting for shards: {waiting}')
+            return False
+
+        # only one of the shards finishing at the same time may concatenate
+        path_lock = dump_dir / 'merge.lock'
+
+        for _ in range(2):
+            try:
+                with path_lock.open('x') as f:
+                    f.write(f'{gethostname()} {os.getpid()}')
+                return True
+
+            except FileExistsError:
+                if not is_lock_stale(path_lock):
+                    break
+
+                LOGGER.warning('Shard concatenating the video has died. Taking over ...')
+                path_lock.unlink(missing_ok=True)
+
+        LOGGER.info(f'Shard {shard_num}/{shards_total} is done. Video is concatenated by another shard')
+        return False
+
+    def _metrics_write(self, *, title: str) -> None:
+        """Writes metrics of the current run into a JSON file next to the video
+        and, if configured, into a Prometheus textfile.
+
+        :param title: Video title.
+
+        """
+        metrics = self.metrics
+        summary = metrics.summary()
+        counters = summary['counters']
+
+        LOGGER.info(
+            f"Took {summary['seconds']}s {summary['phases']}. "
+            f"Chunks: {counters.get('chunks_downloaded', 0)} "
+            f"({round(counters.get('bytes_downloaded', 0) / 1024 / 1024, 1)} MiB, "
+            f"{round(summary['bytes_per_second'] / 1024 / 1024, 1)} MiB/s). "
+            f"Errors: {counters.get('errors', 0)}"
+        )
+
+        suffix = f'.{self._shard[0]}' if self._shard else ''
+        metrics.write_json(
+            (self._target_dir / f'{title}.metrics{suffix}.json').absolute(),
+            title=title,
+            dumper=self.title,
+            engine=self._engine,
+            connections=self._sessions.stats,
+        )
+
+        if fpath := self._metrics_prometheus:
+            metrics.write_prometheus(fpath, labels={'dumper': self.title})
+
     def _video_dump(
         self,
         *,
@@ -316,37 +1871,158 @@ class Dumper:
         url_playlist: str,
         url_referer: str,
         start_chunk: str = '',
-    ) -> Path:
+        variants: list[VariantCandidate] | None = None,
+    ) -> Path | None:
+        """Downloads video from the playlist. Returns video path,
+        or None if video is streamed into a sink (see `stream()`).
+
+        :param title: Video title.
+        :param url_playlist: Playlist URL.
+        :param url_referer: Page URL to send as referer.
+        :param start_chunk: Chunk name to start download from.
+        :param variants: Variants (qualities) of the video, the best first, to choose the playlist from
+            instead of `url_playlist`. See `_variant_select()`.
+
+        """
+        headers = {'Referer': quote(url_referer.strip())}
+
+        if variants and not self._live:
+            url_playlist = self._variant_select(variants, headers=headers).url
+
         assert url_playlist.endswith('m3u8'), f'No playlist in `{url_playlist}`'
         title = self._sanitize_title(title)
+        metrics = self.metrics
+        metrics.add_phase('manifest', metrics.elapsed)  # page and manifest have been fetched by now
 
         LOGGER.info(f'Title: {title}')
 
-        chunk_names = self._chunks_get_list(url_playlist)
+        if self._live:
+            # chunks are fed into download as they appear
+            segments, segments_audio = self._chunks_poll(url_playlist), []
+            chunk_names = (segment.uri for segment in segments)
+
+        else:
+            with metrics.phase('playlist'):
+                segments, segments_audio = self._chunks_get_tracks(url_playlist, headers=headers)
+            chunk_names = [segment.uri for segment in segments]
+
+        def get_byteranges(segments: list[Segment]) -> list[tuple[int, int] | None] | None:
+            if self._live or not any(segment.byterange for segment in segments):
+                return None
+            return [segment.byterange for segment in segments]
+
+        url_root = url_playlist.rpartition('/')[0]  # strip playlist filename
+
+        if (sink := self._sink) is not None:
+            if segments_audio:
+                LOGGER.warning('Separate audio track is not streamed')
+
+            LOGGER.info('Streaming video ...')
+
+            with metrics.phase('download'):
+                self._chunks_stream(
+                    sink,
+                    url_video_root=url_root,
+                    chunk_names=chunk_names,
+                    start_chunk=start_chunk,
+                    headers=headers,
+                    byteranges=get_byteranges(segments),
+                )
+
+            return None
 
         target_dir = self._target_dir
         LOGGER.info(f'Downloading video into {target_dir} ...')
 
-        with chdir(target_dir):
-            dump_dir = (target_dir / title).absolute()
-            dump_dir.mkdir(parents=True, exist_ok=True)
+        # no chdir here since dumpers may run concurrently in threads
+        dump_dir = (target_dir / title).absolute()
+        dump_dir.mkdir(parents=True, exist_ok=True)
+
+        # separate audio is downloaded along with video sharing request slots, and then muxed
+        dump_dir_audio = dump_dir / 'audio'
+        container = 'ts' if segments_audio else ''  # no remuxing before muxing
+        controller = self._get_controller(concurrent=self._concurrent)
+
+        # pipelined download includes concatenation
+        with metrics.phase('download'), ThreadPoolExecutor(max_workers=1) as executor:
+            future_audio = None
+
+            if segments_audio:
+                dump_dir_audio.mkdir(exist_ok=True)
+                future_audio = executor.submit(
+                    self._chunks_download,
+                    url_video_root=url_root,
+                    dump_dir=dump_dir_audio,
+                    chunk_names=[segment.uri for segment in segments_audio],
+                    start_chunk='',
+                    headers=headers,
+                    concurrent=self._concurrent,
+                    byteranges=get_byteranges(segments_audio),
+                    controller=controller,
+                )
 
-            url_root = url_playlist.rpartition('/')[0]  # strip playlist filename
+            if self._pipelined:
+                fpath_video = self._video_stream(
+                    url_video_root=url_root,
+                    dump_dir=dump_dir,
+                    chunk_names=chunk_names,
+                    start_chunk=start_chunk,
+                    headers=headers,
+                    byteranges=get_byteranges(segments),
+                    controller=controller,
+                    container=container,
+                )
 
-            self._chunks_download(
-                url_video_root=url_root,
-                dump_dir=dump_dir,
-                chunk_names=chunk_names,
-                start_chunk=start_chunk,
-                headers={'Referer': quote(url_referer.strip())},
-                concurrent=self._concurrent,
-            )
+            else:
+                self._chunks_download(
+                    url_video_root=url_root,
+                    dump_dir=dump_dir,
+                    chunk_names=chunk_names,
+                    start_chunk=start_chunk,
+                    headers=headers,
+                    concurrent=self._concurrent,
+                    byteranges=get_byteranges(segments),
+                    controller=controller,
+                )
+
+            if future_audio:
+                future_audio.result()
+
+        if self._store:
+            self._store.evict()
+
+        if (throughput := self._throughput) and metrics.counters.get('chunks_downloaded'):
+            throughput.record(url_root, metrics.summary()['bytes_per_second'])
+
+        if self._shard and not self._shard_complete(dump_dir):
+            self._metrics_write(title=title)
+            return dump_dir
 
-            fpath_video_target = Path(f'{title}.mp4').absolute()
-            fpath_video = self._video_concat(dump_dir)
+        try:
+            if not self._pipelined:
+                with metrics.phase('concat'):
+                    fpath_video = self._video_concat(dump_dir, container=container)
+
+            if segments_audio:
+                with metrics.phase('concat'):
+                    fpath_audio = self._video_concat(dump_dir_audio, container='ts')
+
+                with metrics.phase('mux'):
+                    fpath_video = self._video_mux(dump_dir, video=fpath_video, audio=fpath_audio)
+
+            fpath_video_target = (target_dir / f'{title}{fpath_video.suffix}').absolute()
 
             shutil.move(fpath_video, fpath_video_target)
-            shutil.rmtree(dump_dir, ignore_errors=True)
+
+        except BaseException:
+            if self._shard:
+                # so that a rerun of any shard concatenates the video
+                (dump_dir / 'merge.lock').unlink(missing_ok=True)
+            raise
+
+        shutil.rmtree(dump_dir, ignore_errors=True)
+
+        self._metrics_write(title=title)
 
         LOGGER.info(f'Video is ready: {fpath_video_target}')
         return fpath_video_target
@@ -356,4 +2032,75 @@ class Dumper:
 
     def run(self, params_or_hook: Callable[[str, str], str] | dict[str, str]) -> Path:
         params = params_or_hook if isinstance(params_or_hook, dict) else self._get_args(get_param_hook=params_or_hook)
+        self.metrics = Metrics()
+        if self._hedging:
+            self._hedging.reset()
         return self._gather(**params)
+
+    def stream(self, params: dict[str, str], sink: IO[bytes]) -> None:
+        """Downloads video writing its chunks in order into the sink instead of files.
+        Nothing is written on local disk (except for HTTP cache if enabled).
+
+        Sink is any object with `write(bytes)` method: a file, a pipe (e.g. stdin of a transcoder),
+        `socket.makefile('wb')`, a multipart uploader, etc. Downloads are held while the sink
+        is behind, so memory use is bounded by about `concurrent * 2` chunks.
+
+        Chunks are written as they are in the playlist (initialization section first, if any),
+        with no remuxing. Separate audio track is not streamed.
+
+        :param params: Dumper parameters, as for `run()`.
+        :param sink: Binary file-like object to write into.
+
+        """
+        assert not self._shard, 'Sharded download can not be streamed'
+
+        self.metrics = Metrics()
+        if self._hedging:
+            self._hedging.reset()
+
+        self._sink = sink
+
+        try:
+            self._gather(**params)
+
+        finally:
+            self._sink = None
+
+    def iter_chunks(self, params: dict[str, str], *, buffer: int = 0) -> Iterator[bytes]:
+        """Downloads video yielding its chunks in order. See `stream()`.
+
+        Download runs in a background thread and is held while the consumer is behind.
+        Stopping the iteration stops the download.
+
+        :param params: Dumper parameters, as for `run()`.
+        :param buffer: Max number of downloaded chunks waiting for the consumer. Defaults to `concurrent`.
+
+        """
+        sink = QueueSink(size=buffer or self._concurrent)
+        error = None
+
+        def produce() -> None:
+            nonlocal error
+
+            try:
+                self.stream(params, sink)
+
+            except Exception as e:  # noqa: BLE001 re-raised in the consumer thread
+                error = e
+
+            finally:
+                sink.close()
+
+        producer = Thread(target=produce, name='webinardump-stream', daemon=True)
+        producer.start()
+
+        try:
+            while (data := sink.queue.get()) is not None:
+                yield data
+
+        finally:
+            sink.abandon()
+            producer.join()
+
+        if error:
+            raise error
@@ -0,0 +1,113 @@
+"""Dumpers registry which doesn't import dumpers (and their network and HTML stacks)
+until a dumper is actually needed.
+
+Third-party dumpers may be registered with `webinardump.dumpers` entry points group:
+
+    [project.entry-points."webinardump.dumpers"]
+    "my.site" = "mypackage.dumpers:MySiteDumper"
+
+"""
+import sys
+import warnings
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .base import Dumper
+
+ENTRY_POINTS_GROUP = 'webinardump.dumpers'
+
+ENGINES = ('thread', 'async')
+"""Download engines."""
+
+CONTAINERS = ('mp4', 'ts')
+"""Resulting video containers."""
+
+
+class DumperInfo:
+    """Dumper metadata available without importing the dumper."""
+
+    __slots__ = ('cls', 'name', 'target', 'title')
+
+    def __init__(self, *, title: str, target: str, cls: type['Dumper'] | None = None):
+        """
+        :param title: Dumper title.
+        :param target: Dumper class path: <module>:<class name>.
+        :param cls: Dumper class if already imported.
+
+        """
+        self.title = title
+        self.target = target
+        self.cls = cls
+        self.name = target.rpartition(':')[2]
+        """Dumper class name."""
+
+    def __str__(self):
+        return self.title
+
+    def load(self) -> type['Dumper']:
+        """Imports and returns the dumper class."""
+        if self.cls is not None:
+            return self.cls
+
+        module, _, name = self.target.partition(':')
+        return getattr(import_module(module), name)
+
+
+BUILTIN = [
+    DumperInfo(title='webinar.ru', target='webinardump.dumpers.webinarru:WebinarRu'),
+    DumperInfo(title='Яндекс.Диск', target='webinardump.dumpers.yadisk:YandexDisk'),
+]
+
+
+def get_dumpers() -> list[DumperInfo]:
+    """Returns built-in dumpers followed by ones registered with entry points
+    and by other `Dumper` subclasses already imported (deprecated, see `Dumper.registry`).
+
+    """
+    from importlib.metadata import entry_points  # noqa: PLC0415 not needed for a dumper run
+
+    dumpers = [
+        *BUILTIN,
+        *(DumperInfo(title=entry.name, target=entry.value) for entry in entry_points(group=ENTRY_POINTS_GROUP)),
+    ]
+    targets = {dumper.target for dumper in dumpers}
+
+    # not imported here: if it's not imported yet, there are no subclasses either
+    if base := sys.modules.get(f'{__package__}.base'):
+        for cls in base.Dumper.registry:
+            target = f'{cls.__module__}:{cls.__qualname__}'
+            if target in targets:
+                continue
+
+            warnings.warn(
+                f'Dumper {cls.__qualname__} is registered by subclassing which is deprecated. '
+                f'Declare an entry point in `{ENTRY_POINTS_GROUP}` group instead.',
+                DeprecationWarning,
+                stacklevel=2,
+            )
+            dumpers.append(DumperInfo(title=cls.title or cls.__name__, target=target, cls=cls))
+            targets.add(target)
+
+    return dumpers
+
+
+def get_dumper(alias: str) -> type['Dumper']:
+    """Returns a dumper class by its title, class name or number (starting from 1) in the registry.
+
+    :param alias: Dumper alias.
+
+    """
+    alias = alias.strip()
+    dumpers = get_dumpers()
+
+    if alias.isdigit() and 0 < int(alias) <= len(dumpers):
+        return dumpers[int(alias) - 1].load()
+
+    alias = alias.lower()
+
+    for dumper in dumpers:
+        if alias in {dumper.title.lower(), dumper.name.lower()}:
+            return dumper.load()
+
+    raise LookupError(f'Unknown dumper: {alias}')
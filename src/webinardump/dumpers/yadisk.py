@@ -5,6 +5,7 @@ from typing import ClassVar
 from urllib.parse import quote, urlsplit
 
 from ..utils import LOGGER
+from ..variants import VariantCandidate
 from .base import Dumper
 
 
@@ -26,31 +27,29 @@ class YandexDisk(Dumper):
         manifest = json.loads(manifest)
         return manifest
 
-    def _get_playlist_and_title(self, manifest: dict) -> tuple[str, str]:
+    def _get_variants_and_title(self, manifest: dict) -> tuple[list[VariantCandidate], str]:
 
         resources = list(manifest['resources'].values())
         resource = resources[0]
 
-        dimension_max = 0
-        url_playlist = '<none>'
+        variants = []
 
         for stream_info in resource['videoStreams']['videos']:
             dimension, *_ = stream_info['dimension'].partition('p')
             if not dimension.isnumeric():
                 continue  # e.g. 'adaptive'
-            dimension = int(dimension)
-            if dimension_max < dimension:
-                dimension_max = dimension
-                url_playlist = stream_info['url']
+            variants.append((int(dimension), VariantCandidate(stream_info['url'], label=stream_info['dimension'])))
 
-        return url_playlist, resource['name']
+        variants.sort(key=lambda item: item[0], reverse=True)
 
-    def _get_shared_info(self, url: str) -> tuple[str, str]:
+        return [variant for _, variant in variants] or [VariantCandidate('<none>')], resource['name']
+
+    def _get_shared_info(self, url: str) -> tuple[list[VariantCandidate], str]:
         LOGGER.debug(f'Getting shared file from {url} ...')
 
         contents = self._get_response_simple(url)
 
-        objects = self._extract_js_objects(contents, key='environment')
+        objects = self._extract_js_objects(contents, key='environment', first=True)
 
         assert objects, f'File params not found for {url}'
         sk = objects[0]['environment']['sk']
@@ -59,39 +58,42 @@ class YandexDisk(Dumper):
         resource_path = resource_data['path']
         filepath = urlsplit(url).path.split('/', 3)[-1]
 
-        response_data = self._handle_response_simple(self._session.post(
+        response_data = self._handle_response_simple(self._request_simple(
+            'POST',
             'https://disk.yandex.ru/public/api/get-video-streams',
             data=quote(f'{{"hash": "{resource_path}/{filepath}", "sk": "{sk}"}}'),
             headers={'Content-Type': 'text/plain', 'X-Requested-With': 'XMLHttpRequest'}
         ), json=True)
 
-        playlist_candidate = None
-        greatest_resolution = 0
-
         videos = response_data.get('data', {}).get('videos', [])
+        videos = sorted(
+            (video for video in videos if video['size'].get('width', 0) > 0),
+            key=lambda video: video['size']['width'],
+            reverse=True,
+        )
 
-        for video in videos:
-            width = video['size'].get('width', 0)
-            if width > greatest_resolution:
-                greatest_resolution = width
-                playlist_candidate = video['url']
+        assert videos, f'No video candidates found for {url}'
 
-        assert playlist_candidate, f'No video candidates found for {url}'
+        variants = [
+            VariantCandidate(video['url'], label=f"{video['size']['width']}px")
+            for video in videos
+        ]
 
-        return playlist_candidate, Path(filepath).stem
+        return variants, Path(filepath).stem
 
     def _gather(self, *, url_video: str, start_chunk: str = '', **params) -> Path:
 
         if '/d/' in url_video:
-            url_playlist, title = self._get_shared_info(url_video)
+            variants, title = self._get_shared_info(url_video)
 
         else:
             manifest = self._get_manifest(url_video)
-            url_playlist, title = self._get_playlist_and_title(manifest)
+            variants, title = self._get_variants_and_title(manifest)
 
         return self._video_dump(
             title=title,
-            url_playlist=url_playlist,
+            url_playlist=variants[0].url,
             url_referer=url_video,
             start_chunk=start_chunk,
+            variants=variants,
         )
@@ -0,0 +1,184 @@
+import json
+import os
+from collections.abc import Generator
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from time import monotonic
+
+BUCKETS_SECONDS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """Values distribution over buckets (cumulative, as in Prometheus)."""
+
+    __slots__ = ('buckets', 'count', 'counts', 'sum')
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS_SECONDS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+
+    def quantile(self, q: float) -> float:
+        """Returns an upper bound of the bucket holding the given quantile.
+
+        :param q: Quantile (0-1).
+
+        """
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+
+        for bound, count in zip(self.buckets, self.counts, strict=True):
+            if count >= rank:
+                return bound
+
+        return float('inf')
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([f'{bound}' for bound in self.buckets], self.counts, strict=True)),
+        }
+
+
+class Metrics:
+    """Download metrics: counters, histograms and time per phase.
+
+    Thread-safe.
+
+    """
+
+    def __init__(self):
+        self.counters: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.phases: dict[str, float] = {}
+        self._started = monotonic()
+        self._lock = Lock()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since metrics creation."""
+        return monotonic() - self._started
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Increments a counter.
+
+        :param name: Counter name.
+        :param value: Value to add.
+
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        """Registers a value in a histogram.
+
+        :param name: Histogram name.
+        :param value: Value to register.
+
+        """
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None, None, None]:
+        """Measures time spent in a phase.
+
+        :param name: Phase name.
+
+        """
+        started = monotonic()
+        try:
+            yield
+        finally:
+            self.add_phase(name, monotonic() - started)
+
+    def summary(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            download_time = self.phases.get('download', 0)
+            phases = {name: round(val, 3) for name, val in self.phases.items()}
+            histograms = {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+
+        return {
+            'seconds': round(self.elapsed, 3),
+            'bytes_per_second': round(counters.get('bytes_downloaded', 0) / download_time) if download_time else 0,
+            'counters': counters,
+            'phases': phases,
+            'histograms': histograms,
+        }
+
+    def write_json(self, path: Path, **info) -> None:
+        """Writes metrics summary into a JSON file.
+
+        :param path: File path.
+        :param info: Additional information to put into the file.
+
+        """
+        path.write_text(json.dumps({**info, **self.summary()}, ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path: Path, *, labels: dict[str, str] | None = None) -> None:
+        """Writes metrics in Prometheus text format (e.g. for node exporter textfile collector).
+        File is replaced atomically.
+
+        :param path: File path.
+        :param labels: Labels to add to every metric.
+
+        """
+        def fmt_labels(extra: dict[str, str] | None = None) -> str:
+            items = {**(labels or {}), **(extra or {})}
+            if not items:
+                return ''
+            escaped = {key: f'{val}'.replace('\\', '\\\\').replace('"', '\\"') for key, val in items.items()}
+            return '{' + ','.join(f'{key}="{val}"' for key, val in escaped.items()) + '}'
+
+        prefix = 'webinardump'
+        lines = []
+
+        with self._lock:
+            for name, val in sorted(self.counters.items()):
+                lines.extend([f'# TYPE {prefix}_{name}_total counter', f'{prefix}_{name}_total{fmt_labels()} {val}'])
+
+            lines.append(f'# TYPE {prefix}_phase_seconds gauge')
+            lines.extend(
+                f'{prefix}_phase_seconds{fmt_labels({"phase": name})} {val:.3f}'
+                for name, val in sorted(self.phases.items())
+            )
+
+            for name, histogram in sorted(self.histograms.items()):
+                metric = f'{prefix}_{name}'
+                lines.append(f'# TYPE {metric} histogram')
+                lines.extend(
+                    f'{metric}_bucket{fmt_labels({"le": f"{bound}"})} {count}'
+                    for bound, count in zip(histogram.buckets, histogram.counts, strict=True)
+                )
+                lines.extend([
+                    f'{metric}_bucket{fmt_labels({"le": "+Inf"})} {histogram.count}',
+                    f'{metric}_sum{fmt_labels()} {histogram.sum:.3f}',
+                    f'{metric}_count{fmt_labels()} {histogram.count}',
+                ])
+
+        path_tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        path_tmp.write_text('\n'.join(lines) + '\n')
+        path_tmp.replace(path)
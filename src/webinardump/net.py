@@ -0,0 +1,800 @@
+import asyncio
+import heapq
+import json
+from collections import deque
+from collections.abc import Callable, Generator, Iterable, Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from itertools import count
+from pathlib import Path
+from random import uniform
+from threading import BoundedSemaphore, Condition, Lock, RLock, Thread, current_thread, local
+from time import monotonic, sleep
+from typing import Generic, TypeVar
+from urllib.parse import urlsplit
+
+import requests
+from requests import Session
+
+from .utils import LOGGER
+
+T = TypeVar('T')
+
+
+class SessionPool:
+    """Pool of HTTP sessions.
+
+    Either one session is shared by all threads,
+    or each thread (worker) gets its own session. Sessions of finished threads
+    are passed to new ones, so that their number is bounded by the number of threads
+    running at a time and connections are kept warm between thread pools.
+
+    Poisoned sessions (e.g. after connection errors) may be recycled.
+
+    """
+
+    def __init__(self, factory: Callable[[], Session], *, per_worker: bool = False):
+        """
+        :param factory: Callable returning a new session.
+        :param per_worker: Whether to keep a session per thread.
+
+        """
+        self._factory = factory
+        self._per_worker = per_worker
+        self._local = local()
+        self._lock = Lock()
+        self._shared: Session | None = None
+        self._sessions: list[Session] = []
+        self._owners: dict[Session, Thread] = {}  # threads using sessions per worker
+        self._retired = {'hits': 0, 'misses': 0}
+        self.recycled = 0
+
+    def _spawn(self) -> Session:
+        thread = current_thread()
+
+        with self._lock:
+            owners = self._owners
+
+            for session, owner in owners.items():
+                if not owner.is_alive():
+                    owners[session] = thread
+                    return session
+
+            session = self._factory()
+            self._sessions.append(session)
+            owners[session] = thread
+
+        return session
+
+    def get(self) -> Session:
+        """Returns a session for the current thread."""
+
+        if self._per_worker:
+            session = getattr(self._local, 'session', None)
+            if session is None:
+                session = self._local.session = self._spawn()
+            return session
+
+        if self._shared is None:
+            with self._lock:
+                if self._shared is None:
+                    self._shared = self._factory()
+                    self._sessions.append(self._shared)
+
+        return self._shared
+
+    def recycle(self, session: Session) -> None:
+        """Replaces the given (poisoned) session with a fresh one.
+
+        :param session: Session to replace.
+
+        """
+        with self._lock:
+            if session not in self._sessions:
+                return  # already recycled by another thread
+
+            self._sessions.remove(session)
+            self._owners.pop(session, None)
+
+            for key, val in self._get_stats(session).items():
+                self._retired[key] += val
+
+            self.recycled += 1
+
+            if session is self._shared:
+                # the shared session may still be in use by other threads, so it's not closed here
+                self._shared = None
+
+        if self._per_worker:
+            self._local.session = None
+            session.close()
+
+    @staticmethod
+    def _get_stats(session: Session) -> dict[str, int]:
+        hits = misses = 0
+
+        for adapter in session.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():  # container doesn't support iteration
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                misses += pool.num_connections
+                hits += pool.num_requests - pool.num_connections
+
+        return {'hits': hits, 'misses': misses}
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Connection pool stats: hits - requests reusing connections,
+        misses - new connections made (each one implies a handshake).
+
+        """
+        with self._lock:
+            stats = dict(self._retired)
+
+            for session in self._sessions:
+                for key, val in self._get_stats(session).items():
+                    stats[key] += val
+
+            stats['sessions'] = len(self._sessions)
+            stats['recycled'] = self.recycled
+
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+
+
+STATUS_CONGESTION = {429, 500, 502, 503, 504}
+
+
+def is_congestion(exc: BaseException) -> bool:
+    """Whether the exception signals that the server is overloaded or throttles us.
+
+    :param exc: Exception raised on request.
+
+    """
+    if isinstance(exc, (requests.Timeout, requests.ConnectionError, requests.exceptions.RetryError, TimeoutError)):
+        return True
+
+    response = getattr(exc, 'response', None)
+    return response is not None and response.status_code in STATUS_CONGESTION
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether the exception signals a transient failure worth retrying the request:
+    congestion, request timeout or connection broken while reading response body.
+
+    :param exc: Exception raised on request.
+
+    """
+    if is_congestion(exc) or isinstance(exc, requests.exceptions.ChunkedEncodingError):
+        return True
+
+    response = getattr(exc, 'response', None)
+    return response is not None and response.status_code == 408
+
+
+def is_connection_failure(exc: BaseException) -> bool:
+    """Whether the exception signals a broken connection (as opposed to an error response),
+    so that the session holding the connection is worth replacing.
+
+    :param exc: Exception raised on request.
+
+    """
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+
+def get_retry_after(exc: BaseException) -> float | None:
+    """Returns seconds to wait before retrying as advised by Retry-After header of the error response.
+
+    :param exc: Exception raised on request.
+
+    """
+    response = getattr(exc, 'response', None)
+    value = response.headers.get('Retry-After', '').strip() if response is not None else ''
+
+    if not value:
+        return None
+
+    if value.isdigit():
+        return float(value)
+
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ConcurrencyController:
+    """Adaptive limit of concurrent requests: additive increase, multiplicative decrease (AIMD).
+
+    Starts from the minimum and doubles the limit (slow start) until the first congestion.
+    After that the limit grows by one per `limit` successful requests while latency
+    stays healthy, and it is cut multiplicatively on throttling (429, 5xx) and timeouts.
+
+    With minimum equal to maximum acts as a fixed limit.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        minimum: int = 1,
+        maximum: int = 10,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+    ):
+        """
+        :param minimum: Min concurrent requests number.
+        :param maximum: Max concurrent requests number.
+        :param decrease: Factor to multiply the limit by on congestion.
+        :param latency_tolerance: How many times smoothed latency may exceed the best one
+            observed before the limit stops growing.
+
+        """
+        assert 1 <= minimum <= maximum, f'Invalid concurrency bounds: {minimum}-{maximum}'
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = minimum
+        self.in_flight = 0
+
+        self._decrease = decrease
+        self._latency_tolerance = latency_tolerance
+        self._latency_avg = 0.0
+        self._latency_best = 0.0
+        self._slow_start = True
+        self._successes = 0
+        self._cut_pending = 0  # requests sent before the last cut
+        self._cond = Condition()
+        self._started = monotonic()
+
+        self.history: list[tuple[float, int]] = [(0.0, self.limit)]
+        """Limit changes: (seconds since start, limit)."""
+
+    @property
+    def adaptive(self) -> bool:
+        return self.minimum != self.maximum
+
+    def try_acquire(self) -> bool:
+        """Takes a request slot if available. Returns False otherwise."""
+        with self._cond:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self) -> None:
+        """Takes a request slot, waits until one is available."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    def release(self, *, latency: float | None = None, congested: bool = False) -> None:
+        """Frees a request slot and adapts the limit according to the request outcome.
+
+        :param latency: Request duration (seconds) if the request succeeded.
+        :param congested: Whether the request failed due to congestion.
+
+        """
+        with self._cond:
+            self.in_flight -= 1
+
+            sent_before_cut = self._cut_pending > 0
+            if sent_before_cut:
+                self._cut_pending -= 1
+
+            if congested:
+                self._slow_start = False
+
+                if not sent_before_cut:  # otherwise it's the same congestion episode, already reacted
+                    self._on_congestion()
+
+            elif latency is not None:
+                self._on_success(latency)
+
+            self._cond.notify_all()
+
+    def _on_success(self, latency: float) -> None:
+        avg = self._latency_avg = 0.8 * self._latency_avg + 0.2 * latency if self._latency_avg else latency
+        best = self._latency_best = min(self._latency_best or avg, avg)
+
+        if avg > best * self._latency_tolerance:
+            return  # latency degrades, hold the limit
+
+        self._successes += 1
+
+        if self._slow_start:
+            self._successes = 0
+            self._set_limit(self.limit + 1)  # +1 per success doubles the limit per round
+
+        elif self._successes >= self.limit:
+            self._successes = 0
+            self._set_limit(self.limit + 1)
+
+    def _on_congestion(self) -> None:
+        self._successes = 0
+        self._cut_pending = self.in_flight
+        self._set_limit(int(self.limit * self._decrease))
+
+    def _set_limit(self, limit: int) -> None:
+        limit = min(max(limit, self.minimum), self.maximum)
+
+        if limit == self.limit:
+            return
+
+        self.limit = limit
+        self.history.append((round(monotonic() - self._started, 1), limit))
+        LOGGER.debug(f'Concurrency limit: {limit}')
+
+
+class RequestLimits:
+    """Request slots shared by several dumpers in a process:
+    a global budget and a budget per host.
+
+    """
+
+    def __init__(self, *, total: int, per_host: int = 0):
+        """
+        :param total: Max concurrent requests number overall.
+        :param per_host: Max concurrent requests number to one host. 0 - no limit.
+
+        """
+        self._total = BoundedSemaphore(total)
+        self._per_host = per_host
+        self._hosts: dict[str, BoundedSemaphore] = {}
+        self._lock = Lock()
+
+    def _get_host_slots(self, url: str) -> BoundedSemaphore | None:
+        if not self._per_host:
+            return None
+
+        host = urlsplit(url).netloc
+
+        with self._lock:
+            slots = self._hosts.get(host)
+            if slots is None:
+                slots = self._hosts[host] = BoundedSemaphore(self._per_host)
+
+        return slots
+
+    def acquire(self, url: str) -> None:
+        """Takes a request slot for the URL, waits until one is available.
+
+        :param url: URL to request.
+
+        """
+        if host_slots := self._get_host_slots(url):
+            host_slots.acquire()
+        self._total.acquire()
+
+    async def acquire_async(self, url: str) -> None:
+        """Asyncio version of `acquire()`.
+        If cancelled, a slot taken by the thread still waiting for it is freed.
+
+        :param url: URL to request.
+
+        """
+        lock = Lock()
+        state = {'cancelled': False, 'acquired': False}
+
+        def acquire() -> None:
+            self.acquire(url)
+            with lock:
+                if state['cancelled']:
+                    self.release(url)  # nobody is waiting for the slot already
+                else:
+                    state['acquired'] = True
+
+        try:
+            await asyncio.to_thread(acquire)
+
+        except asyncio.CancelledError:
+            with lock:
+                state['cancelled'] = True
+                if state['acquired']:
+                    self.release(url)
+            raise
+
+    def release(self, url: str) -> None:
+        """Frees a request slot for the URL.
+
+        :param url: Requested URL.
+
+        """
+        self._total.release()
+        if host_slots := self._get_host_slots(url):
+            host_slots.release()
+
+    @contextmanager
+    def slot(self, url: str) -> Generator[None, None, None]:
+        self.acquire(url)
+        try:
+            yield
+        finally:
+            self.release(url)
+
+
+class TokenBucket:
+    """Token bucket: tokens are accrued at the given rate up to the burst size.
+
+    Takers may go into debt: tokens are taken at once and the taker waits until the debt
+    is repaid, so that large takes (e.g. network reads) are not starved by small ones.
+
+    Thread-safe.
+
+    """
+
+    def __init__(self, rate: float, *, burst: float = 0):
+        """
+        :param rate: Tokens per second.
+        :param burst: Max tokens accrued. Defaults to one second worth of tokens.
+
+        """
+        assert rate > 0, f'Invalid rate: {rate}'
+
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst
+        self._updated = monotonic()
+        self._lock = Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Takes tokens. Returns seconds to wait before using them.
+
+        :param amount: Tokens number.
+
+        """
+        with self._lock:
+            now = monotonic()
+            tokens = self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate) - amount
+            self._updated = now
+
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+
+class RateLimiter:
+    """Bandwidth and request rate limits shared by all downloads in a process:
+    overall and per host.
+
+    Thread-safe. Asyncio code should use `*_async()` methods.
+
+    When pickled (e.g. passed into shard processes) the limiter is recreated with the same limits,
+    so limits apply to each process separately.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        bytes_per_second: float = 0,
+        requests_per_second: float = 0,
+        hosts: dict[str, tuple[float, float]] | None = None,
+    ):
+        """
+        :param bytes_per_second: Max download rate overall. 0 - no limit.
+        :param requests_per_second: Max requests rate overall. 0 - no limit.
+        :param hosts: Limits per host: host -> (bytes per second, requests per second), 0 - no limit.
+            Limits of `*` host apply to each host not listed separately.
+
+        """
+        self._bytes_per_second = bytes_per_second
+        self._requests_per_second = requests_per_second
+        self._hosts_limits = hosts or {}
+
+        self._total = self._make_buckets((bytes_per_second, requests_per_second))
+        self._hosts: dict[str, tuple[TokenBucket | None, TokenBucket | None]] = {}
+        self._lock = Lock()
+
+    def __getstate__(self) -> dict:
+        return {
+            'bytes_per_second': self._bytes_per_second,
+            'requests_per_second': self._requests_per_second,
+            'hosts': self._hosts_limits,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    @staticmethod
+    def _make_buckets(limits: tuple[float, float]) -> tuple[TokenBucket | None, TokenBucket | None]:
+        return tuple(TokenBucket(rate) if rate else None for rate in limits)
+
+    def _get_buckets(self, url: str) -> list[tuple[TokenBucket | None, TokenBucket | None]]:
+        if not self._hosts_limits:
+            return [self._total]
+
+        host = urlsplit(url).hostname or ''
+
+        with self._lock:
+            buckets = self._hosts.get(host)
+            if buckets is None:
+                limits = self._hosts_limits.get(host) or self._hosts_limits.get('*') or (0, 0)
+                buckets = self._hosts[host] = self._make_buckets(limits)
+
+        return [self._total, buckets]
+
+    def _reserve(self, url: str, *, size: int = 0, requests: int = 0) -> float:
+        delay = 0.0
+
+        for bucket_bytes, bucket_requests in self._get_buckets(url):
+            if size and bucket_bytes:
+                delay = max(delay, bucket_bytes.reserve(size))
+            if requests and bucket_requests:
+                delay = max(delay, bucket_requests.reserve(requests))
+
+        return delay
+
+    def request(self, url: str) -> None:
+        """Waits until a request to the URL is allowed.
+
+        :param url: URL to request.
+
+        """
+        if delay := self._reserve(url, requests=1):
+            sleep(delay)
+
+    def received(self, url: str, size: int) -> None:
+        """Registers received data, waits if bandwidth is exceeded.
+
+        :param url: Requested URL.
+        :param size: Received data size in bytes.
+
+        """
+        if delay := self._reserve(url, size=size):
+            sleep(delay)
+
+    async def request_async(self, url: str) -> None:
+        """Asyncio version of `request()`."""
+        if delay := self._reserve(url, requests=1):
+            await asyncio.sleep(delay)
+
+    async def received_async(self, url: str, size: int) -> None:
+        """Asyncio version of `received()`."""
+        if delay := self._reserve(url, size=size):
+            await asyncio.sleep(delay)
+
+    def iter_limited(self, chunks: Iterable[bytes], *, url: str) -> Iterator[bytes]:
+        """Yields response body chunks respecting bandwidth limits.
+
+        :param chunks: Response body chunks (e.g. from `iter_content()`).
+        :param url: Requested URL.
+
+        """
+        for data in chunks:
+            self.received(url, len(data))
+            yield data
+
+
+
+class HedgePolicy:
+    """Decides when to hedge a request, i.e. to send a duplicate of a slow request
+    and to take whichever response comes first.
+
+    A request is hedged when it runs longer than the given percentile of latencies
+    recently observed for the host. Extra requests are capped by a budget:
+    a share of requests made.
+
+    Thread-safe.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        percentile: float = 0.95,
+        budget: float = 0.05,
+        samples_min: int = 20,
+        samples_max: int = 500,
+    ):
+        """
+        :param percentile: Latency percentile (0-1) after which a request is hedged.
+        :param budget: Max share of extra requests (0-1).
+        :param samples_min: Latencies number to observe for a host before hedging requests to it.
+        :param samples_max: Latencies number to keep for a host.
+
+        """
+        assert 0 < percentile < 1, f'Invalid percentile: {percentile}'
+
+        self.percentile = percentile
+        self.budget = budget
+        self._samples_min = samples_min
+        self._samples_max = samples_max
+        self._hosts: dict[str, deque[float]] = {}
+        self._delays: dict[str, float | None] = {}
+        self._requests = 0
+        self._hedged = 0
+        self._lock = Lock()
+
+    def observe(self, url: str, latency: float) -> None:
+        """Registers a request latency.
+
+        :param url: Requested URL.
+        :param latency: Seconds from request start till its response is received completely.
+
+        """
+        host = urlsplit(url).netloc
+
+        with self._lock:
+            samples = self._hosts.get(host)
+            if samples is None:
+                samples = self._hosts[host] = deque(maxlen=self._samples_max)
+            samples.append(latency)
+            self._delays.pop(host, None)
+            self._requests += 1
+
+    def get_delay(self, url: str) -> float | None:
+        """Returns seconds after which a request to the URL is to be hedged.
+        None if there are not enough observations for the host yet.
+
+        :param url: URL to request.
+
+        """
+        host = urlsplit(url).netloc
+
+        with self._lock:
+            if host in self._delays:
+                return self._delays[host]
+
+            samples = self._hosts.get(host) or ()
+            delay = None
+
+            if len(samples) >= self._samples_min:
+                delay = sorted(samples)[int(self.percentile * (len(samples) - 1))]
+
+            self._delays[host] = delay
+
+        return delay
+
+    def try_spend(self) -> bool:
+        """Takes an extra request from the budget. Returns False if the budget is exhausted."""
+        with self._lock:
+            if self._hedged + 1 > self.budget * max(self._requests, self._samples_min):
+                return False
+            self._hedged += 1
+            return True
+
+    def reset(self) -> None:
+        """Resets the budget (e.g. for a new run). Observed latencies are kept."""
+        with self._lock:
+            self._requests = 0
+            self._hedged = 0
+
+
+class Race:
+    """Attempts of a hedged request: the first attempt to finish wins,
+    the others are abandoned.
+
+    """
+
+    def __init__(self):
+        self.lock = RLock()
+        """Held to act atomically with the win (e.g. put results in place)."""
+        self.settled = False
+        self.started: float | None = None
+        """Time the original request was sent. None - it is still waiting for its turn."""
+        self._attempts = 0
+
+    def start(self) -> int:
+        """Registers an attempt about to send its request.
+        Returns its number: 0 - the original request, 1+ - hedges.
+
+        """
+        with self.lock:
+            attempt = self._attempts
+            self._attempts += 1
+            if not attempt:
+                self.started = monotonic()
+        return attempt
+
+    def claim(self) -> bool:
+        """Claims the win. Returns False if another attempt has already won."""
+        with self.lock:
+            if self.settled:
+                return False
+            self.settled = True
+            return True
+
+    def iter_unsettled(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Yields response body chunks until another attempt wins.
+
+        :param chunks: Response body chunks.
+
+        """
+        for data in chunks:
+            if self.settled:
+                return
+            yield data
+
+
+class RetryScheduler(Generic[T]):
+    """Schedules retries of failed download tasks (chunks) instead of aborting the whole download.
+
+    Transient failures are retried with jittered exponential backoff or after the delay
+    advised by Retry-After header. Tasks failed finally are collected for a report.
+
+    Thread-safe.
+
+    """
+
+    def __init__(self, *, attempts: int = 5, backoff: float = 1, backoff_max: float = 60):
+        """
+        :param attempts: Max attempts for a task.
+        :param backoff: Base delay (seconds) doubled with each attempt.
+        :param backoff_max: Max backoff delay (seconds). Retry-After is honored regardless.
+
+        """
+        self.attempts = attempts
+        self._backoff = backoff
+        self._backoff_max = backoff_max
+        self._queue: list[tuple[float, int, T]] = []
+        self._seq = count()  # keeps items out of comparison
+        self._tries: dict[str, int] = {}
+        self._lock = Lock()
+
+        self.failed: list[dict] = []
+        """Tasks failed finally: chunk, error, attempts."""
+
+    def get_delay(self, exc: BaseException, *, attempt: int) -> float:
+        """Returns seconds to wait before the given attempt.
+
+        :param exc: Exception the previous attempt failed with.
+        :param attempt: Attempt number starting from 1 for the first retry.
+
+        """
+        retry_after = get_retry_after(exc)
+
+        if retry_after is not None:
+            return retry_after
+
+        return uniform(0, min(self._backoff_max, self._backoff * 2 ** attempt))  # full jitter
+
+    def schedule(self, key: str, item: T, exc: BaseException, *, transient: bool) -> bool:
+        """Schedules a retry of a failed task. Returns False if the task has failed finally.
+
+        :param key: Task key (e.g. chunk name).
+        :param item: Task to return from `pop_due()` when it's time to retry it.
+        :param exc: Exception the task failed with.
+        :param transient: Whether the failure is transient and the task is worth retrying.
+
+        """
+        with self._lock:
+            tries = self._tries[key] = self._tries.get(key, 0) + 1
+
+            if not transient or tries >= self.attempts:
+                LOGGER.error(f'Failed to download {key} after {tries} attempt(s): {exc}')
+                self.failed.append({'chunk': key, 'error': f'{exc}', 'attempts': tries})
+                return False
+
+            delay = self.get_delay(exc, attempt=tries)
+            heapq.heappush(self._queue, (monotonic() + delay, next(self._seq), item))
+
+        LOGGER.warning(f'Failed to download {key}: {exc}. Retrying in {delay:.1f} s ...')
+        return True
+
+    def pop_due(self) -> T | None:
+        """Returns a task which is due to retry, if any."""
+        with self._lock:
+            if self._queue and self._queue[0][0] <= monotonic():
+                return heapq.heappop(self._queue)[2]
+        return None
+
+    def get_wait(self) -> float | None:
+        """Returns seconds until the next retry is due. None if no retries are scheduled."""
+        with self._lock:
+            if not self._queue:
+                return None
+            return max(self._queue[0][0] - monotonic(), 0)
+
+    def write_report(self, path: Path) -> None:
+        """Writes failed tasks report into a JSON file.
+
+        :param path: File path.
+
+        """
+        path.write_text(json.dumps({'failed': self.failed}, ensure_ascii=False, indent=2))
@@ -0,0 +1,329 @@
+"""HLS (M3U8) playlists parsing.
+
+Supports master playlists (variant streams and renditions) and media playlists
+(segments with durations, byte ranges, init sections and discontinuities).
+
+"""
+import re
+from collections.abc import Iterable, Iterator
+from io import StringIO
+
+RE_ATTR = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def parse_attributes(value: str) -> dict[str, str]:
+    """Parses tag attributes list. E.g.: TYPE=AUDIO,URI="a1/index.m3u8"
+
+    :param value: Attributes string.
+
+    """
+    return {key: val.strip('"') for key, val in RE_ATTR.findall(value)}
+
+
+def parse_byterange(value: str) -> tuple[int, int | None]:
+    """Parses byte range <length>[@<offset>]. Returns (length, offset).
+
+    :param value: Byte range string.
+
+    """
+    length, _, offset = value.partition('@')
+    return int(length), int(offset) if offset else None
+
+
+class InitMap:
+    """Media initialization section (EXT-X-MAP)."""
+
+    __slots__ = ('byterange', 'uri')
+
+    def __init__(self, uri: str, *, byterange: tuple[int, int] | None = None):
+        self.uri = uri
+        self.byterange = byterange
+        """(length, offset)"""
+
+    def __repr__(self):
+        return f'InitMap({self.uri!r}, byterange={self.byterange})'
+
+
+class Segment:
+    """Media segment."""
+
+    __slots__ = ('byterange', 'discontinuity', 'duration', 'init', 'sequence', 'uri')
+
+    def __init__(
+        self,
+        uri: str,
+        *,
+        duration: float = 0.0,
+        sequence: int = 0,
+        discontinuity: int = 0,
+        byterange: tuple[int, int] | None = None,
+        init: InitMap | None = None,
+    ):
+        self.uri = uri
+        self.duration = duration
+        self.sequence = sequence
+        """Media sequence number."""
+
+        self.discontinuity = discontinuity
+        """Discontinuity sequence number. Changes after each EXT-X-DISCONTINUITY."""
+
+        self.byterange = byterange
+        """(length, offset)"""
+
+        self.init = init
+        """Initialization section shared by segments."""
+
+    def __repr__(self):
+        return f'Segment({self.uri!r}, sequence={self.sequence})'
+
+
+class Variant:
+    """Variant stream (EXT-X-STREAM-INF)."""
+
+    __slots__ = ('audio', 'bandwidth', 'codecs', 'resolution', 'uri')
+
+    def __init__(self, uri: str, *, attrs: dict[str, str]):
+        self.uri = uri
+        self.bandwidth = int(attrs.get('BANDWIDTH', 0))
+        self.codecs = attrs.get('CODECS', '')
+        self.audio = attrs.get('AUDIO', '')
+        """Audio renditions group ID."""
+
+        width, _, height = attrs.get('RESOLUTION', '').partition('x')
+        self.resolution: tuple[int, int] | None = (int(width), int(height)) if height else None
+
+    def __repr__(self):
+        return f'Variant({self.uri!r}, bandwidth={self.bandwidth})'
+
+
+class Rendition:
+    """Alternative rendition (EXT-X-MEDIA)."""
+
+    __slots__ = ('autoselect', 'default', 'group_id', 'language', 'name', 'type', 'uri')
+
+    def __init__(self, *, attrs: dict[str, str]):
+        self.type = attrs.get('TYPE', '')
+        self.group_id = attrs.get('GROUP-ID', '')
+        self.name = attrs.get('NAME', '')
+        self.language = attrs.get('LANGUAGE', '')
+        self.uri = attrs.get('URI', '')
+        self.default = attrs.get('DEFAULT') == 'YES'
+        self.autoselect = attrs.get('AUTOSELECT') == 'YES'
+
+    def __repr__(self):
+        return f'Rendition({self.type}, {self.uri!r}, group={self.group_id!r})'
+
+
+class Playlist:
+    """HLS playlist."""
+
+    __slots__ = (
+        'discontinuity_sequence',
+        'endlist',
+        'media_sequence',
+        'renditions',
+        'segments',
+        'target_duration',
+        'variants',
+        'version',
+    )
+
+    def __init__(self):
+        self.version = 0
+        self.target_duration = 0.0
+        self.media_sequence = 0
+        self.discontinuity_sequence = 0
+        self.endlist = False
+        """Whether the playlist is complete (not live)."""
+
+        self.variants: list[Variant] = []
+        self.renditions: list[Rendition] = []
+        self.segments: list[Segment] = []
+
+    @property
+    def is_master(self) -> bool:
+        return bool(self.variants)
+
+    @property
+    def duration(self) -> float:
+        return sum(segment.duration for segment in self.segments)
+
+    def feed(self, lines: Iterable[str]) -> Iterator[Segment]:
+        """Parses playlist lines filling playlist attributes and yielding
+        media segments as they come, without keeping them.
+
+        :param lines: Playlist lines.
+
+        """
+        duration = 0.0
+        byterange = None
+        init = None
+        stream_attrs = None
+        discontinuity = self.discontinuity_sequence
+        sequence = self.media_sequence
+        # byte range offset may be omitted, then it follows the previous range of the same resource
+        prev_uri, prev_end = '', 0
+
+        for line in lines:
+            line = line.strip()
+
+            if not line:
+                continue
+
+            if line.startswith('#'):
+                tag, _, value = line[1:].partition(':')
+
+                match tag:
+                    case 'EXTINF':
+                        duration = float(value.partition(',')[0] or 0)
+
+                    case 'EXT-X-BYTERANGE':
+                        byterange = parse_byterange(value)
+
+                    case 'EXT-X-DISCONTINUITY':
+                        discontinuity += 1
+
+                    case 'EXT-X-MAP':
+                        attrs = parse_attributes(value)
+                        init_range = attrs.get('BYTERANGE')
+                        init_byterange = None
+                        if init_range:
+                            length, offset = parse_byterange(init_range)
+                            # there is no previous range to continue: the section starts the resource
+                            init_byterange = (length, offset or 0)
+                        init = InitMap(attrs.get('URI', ''), byterange=init_byterange)
+
+                    case 'EXT-X-STREAM-INF':
+                        stream_attrs = parse_attributes(value)
+
+                    case 'EXT-X-MEDIA':
+                        self.renditions.append(Rendition(attrs=parse_attributes(value)))
+
+                    case 'EXT-X-MEDIA-SEQUENCE':
+                        sequence = self.media_sequence = int(value)
+
+                    case 'EXT-X-DISCONTINUITY-SEQUENCE':
+                        discontinuity = self.discontinuity_sequence = int(value)
+
+                    case 'EXT-X-TARGETDURATION':
+                        self.target_duration = float(value)
+
+                    case 'EXT-X-VERSION':
+                        self.version = int(value)
+
+                    case 'EXT-X-ENDLIST':
+                        self.endlist = True
+
+                continue
+
+            if stream_attrs is not None:
+                self.variants.append(Variant(line, attrs=stream_attrs))
+                stream_attrs = None
+                continue
+
+            if byterange:
+                length, offset = byterange
+                if offset is None:
+                    offset = prev_end if line == prev_uri else 0
+                byterange = (length, offset)
+                prev_uri, prev_end = line, offset + length
+
+            yield Segment(
+                line,
+                duration=duration,
+                sequence=sequence,
+                discontinuity=discontinuity,
+                byterange=byterange,
+                init=init,
+            )
+
+            sequence += 1
+            duration = 0.0
+            byterange = None
+
+
+def parse_playlist(source: str | Iterable[str]) -> Playlist:
+    """Parses HLS playlist.
+
+    :param source: Playlist contents or an iterable of its lines.
+
+    """
+    if isinstance(source, str):
+        source = StringIO(source)  # iterate lines without splitting the whole text
+
+    playlist = Playlist()
+    playlist.segments.extend(playlist.feed(source))
+
+    return playlist
+
+
+class RangeRequest:
+    """HTTP request for a contiguous byte range of a resource
+    covering one or more adjacent segments.
+
+    """
+
+    __slots__ = ('length', 'offset', 'parts', 'uri')
+
+    def __init__(self, uri: str, *, offset: int = 0, length: int | None = None):
+        self.uri = uri
+        self.offset = offset
+        self.length = length
+        """None - the whole resource."""
+
+        self.parts: list[tuple[int, int | None]] = []
+        """(segment index, segment length)"""
+
+    def __repr__(self):
+        return f'RangeRequest({self.uri!r}, offset={self.offset}, length={self.length}, parts={len(self.parts)})'
+
+    @property
+    def range_header(self) -> str:
+        """Value for Range HTTP header. Empty for the whole resource."""
+        if self.length is None:
+            return ''
+        return f'bytes={self.offset}-{self.offset + self.length - 1}'
+
+
+def plan_range_requests(
+    segments: Iterable[tuple[int, str, tuple[int, int] | None]],
+    *,
+    size_max: int = 8 * 1024 * 1024,
+) -> Iterator[RangeRequest]:
+    """Merges adjacent byte ranges of the same resource into larger requests.
+
+    :param segments: Segments as (index, uri, byte range as (length, offset) or None for the whole resource).
+    :param size_max: Max bytes number for one request.
+
+    """
+    current = None
+
+    for idx, uri, byterange in segments:
+
+        if byterange is None:
+            if current:
+                yield current
+                current = None
+
+            request = RangeRequest(uri)
+            request.parts.append((idx, None))
+            yield request
+            continue
+
+        length, offset = byterange
+
+        if (
+            current is None
+            or current.uri != uri
+            or current.offset + current.length != offset
+            or current.length + length > size_max
+        ):
+            if current:
+                yield current
+            current = RangeRequest(uri, offset=offset, length=0)
+
+        current.length += length
+        current.parts.append((idx, length))
+
+    if current:
+        yield current
@@ -0,0 +1,48 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .dumpers import Dumper
+from .utils import LOGGER
+
+
+def run_shard(dumper_cls: type[Dumper], *, dumper_kwargs: dict, params: dict[str, str], shard: tuple[int, int]) -> Path:
+    """Runs a dumper for one shard of video chunks.
+    Returns video path if the shard has concatenated the video, or chunks directory path.
+
+    :param dumper_cls: Dumper class.
+    :param dumper_kwargs: Keyword arguments to instantiate the dumper with.
+    :param params: Dumper run parameters.
+    :param shard: (shard number starting from 1, shards total)
+
+    """
+    return dumper_cls(**dumper_kwargs, shard=shard).run(params)
+
+
+def run_sharded(dumper_cls: type[Dumper], *, dumper_kwargs: dict, params: dict[str, str], shards: int) -> Path:
+    """Downloads a video splitting its chunks between several processes.
+    Returns video path.
+
+    If some shards fail, they can be rerun independently with `run_shard()`.
+
+    :param dumper_cls: Dumper class.
+    :param dumper_kwargs: Keyword arguments to instantiate dumpers with.
+    :param params: Dumper run parameters.
+    :param shards: Number of shards (processes).
+
+    """
+    LOGGER.info(f'Downloading in {shards} shards ...')
+
+    with ProcessPoolExecutor(max_workers=shards) as executor:
+        futures = [
+            executor.submit(
+                run_shard, dumper_cls, dumper_kwargs=dumper_kwargs, params=params, shard=(shard_num, shards)
+            )
+            for shard_num in range(1, shards + 1)
+        ]
+        results = [future.result() for future in futures]
+
+    # shards not concatenating the video return chunks directory
+    videos = [result for result in results if result.is_file()]
+    assert videos, 'Video has not been concatenated'
+
+    return videos[0]
@@ -0,0 +1,184 @@
+import os
+from contextlib import suppress
+from hashlib import sha256
+from pathlib import Path
+from threading import get_ident
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from .utils import LOGGER, concat_files
+
+# query parameters (lowercase) holding access tokens and signatures which change between runs
+QUERY_VOLATILE = {
+    'token', 'access_token', 'auth', 'sign', 'signature', 'sig', 'expires', 'exp',
+    'policy', 'key-pair-id', 'hdnts', 'hdnea', 'md5', 'e',
+}
+QUERY_VOLATILE_PREFIXES = ('x-amz-', 'x-goog-')  # presigned cloud storage URLs
+
+
+def get_chunk_key(url: str, *, byterange: tuple[int, int] | None = None) -> str:
+    """Returns chunk key: normalized URL (without query parameters known to hold
+    volatile access tokens, see `QUERY_VOLATILE`) and byte range if any.
+
+    :param url: Chunk URL.
+    :param byterange: Chunk byte range as (length, offset).
+
+    """
+    parts = urlsplit(url)
+    key = f'{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path}'
+
+    # the rest of parameters may address the chunk, e.g. /get?seg=1
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in QUERY_VOLATILE and not name.lower().startswith(QUERY_VOLATILE_PREFIXES)
+    )
+
+    if query:
+        key = f'{key}?{urlencode(query)}'
+
+    if byterange:
+        length, offset = byterange
+        key = f'{key} {length}@{offset}'
+
+    return key
+
+
+class ChunkStore:
+    """Content-addressed store of video chunks shared by runs and titles.
+
+    Chunk contents are kept under their hash (so that equal chunks are stored once),
+    and an index maps chunk keys (see `get_chunk_key()`) to content hashes.
+
+    Chunks are hardlinked into and from the store where possible, so that no data is copied.
+    Least recently used chunks are evicted by `evict()` when store size exceeds the limit.
+
+    """
+
+    def __init__(self, path: Path, *, size_max: int = 10 * 1024 ** 3):
+        """
+        :param path: Store directory.
+        :param size_max: Max store size in bytes.
+
+        """
+        self._path_objects = path / 'objects'
+        self._path_index = path / 'index'
+        self._size_max = size_max
+
+        self._path_objects.mkdir(parents=True, exist_ok=True)
+        self._path_index.mkdir(parents=True, exist_ok=True)
+
+    def _get_index_path(self, url: str, byterange: tuple[int, int] | None) -> Path:
+        return self._path_index / sha256(get_chunk_key(url, byterange=byterange).encode()).hexdigest()
+
+    def _get_object_path(self, digest: str) -> Path:
+        return self._path_objects / digest[:2] / digest
+
+    @staticmethod
+    def _place(source: Path, target: Path) -> None:
+        try:
+            os.link(source, target)
+
+        except FileExistsError:
+            raise
+
+        except OSError:
+            # e.g. another filesystem; copy_file_range makes a reflink where supported
+            path_tmp = target.with_name(f'{target.name}.{os.getpid()}.{get_ident()}.tmp')
+            concat_files([source], path_tmp)
+            path_tmp.replace(target)
+
+    def get(self, url: str, *, byterange: tuple[int, int] | None = None) -> Path | None:
+        """Returns stored chunk file path or None if the chunk is not in the store.
+
+        :param url: Chunk URL.
+        :param byterange: Chunk byte range as (length, offset).
+
+        """
+        path_index = self._get_index_path(url, byterange)
+
+        try:
+            digest = path_index.read_text()
+
+        except FileNotFoundError:
+            return None
+
+        path_object = self._get_object_path(digest)
+
+        if not path_object.exists():
+            path_index.unlink(missing_ok=True)  # evicted
+            return None
+
+        return path_object
+
+    def link(self, url: str, target: Path, *, byterange: tuple[int, int] | None = None) -> bool:
+        """Places stored chunk at the target path. Returns False if the chunk is not in the store.
+
+        :param url: Chunk URL.
+        :param target: Chunk file path.
+        :param byterange: Chunk byte range as (length, offset).
+
+        """
+        path_object = self.get(url, byterange=byterange)
+
+        if path_object is None:
+            return False
+
+        target.unlink(missing_ok=True)  # partially downloaded before
+
+        try:
+            self._place(path_object, target)
+            os.utime(path_object)  # mark as recently used
+
+        except FileNotFoundError:  # evicted concurrently
+            return False
+
+        return True
+
+    def add(self, url: str, path: Path, *, byterange: tuple[int, int] | None = None) -> None:
+        """Puts a downloaded chunk into the store.
+
+        :param url: Chunk URL.
+        :param path: Chunk file path.
+        :param byterange: Chunk byte range as (length, offset).
+
+        """
+        digest = sha256()
+
+        with path.open('rb') as f:
+            while data := f.read(1024 * 1024):
+                digest.update(data)
+
+        digest = digest.hexdigest()
+        path_object = self._get_object_path(digest)
+
+        if not path_object.exists():
+            path_object.parent.mkdir(exist_ok=True)
+            with suppress(FileExistsError):  # added concurrently
+                self._place(path, path_object)
+
+        path_index = self._get_index_path(url, byterange)
+        path_tmp = path_index.with_name(f'{path_index.name}.{os.getpid()}.{get_ident()}.tmp')
+        path_tmp.write_text(digest)
+        path_tmp.replace(path_index)
+
+    def evict(self) -> None:
+        """Removes least recently used chunks while store size exceeds the limit."""
+
+        objects = []
+
+        for path in self._path_objects.glob('*/*'):
+            with suppress(FileNotFoundError):
+                stat = path.stat()
+                objects.append((stat.st_mtime, stat.st_size, path))
+
+        size_total = sum(size for _, size, _ in objects)
+
+        if size_total <= self._size_max:
+            return
+
+        LOGGER.info(f'Evicting chunks from store ({round(size_total / 1024 ** 2)} MiB) ...')
+
+        for _, size, path in sorted(objects, key=lambda item: item[0]):
+            if size_total <= self._size_max:
+                break
+            path.unlink(missing_ok=True)
+            size_total -= size
@@ -1,7 +1,14 @@
 import logging
+import os
 import re
+from collections.abc import Generator, Iterable, Iterator
+from contextlib import contextmanager
 from pathlib import Path
-from subprocess import check_call
+from queue import Empty, Full, Queue
+from socket import gethostname
+from subprocess import PIPE, CalledProcessError, Popen, check_call
+from threading import Condition, Lock, Thread
+from typing import IO
 
 LOGGER = logging.getLogger('webinardump')
 RE_DIGITS = re.compile(r'(\d+)')
@@ -12,11 +19,440 @@ def call(cmd: str, *, path: Path):
     return check_call(cmd, cwd=path, shell=True)
 
 
-def get_files_sorted(path: Path, *, suffixes: set[str]) -> list[str]:
+@contextmanager
+def call_piped(cmd: str, *, path: Path) -> Generator[IO[bytes], None, None]:
+    """Runs a command yielding its stdin to write into.
+
+    :param cmd: Command to run.
+    :param path: Working directory.
+
+    """
+    with Popen(cmd, cwd=path, shell=True, stdin=PIPE) as proc:
+        try:
+            yield proc.stdin
+
+        finally:
+            proc.stdin.close()
+
+    if proc.returncode:
+        raise CalledProcessError(proc.returncode, cmd)
+
+
+def _copy_fd(fd_in: int, fd_out: int, size: int) -> None:
+    """Copies data between file descriptors current positions
+    in kernel space if possible (copy_file_range, sendfile).
+
+    :param fd_in: Source file descriptor.
+    :param fd_out: Target file descriptor.
+    :param size: Bytes number to copy.
+
+    """
+    left = size
+    methods = []
+
+    if hasattr(os, 'copy_file_range'):
+        methods.append(os.copy_file_range)
+
+    if hasattr(os, 'sendfile'):
+        methods.append(lambda src, dst, count: os.sendfile(dst, src, None, count))
+
+    for func in methods:
+        try:
+            while left:
+                copied = func(fd_in, fd_out, left)
+                if not copied:
+                    return  # source is shorter than expected
+                left -= copied
+
+        except OSError:
+            continue  # not supported for these files, try the next method
+
+        return
+
+    while left:  # plain copy through user space
+        data = os.read(fd_in, min(left, 1024 * 1024))
+        if not data:
+            return
+        os.write(fd_out, data)
+        left -= len(data)
+
+
+def concat_files(paths: Iterable[Path], target: Path) -> Path:
+    """Concatenates files into the target one avoiding copying through user space where possible.
+    Target file space is preallocated.
+
+    :param paths: Files to concatenate.
+    :param target: Resulting file.
+
+    """
+    paths = [(path, path.stat().st_size) for path in paths]
+    size_total = sum(size for _, size in paths)
+
+    with target.open('wb') as f_out:
+        fd_out = f_out.fileno()
+
+        if size_total and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd_out, 0, size_total)
+
+            except OSError:
+                pass  # not supported by filesystem
+
+        for path, size in paths:
+            with path.open('rb') as f_in:
+                _copy_fd(f_in.fileno(), fd_out, size)
+
+        # drop preallocated space left unused if sources shrank
+        os.ftruncate(fd_out, os.lseek(fd_out, 0, os.SEEK_CUR))
+
+    return target
+
+
+def get_progress(done: int, total: int) -> str:
+    """Returns progress as a string to log, e.g.: /10 [50.0%]
+
+    :param done: Items done.
+    :param total: Items total. 0 - unknown.
+
+    """
+    if not total:
+        return ''
+    return f'/{total} [{round(done * 100 / total, 1)}%]'
+
+
+def get_files_sorted(path: Path, *, suffixes: set[str] | None = None, pattern: re.Pattern | None = None) -> list[str]:
+    """Returns names of files in the directory naturally sorted (e.g. 2_a before 10_a).
+
+    :param path: Directory.
+    :param suffixes: File suffixes to accept. None - any.
+    :param pattern: Pattern file names are to match entirely. None - any.
+
+    """
     def natural(text):
         return [(int(ch), ch) if ch.isdigit() else ch for ch in RE_DIGITS.split(text) if ch]
 
-    files = [file.name for file in path.iterdir() if file.is_file() and file.suffix in suffixes]
+    files = [
+        file.name for file in path.iterdir()
+        if file.is_file()
+        and (suffixes is None or file.suffix in suffixes)
+        and (pattern is None or pattern.fullmatch(file.name))
+    ]
     files.sort(key=natural)
 
     return files
+
+
+def split_stream(stream: Iterable[bytes], sizes: Iterable[int | None]) -> Iterator[bytes]:
+    """Splits a stream of data into parts of the given sizes.
+
+    :param stream: Data pieces.
+    :param sizes: Part sizes. None - the rest of data.
+
+    """
+    buffer = bytearray()
+    sizes = iter(sizes)
+    size = next(sizes, 0)
+
+    for data in stream:
+        buffer += data
+
+        while size and len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+            size = next(sizes, 0)
+
+    if size is None:
+        yield bytes(buffer)
+        buffer.clear()
+        size = next(sizes, 0)
+
+    if size or buffer:
+        raise ValueError('Data size does not match expected parts sizes')
+
+
+def get_shard_range(items_total: int, *, shard: tuple[int, int]) -> tuple[int, int]:
+    """Returns the first and the last (inclusive, starting from 1) item indexes for a shard.
+    Shards get contiguous disjoint ranges of nearly equal size.
+
+    :param items_total: Items number.
+    :param shard: (shard number starting from 1, shards total)
+
+    """
+    shard_num, shards_total = shard
+    return (shard_num - 1) * items_total // shards_total + 1, shard_num * items_total // shards_total
+
+
+class ChunkSequencer:
+    """Reorder buffer. Accepts chunks in any order and writes them
+    into a sink in index order as soon as a contiguous run is available.
+
+    """
+
+    def __init__(self, sink: IO[bytes], *, start: int = 1, window: int = 0):
+        """
+        :param sink: Binary file-like object to write into.
+        :param start: Index of the first chunk.
+        :param window: Max distance from the next expected chunk
+            a chunk may have to be accepted. Producers block until it fits. 0 - unbounded.
+
+        """
+        self._sink = sink
+        self._next = start
+        self._window = window
+        self._pending: dict[int, bytes] = {}
+        self._aborted = False
+        self._cond = Condition()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def accepts(self, idx: int) -> bool:
+        """Whether a chunk with the given index can be put without blocking.
+
+        :param idx: Chunk index.
+
+        """
+        return not self._window or idx - self._next < self._window
+
+    def put(self, idx: int, data: bytes) -> None:
+        with self._cond:
+            if self._window:
+                self._cond.wait_for(lambda: self._aborted or self.accepts(idx))
+
+            if self._aborted:
+                raise RuntimeError('Chunk sequencer is aborted')
+
+            pending = self._pending
+            pending[idx] = data
+
+            while self._next in pending:
+                self._sink.write(pending.pop(self._next))
+                self._next += 1
+
+            self._cond.notify_all()
+
+    def abort(self) -> None:
+        with self._cond:
+            self._aborted = True
+            self._cond.notify_all()
+
+
+def is_lock_stale(path: Path) -> bool:
+    """Whether the lock file holding `<host> <pid>` was left by a process which is no longer
+    running on this host. Locks of other hosts are never considered stale.
+
+    :param path: Lock file path.
+
+    """
+    try:
+        host, _, pid = path.read_text().partition(' ')
+
+    except FileNotFoundError:
+        return True  # just released
+
+    if host != gethostname() or not pid.isdigit():
+        return False
+
+    try:
+        os.kill(int(pid), 0)
+
+    except ProcessLookupError:
+        return True
+
+    except PermissionError:  # running as another user
+        return False
+
+    return False
+
+
+class QueueSink:
+    """Writable file-like object passing written data into a bounded queue,
+    so that a writer blocks while a reader is behind. None in the queue marks the end of data.
+
+    """
+
+    def __init__(self, *, size: int):
+        """
+        :param size: Max number of written items waiting for the reader.
+
+        """
+        self.queue: Queue[bytes | None] = Queue(maxsize=size)
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        while not self.closed:
+            try:
+                # with timeout to notice close by the reader
+                self.queue.put(data, timeout=0.1)
+                return len(data)
+
+            except Full:
+                continue
+
+        raise ValueError('Sink is closed')
+
+    def close(self) -> None:
+        """Closes the sink from the writer side, e.g. when all data is written."""
+        while not self.closed:
+            try:
+                # the reader may have gone (see `abandon()`) leaving the queue full
+                self.queue.put(None, timeout=0.1)
+                return
+
+            except Full:
+                continue
+
+    def abandon(self) -> None:
+        """Closes the sink from the reader side: pending and further writes fail."""
+        self.closed = True
+
+        while True:
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                break
+
+
+class BackgroundFeed:
+    """Consumes an iterable in a thread, so that its items can be taken without blocking
+    as they become available. For iterables blocking between items, e.g. polling a live playlist.
+
+    """
+
+    _end = object()
+
+    def __init__(self, iterable: Iterable):
+        """
+        :param iterable: Items source.
+
+        """
+        self.exhausted = False
+        """All items are taken."""
+        self._queue: Queue[tuple[object, Exception | None]] = Queue()
+        self._error: Exception | None = None
+        self._closed = False
+        Thread(target=self._consume, args=(iterable,), daemon=True, name='webinardump-feed').start()
+
+    def _consume(self, iterable: Iterable) -> None:
+        queue = self._queue
+
+        try:
+            for item in iterable:
+                if self._closed:
+                    return
+                queue.put((item, None))
+
+        except Exception as e:  # noqa: BLE001 reraised by the taker
+            queue.put((self._end, e))
+            return
+
+        queue.put((self._end, None))
+
+    def take(self, number: int) -> list:
+        """Returns up to the given number of items already available.
+        Raises an exception the source has failed with.
+
+        :param number: Max items number.
+
+        """
+        items = []
+
+        while len(items) < number and not self.exhausted:
+            if error := self._error:
+                self.exhausted = True
+                raise error
+
+            try:
+                item, error = self._queue.get_nowait()
+
+            except Empty:
+                break
+
+            if item is self._end:
+                # an error is raised on the next call not to lose items taken
+                self._error = error
+                self.exhausted = error is None
+                break
+
+            items.append(item)
+
+        return items
+
+    def close(self) -> None:
+        """Stops consuming the source. Its current item may still be awaited in the thread."""
+        self._closed = True
+
+
+class ProgressJournal:
+    """Append-only download progress journal.
+
+    Each line holds a name of a downloaded chunk and its size in bytes
+    separated by tab. Lines without size (legacy format) are also accepted.
+
+    """
+
+    size_unknown: int = -1
+
+    def __init__(self, path: Path, *, sync_every: int = 50):
+        """
+        :param path: Journal file path.
+        :param sync_every: Number of entries to accumulate before syncing to disk.
+
+        """
+        self._path = path
+        self._sync_every = sync_every
+        self._unsynced = 0
+        self._lock = Lock()
+
+        path.touch()
+        contents = path.read_text()
+        self.done: dict[str, int] = self._read(contents)
+        self._file = path.open('a')
+
+        if contents and not contents.endswith('\n'):
+            self._file.write('\n')  # separate from a torn line
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _read(self, contents: str) -> dict[str, int]:
+        done = {}
+
+        for line in contents.splitlines():
+            name, _, size = line.partition('\t')
+            if name:
+                # torn last line after a crash gives a wrong size which is then verified against disk
+                done[name] = int(size) if size.isdigit() else self.size_unknown
+
+        return done
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def add(self, name: str, size: int) -> None:
+        """Registers a downloaded chunk.
+
+        :param name: Chunk name.
+        :param size: Chunk file size.
+
+        """
+        with self._lock:
+            self.done[name] = size
+            self._file.write(f'{name}\t{size}\n')
+            self._unsynced += 1
+
+            if self._unsynced >= self._sync_every:
+                self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
@@ -0,0 +1,142 @@
+"""Video variant (quality) selection fitting a deadline or a bitrate budget."""
+import json
+import os
+from pathlib import Path
+from threading import Lock, get_ident
+from urllib.parse import urlsplit
+
+from .utils import LOGGER
+
+
+class VariantCandidate:
+    """Video variant to choose from: a playlist of the video in some quality."""
+
+    __slots__ = ('bitrate', 'label', 'url')
+
+    def __init__(self, url: str, *, bitrate: int = 0, label: str = ''):
+        """
+        :param url: Playlist URL.
+        :param bitrate: Advertised bitrate, bits/s (e.g. BANDWIDTH of a variant stream). 0 - unknown.
+        :param label: Variant description, e.g. resolution.
+
+        """
+        self.url = url
+        self.bitrate = bitrate
+        self.label = label
+
+    def __str__(self):
+        return self.label or self.url
+
+
+class ThroughputHistory:
+    """Download throughput of hosts measured in past runs, kept in a JSON file.
+
+    Thread-safe.
+
+    """
+
+    smoothing: float = 0.5
+    """Weight of the latest measurement."""
+
+    def __init__(self, path: Path):
+        """
+        :param path: File path.
+
+        """
+        self._path = path
+        self._lock = Lock()
+
+    @staticmethod
+    def _get_host(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    def _read(self) -> dict[str, float]:
+        try:
+            return json.loads(self._path.read_text())
+
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def get(self, url: str) -> float:
+        """Returns throughput (bytes/s) of URL host. 0 - unknown.
+
+        :param url: URL.
+
+        """
+        return self._read().get(self._get_host(url), 0)
+
+    def record(self, url: str, bytes_per_second: float) -> None:
+        """Registers throughput measured for URL host.
+
+        :param url: URL.
+        :param bytes_per_second: Measured throughput.
+
+        """
+        if bytes_per_second <= 0:
+            return
+
+        host = self._get_host(url)
+
+        with self._lock:
+            history = self._read()
+            previous = history.get(host)
+            smoothing = self.smoothing
+            history[host] = round(
+                bytes_per_second if previous is None else previous * (1 - smoothing) + bytes_per_second * smoothing
+            )
+
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            path_tmp = self._path.with_name(f'{self._path.name}.{os.getpid()}.{get_ident()}.tmp')
+            path_tmp.write_text(json.dumps(history, indent=2))
+            path_tmp.replace(self._path)
+
+
+class VariantPolicy:
+    """Decides whether a video variant fits the bitrate limit and is expected
+    to be downloaded before the deadline. See `Dumper._variant_select()`.
+
+    """
+
+    def __init__(self, *, deadline: float = 0, bitrate_max: int = 0, headroom: float = 0.8, probe: int = 3):
+        """
+        :param deadline: Seconds (since run start) to download video in. 0 - no deadline.
+        :param bitrate_max: Max variant bitrate, bits/s. 0 - no limit.
+        :param headroom: Share of estimated throughput to rely on.
+        :param probe: Number of first chunks to download to measure bitrate and throughput
+            when they are not known.
+
+        """
+        self.deadline = deadline
+        self.bitrate_max = bitrate_max
+        self.headroom = headroom
+        self.probe = probe
+
+    def fits(
+        self,
+        candidate: VariantCandidate,
+        *,
+        bitrate: float,
+        size: float,
+        throughput: float,
+        elapsed: float = 0,
+    ) -> bool:
+        """Returns whether the variant fits the policy. Unknown values are considered fitting.
+
+        :param candidate: Variant.
+        :param bitrate: Variant bitrate, bits/s.
+        :param size: Expected video size, bytes.
+        :param throughput: Expected download throughput, bytes/s.
+        :param elapsed: Seconds passed since run start.
+
+        """
+        if self.bitrate_max and bitrate > self.bitrate_max:
+            LOGGER.info(f'Variant {candidate} exceeds bitrate limit: {round(bitrate / 1000)} kbit/s')
+            return False
+
+        if self.deadline and size and throughput:
+            seconds = size / (throughput * self.headroom)
+            if seconds > self.deadline - elapsed:
+                LOGGER.info(f'Variant {candidate} is not expected to be downloaded in time: {round(seconds)} s')
+                return False
+
+        return True
@@ -1,3 +1,4 @@
+from io import BytesIO
 from pathlib import Path
 
 import pytest
@@ -10,10 +11,35 @@ def mock_call(monkeypatch):
     def mock_call(cmd, **kwargs):
         if 'ffmpeg' in cmd:
             cwd = kwargs.get('cwd') or Path()
-            (Path(cwd) / 'all_chunks.mp4').write_bytes(b'')
+            (Path(cwd) / cmd.rpartition(' ')[2]).write_bytes(b'')
 
         calls.append(cmd)
 
     monkeypatch.setattr("webinardump.utils.check_call", mock_call)
 
     return calls
+
+
+@pytest.fixture
+def mock_popen(monkeypatch):
+    calls = []
+
+    class MockPopen:
+
+        def __init__(self, cmd, *, cwd, stdin, **kwargs):
+            self.cmd = cmd
+            self.cwd = Path(cwd)
+            self.stdin = BytesIO()
+            self.stdin.close = lambda: None
+            self.returncode = 0
+            calls.append(self)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            (self.cwd / 'all_chunks.mp4').write_bytes(self.stdin.getvalue())
+
+    monkeypatch.setattr("webinardump.utils.Popen", MockPopen)
+
+    return calls
@@ -1,3 +1,9 @@
+import json
+from threading import Thread
+from time import sleep
+
+import pytest
+
 from webinardump.dumpers import WebinarRu, YandexDisk
 
 CALLS = [
@@ -62,3 +68,484 @@ def test_webinarru(response_mock, tmp_path, datafix_read, datafix_readbin, mock_
         })
         assert fpath
         assert mock_call == CALLS
+
+
+def test_webinarru_ts(response_mock, tmp_path, datafix_read, mock_call):
+    data_manifest = datafix_read('manifest_webinarru.json')
+    data_m3u = datafix_read('vid.m3u')
+
+    with response_mock([
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f'recordAccessToken=bbb -> 200:{data_manifest}'
+        ),
+        f'GET https://here/there.m3u8 -> 200:{data_m3u}',
+        b'GET https://here/1.ts?some=other1 -> 200:one',
+        b'GET https://here/2.ts?some=other2 -> 200:two',
+    ]):
+        fpath = WebinarRu(target_dir=tmp_path, container='ts').run({
+            'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+            'url_playlist': 'https://here/there.m3u8',
+        })
+        assert fpath.suffix == '.ts'
+        assert fpath.read_bytes() == b'onetwo'
+        assert not mock_call  # no remuxing
+
+
+def test_webinarru_pipelined(response_mock, tmp_path, datafix_read, mock_call, mock_popen):
+    data_manifest = datafix_read('manifest_webinarru.json')
+    data_m3u = datafix_read('vid.m3u')
+
+    with response_mock([
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f'recordAccessToken=bbb -> 200:{data_manifest}'
+        ),
+
+        f'GET https://here/there.m3u8 -> 200:{data_m3u}',
+        b'GET https://here/1.ts?some=other1 -> 200:one',
+        b'GET https://here/2.ts?some=other2 -> 200:two',
+    ]):
+        prom = tmp_path / 'metrics.prom'
+        dumper = WebinarRu(target_dir=tmp_path, pipelined=True, metrics_prometheus=prom)
+        fpath = dumper.run({
+            'url_video': ' https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+            'url_playlist': 'https://here/there.m3u8',
+        })
+        assert fpath.read_bytes() == b'onetwo'
+
+        metrics = json.loads(fpath.with_suffix('.metrics.json').read_text())
+        assert metrics['dumper'] == 'webinar.ru'
+        assert metrics['counters'] == {'chunks_total': 2, 'requests': 2, 'chunks_downloaded': 2, 'bytes_downloaded': 6}
+        assert set(metrics['phases']) == {'manifest', 'playlist', 'download'}
+        assert metrics['histograms']['ttfb_seconds']['count'] == 2
+        assert 'webinardump_bytes_downloaded_total{dumper="webinar.ru"} 6' in prom.read_text()
+        assert not mock_call
+        assert [popen.cmd for popen in mock_popen] == [
+            'ffmpeg -y -f mpegts -i pipe:0 -c copy -bsf:a aac_adtstoasc all_chunks.mp4'
+        ]
+
+
+def test_chunks_download_resume(response_mock, tmp_path):
+    (tmp_path / 'files.txt').write_text('1.ts\t3\n3.ts\t5\n')
+    (tmp_path / '1_1.ts').write_bytes(b'one')
+    (tmp_path / '2_2.ts').write_bytes(b'tw')
+    (tmp_path / '3_3.ts').write_bytes(b'thr')
+    # left by an interrupted run
+    (tmp_path / '3_3.ts.1.hedge').write_bytes(b'hedge')
+    (tmp_path / '2_2.ts.1.2.tmp').write_bytes(b'tmp')
+
+    with response_mock([
+        b'GET https://here/2.ts -> 206:o',
+        b'GET https://here/3.ts -> 206:ee',
+    ]) as mock:
+        WebinarRu(target_dir=tmp_path)._chunks_download(
+            url_video_root='https://here',
+            dump_dir=tmp_path,
+            chunk_names=['1.ts', '2.ts', '3.ts'],
+            start_chunk='',
+        )
+        assert sorted(call.request.headers['Range'] for call in mock.calls) == ['bytes=2-', 'bytes=3-']
+
+    assert (tmp_path / '2_2.ts').read_bytes() == b'two'
+    assert (tmp_path / '3_3.ts').read_bytes() == b'three'
+    assert (tmp_path / 'files.txt').read_text().splitlines()[2:] in (
+        ['2.ts\t3', '3.ts\t5'],
+        ['3.ts\t5', '2.ts\t3'],
+    )
+    assert not list(tmp_path.glob('*.hedge'))
+    assert not list(tmp_path.glob('*.tmp'))
+    assert WebinarRu(target_dir=tmp_path)._video_concat(tmp_path, container='ts').read_bytes() == b'onetwothree'
+
+
+def test_chunks_download_resume_legacy(response_mock, tmp_path):
+    # legacy journal has no sizes
+    (tmp_path / 'files.txt').write_text('1.ts\n2.ts\n3.ts\n')
+    (tmp_path / '1_1.ts').write_bytes(b'one')
+    (tmp_path / '2_2.ts').write_bytes(b'')
+
+    with response_mock([
+        b'GET https://here/2.ts -> 200:two',
+        b'GET https://here/3.ts -> 200:three',
+    ]) as mock:
+        WebinarRu(target_dir=tmp_path)._chunks_download(
+            url_video_root='https://here',
+            dump_dir=tmp_path,
+            chunk_names=['1.ts', '2.ts', '3.ts'],
+            start_chunk='',
+        )
+        # empty and missing files are downloaded again
+        assert sorted(call.request.url for call in mock.calls) == ['https://here/2.ts', 'https://here/3.ts']
+
+    assert (tmp_path / '2_2.ts').read_bytes() == b'two'
+    assert (tmp_path / '3_3.ts').read_bytes() == b'three'
+
+
+def test_chunks_download_async(tmp_path):
+    httpx = pytest.importorskip('httpx')
+
+    (tmp_path / 'files.txt').write_text('1.ts\t3\n')
+    (tmp_path / '1_1.ts').write_bytes(b'one')
+    (tmp_path / '2_2.ts').write_bytes(b'tw')
+
+    requested = []
+
+    def handle(request):
+        requested.append((request.url.path, request.headers.get('Range')))
+        if request.url.path == '/2.ts':
+            return httpx.Response(206, content=b'o')
+        return httpx.Response(200, content=b'three')
+
+    dumper = WebinarRu(target_dir=tmp_path, engine='async')
+    dumper._get_async_client = lambda concurrent: httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+    dumper._chunks_download(
+        url_video_root='https://here',
+        dump_dir=tmp_path,
+        chunk_names=['1.ts', '2.ts', '3.ts?a=b'],
+        start_chunk='',
+    )
+    assert sorted(requested) == [('/2.ts', 'bytes=2-'), ('/3.ts', None)]
+    assert (tmp_path / '2_2.ts').read_bytes() == b'two'
+    assert (tmp_path / '3_3.ts').read_bytes() == b'three'
+
+
+def test_video_stream_async(tmp_path, mock_popen):
+    httpx = pytest.importorskip('httpx')
+
+    def handle(request):
+        return httpx.Response(200, content=request.url.path[1:].encode())
+
+    dumper = WebinarRu(target_dir=tmp_path, engine='async', concurrent=2)
+    dumper._get_async_client = lambda concurrent: httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+    fpath = dumper._video_stream(
+        url_video_root='https://here',
+        dump_dir=tmp_path,
+        chunk_names=[f'{idx}.ts' for idx in range(1, 11)],
+        start_chunk='3.ts',
+    )
+    assert fpath.read_bytes() == b''.join(f'{idx}.ts'.encode() for idx in range(3, 11))
+
+
+def test_stream(response_mock, tmp_path, datafix_read):
+    data_manifest = datafix_read('manifest_yadisk.html')
+    data_m3u = datafix_read('vid.m3u')
+
+    class Uploader:
+        # multipart upload stand-in: parts are sent when enough data is collected
+        def __init__(self):
+            self.buffer = b''
+            self.parts = []
+
+        def write(self, data: bytes) -> int:
+            self.buffer += data
+            if len(self.buffer) >= 5:
+                self.parts.append(self.buffer)
+                self.buffer = b''
+            return len(data)
+
+    uploader = Uploader()
+
+    with response_mock([
+        f'GET https://disk.yandex.ru/i/xxx -> 200:{data_manifest}',
+        f'GET https://here/there.m3u8 -> 200:{data_m3u}',
+        b'GET https://here/1.ts?some=other1 -> 200:one',
+        b'GET https://here/2.ts?some=other2 -> 200:two',
+    ]):
+        dumper = YandexDisk(target_dir=tmp_path, concurrent=2)
+        assert dumper.stream({'url_video': 'https://disk.yandex.ru/i/xxx'}, uploader) is None
+
+    assert uploader.parts == [b'onetwo']
+    assert list(tmp_path.iterdir()) == []  # nothing on disk
+    assert dumper.metrics.counters['chunks_downloaded'] == 2
+
+
+def test_iter_chunks(response_mock, tmp_path, datafix_read):
+    data_manifest = datafix_read('manifest_yadisk.html')
+    data_m3u = '\n'.join(f'{idx}.ts' for idx in range(1, 31))
+
+    with response_mock([
+        f'GET https://disk.yandex.ru/i/xxx -> 200:{data_manifest}',
+        f'GET https://here/there.m3u8 -> 200:{data_m3u}',
+        *(f'GET https://here/{idx}.ts -> 200:{idx}' for idx in range(1, 31)),
+    ], assert_all_requests_are_fired=False) as mock:
+        dumper = YandexDisk(target_dir=tmp_path, concurrent=1)
+        chunks = dumper.iter_chunks({'url_video': 'https://disk.yandex.ru/i/xxx'}, buffer=2)
+
+        assert next(chunks) == b'1'
+        sleep(0.3)  # slow consumer
+
+        # download is held: chunks in the buffer, in the sequencer window and one in flight
+        requested = len(mock.calls) - 2
+        assert requested <= 8
+
+        assert [next(chunks) for _ in range(4)] == [b'2', b'3', b'4', b'5']
+        chunks.close()  # download stops
+
+        assert len(mock.calls) - 2 < 30
+
+
+def test_iter_chunks_closed_early(response_mock, tmp_path, datafix_read):
+    data_manifest = datafix_read('manifest_yadisk.html')
+    data_m3u = '\n'.join(f'{idx}.ts' for idx in range(1, 31))
+
+    with response_mock([
+        f'GET https://disk.yandex.ru/i/xxx -> 200:{data_manifest}',
+        f'GET https://here/there.m3u8 -> 200:{data_m3u}',
+        *(f'GET https://here/{idx}.ts -> 200:{idx}' for idx in range(1, 31)),
+    ], assert_all_requests_are_fired=False):
+
+        def consume():
+            for _ in range(20):
+                dumper = YandexDisk(target_dir=tmp_path, concurrent=4)
+                chunks = dumper.iter_chunks({'url_video': 'https://disk.yandex.ru/i/xxx'}, buffer=1)
+                assert next(chunks) == b'1'
+                chunks.close()
+
+        consumer = Thread(target=consume, daemon=True)
+        consumer.start()
+        consumer.join(timeout=30)
+        assert not consumer.is_alive()  # producer doesn't hang on close
+
+
+@pytest.mark.parametrize('pipelined', [True, False])
+def test_webinarru_byteranges(response_mock, tmp_path, datafix_read, mock_call, mock_popen, pipelined):
+    data_manifest = datafix_read('manifest_webinarru.json')
+    data_m3u = (
+        '#EXTM3U\n'
+        '#EXT-X-MAP:URI="init.mp4"\n'
+        '#EXTINF:2,\n#EXT-X-BYTERANGE:3@0\nall.m4s\n'
+        '#EXTINF:2,\n#EXT-X-BYTERANGE:3\nall.m4s\n'
+        '#EXTINF:2,\n#EXT-X-BYTERANGE:2@10\nall.m4s\n'
+    )
+
+    with response_mock([
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f'recordAccessToken=bbb -> 200:{data_manifest}'
+        ),
+        f'GET https://here/there.m3u8 -> 200:{data_m3u}',
+        b'GET https://here/init.mp4 -> 200:init',
+        b'GET https://here/all.m4s -> 206:onetwo',
+        b'GET https://here/all.m4s -> 206:th',
+    ]) as mock:
+        fpath = WebinarRu(target_dir=tmp_path, pipelined=pipelined, concurrent=1).run({
+            'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+            'url_playlist': 'https://here/there.m3u8',
+        })
+        assert [call.request.headers.get('Range') for call in mock.calls[2:]] == [None, 'bytes=0-5', 'bytes=10-11']
+
+    # initialization section is kept whatever its extension is
+    assert fpath.read_bytes() == b'initonetwoth'
+
+
+@pytest.mark.parametrize('pipelined', [True, False])
+def test_webinarru_byteranges_single_file(response_mock, tmp_path, datafix_read, mock_call, mock_popen, pipelined):
+    data_manifest = datafix_read('manifest_webinarru.json')
+    data_m3u = (
+        '#EXTM3U\n'
+        '#EXT-X-MAP:URI="v.mp4",BYTERANGE="4@0"\n'
+        '#EXTINF:2,\n#EXT-X-BYTERANGE:3@4\nv.mp4\n'
+        '#EXTINF:2,\n#EXT-X-BYTERANGE:3\nv.mp4\n'
+    )
+
+    with response_mock([
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f'recordAccessToken=bbb -> 200:{data_manifest}'
+        ),
+        f'GET https://here/there.m3u8 -> 200:{data_m3u}',
+        b'GET https://here/v.mp4 -> 206:initonetwo',
+    ]) as mock:
+        fpath = WebinarRu(target_dir=tmp_path, pipelined=pipelined, concurrent=1).run({
+            'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+            'url_playlist': 'https://here/there.m3u8',
+        })
+        assert [call.request.headers.get('Range') for call in mock.calls[2:]] == ['bytes=0-9']
+
+    # media segments of a single fragmented mp4 file are kept along with initialization section
+    assert fpath.read_bytes() == b'initonetwo'
+    assert not mock_popen  # fragmented mp4 is not remuxed
+
+
+def test_chunks_download_byteranges(response_mock, tmp_path):
+    (tmp_path / 'files.txt').write_text('1_all.ts\t3\n')
+    (tmp_path / '1_all.ts').write_bytes(b'one')
+
+    with response_mock([b'GET https://here/all.ts -> 206:twothree']) as mock:
+        WebinarRu(target_dir=tmp_path)._chunks_download(
+            url_video_root='https://here',
+            dump_dir=tmp_path,
+            chunk_names=['all.ts', 'all.ts', 'all.ts'],
+            byteranges=[(3, 0), (3, 3), (5, 6)],
+            start_chunk='',
+        )
+        assert mock.calls[0].request.headers['Range'] == 'bytes=3-10'
+
+    assert (tmp_path / '2_all.ts').read_bytes() == b'two'
+    assert (tmp_path / '3_all.ts').read_bytes() == b'three'
+    assert (tmp_path / 'files.txt').read_text() == '1_all.ts\t3\n2_all.ts\t3\n3_all.ts\t5\n'
+
+
+def test_threads_run_bounded(tmp_path):
+    started = []
+
+    def fail():
+        raise RuntimeError('failed')
+
+    def get_tasks():
+        for idx in range(1000):
+            started.append(idx)
+            yield f'{idx}', 1, fail if idx == 0 else (lambda: None), ''
+
+    with pytest.raises(RuntimeError):
+        WebinarRu(target_dir=tmp_path)._threads_run(get_tasks(), chunks_total=1000, concurrent=2, sequencer=None)
+
+    # tasks are taken lazily and no new ones are started after the failure
+    assert len(started) < 100
+
+
+def test_webinarru_audio(response_mock, tmp_path, datafix_read, mock_call):
+    data_manifest = datafix_read('manifest_webinarru.json')
+    data_master = (
+        '#EXTM3U\n'
+        '#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aud",NAME="en",URI="a0/index.m3u8"\n'
+        '#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aud",NAME="ru",DEFAULT=YES,URI="a1/index.m3u8"\n'
+        '#EXT-X-STREAM-INF:BANDWIDTH=100,AUDIO="aud"\nv1/index.m3u8\n'
+    )
+
+    with response_mock([
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f'recordAccessToken=bbb -> 200:{data_manifest}'
+        ),
+        f'GET https://here/there.m3u8 -> 200:{data_master}',
+        'GET https://here/v1/index.m3u8 -> 200:#EXTM3U\n#EXTINF:2,\n1.ts\n#EXTINF:2,\n2.ts\n',
+        'GET https://here/a1/index.m3u8 -> 200:#EXTM3U\n#EXTINF:2,\n1.aac\n#EXTINF:2,\n2.aac\n',
+        b'GET https://here/v1/1.ts -> 200:v1',
+        b'GET https://here/v1/2.ts -> 200:v2',
+        b'GET https://here/a1/1.aac -> 200:a1',
+        b'GET https://here/a1/2.aac -> 200:a2',
+    ]) as mock:
+        fpath = WebinarRu(target_dir=tmp_path, concurrent=2).run({
+            'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+            'url_playlist': 'https://here/there.m3u8',
+        })
+        assert len(mock.calls) == 8
+
+    assert fpath.name == 'yatst.mp4'
+    # no separate remux of video: chunks are concatenated and muxed with audio in one pass
+    assert mock_call == [
+        (
+            'ffmpeg -y -i all_chunks.ts -i audio/all_chunks.aac -map 0:v -map 1:a -c copy -bsf:a aac_adtstoasc '
+            'all_tracks.mp4'
+        ),
+    ]
+
+
+def test_extract_js_objects(tmp_path):
+    dumper = YandexDisk(target_dir=tmp_path)
+    contents = (
+        '<script src="x.js"></script>'
+        '<script type="text/javascript">var a = {"environment": 1};</script>'
+        '<script>{"other": 1}</script>'
+        '<SCRIPT nonce="n">\n {"environment": {"sk": "1"}}\n</SCRIPT>'
+        '<script>{"environment": {"sk": "2"}}</script>'
+    )
+    assert dumper._extract_js_objects(contents) == [
+        {'other': 1}, {'environment': {'sk': '1'}}, {'environment': {'sk': '2'}},
+    ]
+    assert dumper._extract_js_objects(contents, key='environment', first=True) == [{'environment': {'sk': '1'}}]
+
+    # fallback to full parsing
+    contents = '<script data-x="a>b">{"environment": {"sk": "3"}}</script>'
+    assert dumper._extract_js_objects_scan(contents) == []
+    assert dumper._extract_js_objects(contents, key='environment') == [{'environment': {'sk': '3'}}]
+
+
+def test_webinarru_live(response_mock, tmp_path, datafix_read, mock_call):
+    data_manifest = datafix_read('manifest_webinarru.json')
+
+    def get_playlist(sequence: int, chunks: list[int], *, end: bool = False) -> str:
+        lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:0.05', f'#EXT-X-MEDIA-SEQUENCE:{sequence}']
+        lines.extend(f'#EXTINF:0.05,\n{idx}.ts' for idx in chunks)
+        if end:
+            lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines)
+
+    with response_mock([
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f'recordAccessToken=bbb -> 200:{data_manifest}'
+        ),
+        f'GET https://here/there.m3u8 -> 200:{get_playlist(1, [1, 2])}',
+        f'GET https://here/there.m3u8 -> 200:{get_playlist(1, [1, 2])}',  # no changes
+        f'GET https://here/there.m3u8 -> 200:{get_playlist(2, [2, 3])}',
+        f'GET https://here/there.m3u8 -> 200:{get_playlist(2, [2, 3, 4], end=True)}',
+        *(f'GET https://here/{idx}.ts -> 200:{idx}' for idx in range(1, 5)),
+    ]) as mock:
+        fpath = WebinarRu(target_dir=tmp_path, live=True).run({
+            'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+            'url_playlist': 'https://here/there.m3u8',
+        })
+        urls = [call.request.url for call in mock.calls]
+
+    assert fpath.name == 'yatst.mp4'
+    assert urls.count('https://here/there.m3u8') == 4
+    # every chunk is requested once
+    assert sorted(url for url in urls if url.endswith('.ts')) == [f'https://here/{idx}.ts' for idx in range(1, 5)]
+
+
+def test_webinarru_live_not_blocking(response_mock, tmp_path, datafix_read, mock_call, caplog):
+    caplog.set_level('INFO')
+    data_manifest = datafix_read('manifest_webinarru.json')
+    playlist = '#EXTM3U\n#EXT-X-TARGETDURATION:0.3\n#EXT-X-MEDIA-SEQUENCE:1\n#EXTINF:0.3,\n1.ts'
+    progress = []
+
+    def poll(request):
+        # downloaded chunks are handled while the playlist is polled
+        progress.append('Got 1' in caplog.text)
+        return 200, {}, f'{playlist}\n#EXTINF:0.3,\n2.ts\n#EXT-X-ENDLIST'
+
+    with response_mock([
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f'recordAccessToken=bbb -> 200:{data_manifest}'
+        ),
+        f'GET https://here/there.m3u8 -> 200:{playlist}',
+        *(f'GET https://here/{idx}.ts -> 200:{idx}' for idx in range(1, 3)),
+    ]) as mock:
+        mock.add_callback('GET', 'https://here/there.m3u8', callback=poll)
+        WebinarRu(target_dir=tmp_path, live=True).run({
+            'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+            'url_playlist': 'https://here/there.m3u8',
+        })
+
+    assert progress == [True]
+
+
+def test_webinarru_live_poll_retried(response_mock, tmp_path, datafix_read, mock_call):
+    data_manifest = datafix_read('manifest_webinarru.json')
+    playlist = '#EXTM3U\n#EXT-X-TARGETDURATION:0.05\n#EXT-X-MEDIA-SEQUENCE:1\n#EXTINF:0.05,\n1.ts'
+
+    with response_mock([
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f'recordAccessToken=bbb -> 200:{data_manifest}'
+        ),
+        f'GET https://here/there.m3u8 -> 200:{playlist}',
+        'GET https://here/there.m3u8 -> 503:',  # transient failure doesn't end recording
+        f'GET https://here/there.m3u8 -> 200:{playlist}\n#EXTINF:0.05,\n2.ts\n#EXT-X-ENDLIST',
+        *(f'GET https://here/{idx}.ts -> 200:{idx}' for idx in range(1, 3)),
+    ]) as mock:
+        dumper = WebinarRu(target_dir=tmp_path, live=True)
+        fpath = dumper.run({
+            'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+            'url_playlist': 'https://here/there.m3u8',
+        })
+        urls = [call.request.url for call in mock.calls]
+
+    assert fpath.name == 'yatst.mp4'
+    assert urls.count('https://here/there.m3u8') == 3
+    assert sorted(url for url in urls if url.endswith('.ts')) == ['https://here/1.ts', 'https://here/2.ts']
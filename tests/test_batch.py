@@ -0,0 +1,75 @@
+import json
+
+from webinardump.batch import BatchRunner, read_jobs
+from webinardump.dumpers import WebinarRu, YandexDisk
+from webinardump.net import RequestLimits
+
+
+def test_read_jobs(tmp_path):
+    fpath = tmp_path / 'jobs.csv'
+    fpath.write_text('id,dumper,url_video,url_playlist\n,webinar.ru,a,b\nmy,2,c,\n')
+    jobs = read_jobs(fpath)
+    assert [(job.id, job.dumper, job.params) for job in jobs] == [
+        ('1', 'webinar.ru', {'url_video': 'a', 'url_playlist': 'b'}),
+        ('my', '2', {'url_video': 'c'}),
+    ]
+
+
+def test_get_by_alias():
+    assert WebinarRu.get_by_alias('webinar.ru') is WebinarRu
+    assert WebinarRu.get_by_alias('yandexdisk') is YandexDisk
+    assert WebinarRu.get_by_alias('2') is YandexDisk
+
+
+def test_batch(response_mock, tmp_path, datafix_read, datafix_readbin, mock_call):
+    data_page = datafix_read('yadisk_shared_page.html')
+    data_streams = datafix_read('yadisk_get_video_streams.json')
+    data_manifest = datafix_read('manifest_webinarru.json')
+    data_m3u = datafix_read('vid.m3u')
+    data_ts = datafix_readbin('empty.ts')
+
+    jobs_file = tmp_path / 'jobs.jsonl'
+    jobs_file.write_text('\n'.join(json.dumps(job) for job in [
+        {
+            'dumper': 'webinar.ru',
+            'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+            'url_playlist': 'https://here/there.m3u8',
+        },
+        {'id': 'shared', 'dumper': 'YandexDisk', 'url_video': 'https://disk.yandex.ru/d/share_hash/video.mp4'},
+        {'id': 'bogus', 'dumper': 'unknown', 'url_video': 'https://here/'},
+    ]))
+
+    def run():
+        return BatchRunner(
+            jobs_file,
+            dumper_kwargs={'target_dir': tmp_path, 'concurrent': 2},
+            jobs=2,
+            limits=RequestLimits(total=2, per_host=1),
+        ).run()
+
+    with response_mock([
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f'recordAccessToken=bbb -> 200:{data_manifest}'
+        ),
+        'GET https://disk.yandex.ru/d/share_hash/video.mp4 -> 200:' + data_page,
+        'POST https://disk.yandex.ru/public/api/get-video-streams -> 200:' + data_streams,
+        f'GET https://here/there.m3u8 -> 200:{data_m3u}',
+        b'GET https://here/1.ts?some=other1 -> 200:' + data_ts,
+        b'GET https://here/2.ts?some=other2 -> 200:' + data_ts,
+    ]):
+        status = run()
+
+    assert {job_id: info['status'] for job_id, info in status.items()} == {
+        '1': 'done',
+        'shared': 'done',
+        'bogus': 'failed',
+    }
+    assert status['shared']['path'] == f'{tmp_path / "video.mp4"}'
+    assert (tmp_path / 'yatst.mp4').exists()
+    assert 'Unknown dumper' in status['bogus']['error']
+
+    # resume: done jobs are skipped
+    status = run()
+    assert status['1']['status'] == 'done'
+    assert status['bogus']['status'] == 'failed'
@@ -0,0 +1,84 @@
+import os
+
+from requests import Session
+
+from webinardump.cache import HttpCache
+from webinardump.dumpers import YandexDisk
+
+
+def test_cache(response_mock, tmp_path):
+    session = Session()
+    cache = HttpCache(tmp_path, ttl=60)
+
+    with response_mock('''
+        GET https://here/a.m3u8
+        ETag: "v1"
+        -> 200:contents
+    '''):
+        assert cache.request(session, 'GET', 'https://here/a.m3u8').text == 'contents'
+
+    # fresh
+    assert cache.request(session, 'GET', 'https://here/a.m3u8').text == 'contents'
+    assert cache.stats == {'hits': 1, 'revalidated': 0, 'misses': 1}
+
+    # stale
+    cache._ttl = 0
+
+    with response_mock('GET https://here/a.m3u8 -> 304:') as mock:
+        response = cache.request(session, 'GET', 'https://here/a.m3u8')
+        assert mock.calls[0].request.headers['If-None-Match'] == '"v1"'
+
+    assert response.text == 'contents'
+    assert response.headers['ETag'] == '"v1"'
+    assert cache.stats == {'hits': 1, 'revalidated': 1, 'misses': 1}
+
+    # body is a part of the key
+    with response_mock('POST https://here/a.m3u8 -> 200:other'):
+        assert cache.request(session, 'POST', 'https://here/a.m3u8', data='x').text == 'other'
+
+
+def test_cache_evict(response_mock, tmp_path):
+    session = Session()
+    cache = HttpCache(tmp_path)
+
+    def get_path(idx: int):
+        return cache._get_entry_path('GET', f'https://here/{idx}.m3u8', None)
+
+    with response_mock([f'GET https://here/{idx}.m3u8 -> 200:{"x" * 100}' for idx in range(3)]):
+        for idx in range(3):
+            cache.request(session, 'GET', f'https://here/{idx}.m3u8')
+            os.utime(get_path(idx), (idx, idx))
+
+    cache.request(session, 'GET', 'https://here/0.m3u8')  # becomes the most recently used
+
+    cache._size_max = get_path(0).stat().st_size + get_path(2).stat().st_size  # two entries fit
+    cache._evict()
+
+    assert [get_path(idx).exists() for idx in range(3)] == [True, False, True]
+
+
+def test_cache_dumper(response_mock, tmp_path, datafix_read, datafix_readbin, mock_call):
+    data_manifest = datafix_read('manifest_yadisk.html')
+    data_m3u = datafix_read('vid.m3u')
+    data_ts = datafix_readbin('empty.ts')
+
+    rules_chunks = [
+        b'GET https://here/1.ts?some=other1 -> 200:' + data_ts,
+        b'GET https://here/2.ts?some=other2 -> 200:' + data_ts,
+    ]
+
+    def run():
+        return YandexDisk(target_dir=tmp_path, cache_dir=tmp_path / 'cache').run({
+            'url_video': 'https://disk.yandex.ru/i/xxx',
+        })
+
+    with response_mock([
+        f'GET https://disk.yandex.ru/i/xxx -> 200:{data_manifest}',
+        f'GET https://here/there.m3u8 -> 200:{data_m3u}',
+        *rules_chunks,
+    ]):
+        assert run()
+
+    # page and playlist are not requested again
+    with response_mock(rules_chunks):
+        assert run()
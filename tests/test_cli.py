@@ -0,0 +1,75 @@
+import argparse
+import importlib.metadata
+import subprocess
+import sys
+
+import pytest
+
+from webinardump.cli import parse_host_limit, parse_rate
+from webinardump.dumpers import WebinarRu
+from webinardump.dumpers.registry import get_dumper, get_dumpers
+
+
+def test_startup_imports():
+    # dumpers listing and arguments validation must not import network and HTML stacks
+    code = (
+        'import sys, webinardump.cli; '
+        'from webinardump.dumpers.registry import get_dumpers; get_dumpers(); '
+        'print(*(name for name in ("requests", "bs4", "webinardump.dumpers.base") if name in sys.modules))'
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ''
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        _, _, us_self_cumulative_name = line.partition(':')
+        _, us_cumulative, name = us_self_cumulative_name.split('|')
+        if us_cumulative.strip().isdigit():
+            cumulative[name.strip()] = int(us_cumulative)
+
+    assert cumulative['webinardump.cli'] < 150_000  # microseconds
+
+
+def test_registry(monkeypatch):
+    assert [dumper.title for dumper in get_dumpers()] == ['webinar.ru', 'Яндекс.Диск']
+
+    entry_point = importlib.metadata.EntryPoint(
+        name='other.site', value='webinardump.dumpers.webinarru:WebinarRu', group='webinardump.dumpers'
+    )
+    monkeypatch.setattr(importlib.metadata, 'entry_points', lambda group: [entry_point])
+
+    assert [dumper.title for dumper in get_dumpers()] == ['webinar.ru', 'Яндекс.Диск', 'other.site']
+    assert get_dumper('3') is WebinarRu
+    assert get_dumper('Other.Site') is WebinarRu
+
+
+def test_registry_subclasses(monkeypatch):
+    from webinardump.dumpers import Dumper  # noqa: PLC0415
+
+    monkeypatch.setattr(Dumper, 'registry', [WebinarRu])
+
+    class MySite(Dumper):
+        title = 'my.site'
+
+    with pytest.deprecated_call():
+        dumpers = get_dumpers()
+    assert [dumper.title for dumper in dumpers] == ['webinar.ru', 'Яндекс.Диск', 'my.site']
+
+    with pytest.deprecated_call():
+        assert get_dumper('my.site') is MySite
+
+
+def test_parse_rate():
+    assert parse_rate('100') == 100
+    assert parse_rate('1.5k') == 1536
+    assert parse_rate('10M') == 10 * 1024 ** 2
+    assert parse_host_limit('Here.ru=1M:5') == ('here.ru', (1024 ** 2, 5))
+    assert parse_host_limit('*=:2.5') == ('*', (0, 2.5))
+
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_rate('10X')
+
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_host_limit('here.ru')
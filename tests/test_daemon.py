@@ -0,0 +1,87 @@
+import json
+from http.client import HTTPConnection
+from socket import AF_UNIX, socket
+from threading import Thread
+from time import sleep
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from webinardump.daemon import Daemon, get_server
+from webinardump.dumpers import YandexDisk
+
+
+def test_daemon(response_mock, tmp_path, datafix_read, datafix_readbin, mock_call):
+    daemon = Daemon(dumper_kwargs={'target_dir': tmp_path, 'concurrent': 2})
+    server = get_server('127.0.0.1:0', daemon=daemon)
+    Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+
+    def call(path, data=None):
+        request = Request(f'http://{host}:{port}{path}', data=json.dumps(data).encode() if data else None)
+        try:
+            with urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def wait(job_id):
+        for _ in range(100):
+            _, job = call(f'/jobs/{job_id}')
+            if job['status'] in {Daemon.status_done, Daemon.status_failed}:
+                return job
+            sleep(0.05)
+        raise TimeoutError
+
+    with response_mock([
+        f"GET https://disk.yandex.ru/i/xxx -> 200:{datafix_read('manifest_yadisk.html')}",
+        f"GET https://here/there.m3u8 -> 200:{datafix_read('vid.m3u')}",
+        b'GET https://here/1.ts?some=other1 -> 200:' + datafix_readbin('empty.ts'),
+        b'GET https://here/2.ts?some=other2 -> 200:' + datafix_readbin('empty.ts'),
+    ]):
+        for job_id in ('first', 'second'):
+            status, job = call('/jobs', {'id': job_id, 'dumper': 'YandexDisk', 'url_video': 'https://disk.yandex.ru/i/xxx'})
+            assert status == 202
+            assert job['status'] in {Daemon.status_pending, Daemon.status_running}
+
+            job = wait(job_id)
+            assert job['status'] == Daemon.status_done, job
+            assert job['progress'] == 1
+            assert job['metrics']['counters']['chunks_total'] == 2
+
+    assert len(daemon._idle[YandexDisk]) == 1  # dumper instance is reused
+
+    status, job = call('/jobs', {'dumper': 'unknown', 'url_video': 'https://here/'})
+    assert status == 400
+    assert 'Unknown dumper' in job['error']
+
+    assert call('/jobs/nope')[0] == 404
+    assert set(call('/jobs')[1]) == {'first', 'second'}
+
+    _, metrics = call('/metrics')
+    assert metrics['jobs'] == {Daemon.status_done: 2}
+    assert metrics['counters']['chunks_total'] == 4
+
+    server.shutdown()
+    server.server_close()
+    daemon.shutdown()
+
+
+def test_daemon_unix_socket(tmp_path):
+    daemon = Daemon(dumper_kwargs={'target_dir': tmp_path})
+    path = tmp_path / 'daemon.sock'
+    server = get_server(f'{path}', daemon=daemon)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    connection = HTTPConnection('localhost')
+    connection.sock = socket(AF_UNIX)
+    connection.sock.connect(f'{path}')
+    connection.request('GET', '/metrics')
+    response = connection.getresponse()
+
+    assert response.status == 200
+    assert json.loads(response.read()) == {'jobs': {}, 'counters': {}}
+
+    connection.close()
+    server.shutdown()
+    server.server_close()
+    daemon.shutdown()
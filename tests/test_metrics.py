@@ -0,0 +1,43 @@
+from webinardump.metrics import Histogram, Metrics
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1, 2, 5))
+
+    for value in (0.5, 1.5, 1.7, 4, 10):
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 3, 4]
+    assert histogram.count == 5
+    assert histogram.quantile(0.5) == 2
+    assert histogram.quantile(0.8) == 5
+    assert histogram.quantile(1) == float('inf')
+    assert Histogram().quantile(0.5) == 0
+
+
+def test_metrics(tmp_path):
+    metrics = Metrics()
+    metrics.inc('requests')
+    metrics.inc('requests')
+    metrics.inc('bytes_downloaded', 2048)
+    metrics.observe('ttfb_seconds', 0.2)
+    metrics.add_phase('download', 2)
+
+    with metrics.phase('concat'):
+        pass
+
+    summary = metrics.summary()
+    assert summary['counters'] == {'requests': 2, 'bytes_downloaded': 2048}
+    assert summary['bytes_per_second'] == 1024
+    assert set(summary['phases']) == {'download', 'concat'}
+    assert summary['histograms']['ttfb_seconds']['p50'] == 0.25
+
+    fpath = tmp_path / 'metrics.prom'
+    metrics.write_prometheus(fpath, labels={'dumper': 'some "x"'})
+    lines = fpath.read_text().splitlines()
+
+    assert 'webinardump_requests_total{dumper="some \\"x\\""} 2' in lines
+    assert 'webinardump_phase_seconds{dumper="some \\"x\\"",phase="download"} 2.000' in lines
+    assert 'webinardump_ttfb_seconds_bucket{dumper="some \\"x\\"",le="+Inf"} 1' in lines
+    assert 'webinardump_ttfb_seconds_count{dumper="some \\"x\\""} 1' in lines
+    assert list(tmp_path.iterdir()) == [fpath]
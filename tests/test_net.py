@@ -0,0 +1,477 @@
+import asyncio
+import pickle
+from threading import Barrier, Thread
+from time import monotonic, sleep
+
+import pytest
+import requests
+
+from webinardump.dumpers import WebinarRu
+from webinardump.net import (
+    ConcurrencyController,
+    HedgePolicy,
+    Race,
+    RateLimiter,
+    RequestLimits,
+    RetryScheduler,
+    SessionPool,
+    TokenBucket,
+    get_retry_after,
+    is_congestion,
+    is_connection_failure,
+    is_transient,
+)
+
+
+def test_session_pool_shared(tmp_path):
+    dumper = WebinarRu(target_dir=tmp_path, concurrent=32)
+    pool = dumper._sessions
+
+    session = pool.get()
+    assert session is dumper._session
+    assert session.get_adapter('https://here')._pool_maxsize == 32
+
+    pool.recycle(session)
+    pool.recycle(session)  # already recycled
+    assert pool.get() is not session
+    assert pool.stats == {'hits': 0, 'misses': 0, 'sessions': 1, 'recycled': 1}
+
+    pool.close()
+
+
+def test_session_recycled_on_connection_failure(tmp_path):
+    dumper = WebinarRu(target_dir=tmp_path)
+    controller = dumper._get_controller(concurrent=2)
+
+    def request(exc):
+        def func(session):
+            raise exc
+
+        with pytest.raises(type(exc)):
+            dumper._request_guarded('https://here/1.ts', controller=controller, func=func)
+
+    for status in (503, 404):
+        response = requests.Response()
+        response.status_code = status
+        error = requests.HTTPError(response=response)
+        assert not is_connection_failure(error)
+        request(error)
+
+    assert dumper._sessions.recycled == 0  # error responses don't poison connections
+
+    error = requests.ConnectionError()
+    assert is_connection_failure(error)
+    request(error)
+    assert dumper._sessions.recycled == 1
+
+
+def test_session_pool_per_worker(tmp_path):
+    pool = SessionPool(WebinarRu(target_dir=tmp_path)._get_session, per_worker=True)
+    sessions = []
+    barrier = Barrier(2)
+
+    def work():
+        session = pool.get()
+        barrier.wait()  # both threads are running
+        sessions.append((session, pool.get()))
+
+    def run():
+        threads = [Thread(target=work) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    run()
+    (session1, session2), (session3, session4) = sessions
+    assert session1 is session2
+    assert session3 is session4
+    assert session1 is not session3
+
+    # sessions of finished threads are reused
+    run()
+    assert {session for pair in sessions for session in pair} == {session1, session3}
+    assert pool.stats['sessions'] == 2
+
+    session = pool.get()
+    pool.recycle(session)
+    assert pool.get() is not session
+    assert pool.stats['sessions'] == 1
+
+
+def test_concurrency_controller():
+    controller = ConcurrencyController(minimum=2, maximum=8)
+    assert controller.adaptive
+
+    def request(**kwargs):
+        assert controller.try_acquire()
+        controller.release(**kwargs)
+
+    # slow start
+    for _ in range(4):
+        request(latency=1)
+    assert controller.limit == 6
+
+    # multiplicative decrease
+    assert controller.try_acquire()
+    assert controller.try_acquire()
+    controller.release(congested=True)
+    assert controller.limit == 3
+    controller.release(congested=True)  # the same episode
+    assert controller.limit == 3
+
+    # additive increase
+    for _ in range(3):
+        request(latency=1)
+    assert controller.limit == 4
+
+    # degraded latency holds the limit
+    for _ in range(10):
+        request(latency=10)
+    assert controller.limit == 4
+
+    # bounds
+    for _ in range(3):
+        request(congested=True)
+    assert controller.limit == 2
+    assert [limit for _, limit in controller.history] == [2, 3, 4, 5, 6, 3, 4, 2]
+
+    controller.acquire()
+    controller.acquire()
+    assert not controller.try_acquire()
+
+
+def test_concurrency_controller_fixed():
+    controller = ConcurrencyController(minimum=3, maximum=3)
+    assert not controller.adaptive
+    assert controller.try_acquire()
+    controller.release(latency=1)
+    assert controller.limit == 3
+
+
+def test_is_congestion():
+    response = requests.Response()
+    response.status_code = 429
+    assert is_congestion(requests.HTTPError(response=response))
+    assert is_congestion(requests.ReadTimeout())
+
+    response.status_code = 404
+    assert not is_congestion(requests.HTTPError(response=response))
+    assert not is_congestion(ValueError())
+
+
+def test_chunks_download_adaptive(response_mock, tmp_path, caplog):
+    caplog.set_level('INFO')
+
+    with response_mock([
+        b'GET https://here/1.ts -> 200:one',
+        b'GET https://here/2.ts -> 200:two',
+    ]):
+        WebinarRu(target_dir=tmp_path, adaptive=True, concurrent=4)._chunks_download(
+            url_video_root='https://here',
+            dump_dir=tmp_path,
+            chunk_names=['1.ts', '2.ts'],
+            start_chunk='',
+            concurrent=4,
+        )
+
+    assert (tmp_path / '2_2.ts').read_bytes() == b'two'
+    assert 'Concurrency over time: 0.0s: 1' in caplog.text
+
+
+def test_token_bucket():
+    bucket = TokenBucket(100)
+    assert bucket.burst == 100
+    assert bucket.reserve(60) == 0
+    assert 0.19 < bucket.reserve(60) <= 0.2  # in debt for 20 tokens
+    assert 1.19 < bucket.reserve(100) <= 1.2
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(requests_per_second=100, hosts={'slow': (1000, 0), '*': (0, 10)})
+
+    assert limiter._reserve('https://slow/1.ts', size=1500) == 0.5
+    assert limiter._reserve('https://other/1.ts', size=10 ** 9) == 0  # no bandwidth limit
+    for _ in range(10):
+        assert limiter._reserve('https://other/1.ts', requests=1) == 0
+    assert limiter._reserve('https://other/1.ts', requests=1) > 0  # per host limit
+    assert limiter._reserve('https://slow/1.ts', requests=1) == 0
+
+    # a fresh limiter with the same limits
+    limiter = pickle.loads(pickle.dumps(limiter))
+    assert limiter._reserve('https://slow/1.ts', size=1000) == 0
+    assert limiter._hosts_limits == {'slow': (1000, 0), '*': (0, 10)}
+
+    started = monotonic()
+    chunks = list(RateLimiter(bytes_per_second=2000).iter_limited([b'x' * 1000] * 3, url='https://here/1.ts'))
+    assert len(chunks) == 3
+    assert monotonic() - started >= 0.45
+
+    started = monotonic()
+    limiter = RateLimiter(bytes_per_second=2000)
+
+    async def receive():
+        for _ in range(3):
+            await limiter.received_async('https://here/1.ts', 1000)
+
+    asyncio.run(receive())
+    assert monotonic() - started >= 0.45
+
+
+def test_request_limits_async_cancelled():
+    limits = RequestLimits(total=1, per_host=1)
+    url = 'https://here/1.ts'
+    limits.acquire(url)
+
+    async def wait_cancelled():
+        task = asyncio.create_task(limits.acquire_async(url))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        limits.release(url)  # the waiting thread takes the slot now
+
+    asyncio.run(wait_cancelled())
+
+    # the slot taken for the cancelled waiter is given back
+    started = monotonic()
+    while not limits._total.acquire(blocking=False):
+        assert monotonic() - started < 5
+        sleep(0.01)
+    assert limits._get_host_slots(url).acquire(blocking=False)
+
+
+def test_chunks_download_rate_limited(response_mock, tmp_path):
+    limiter = RateLimiter(bytes_per_second=1000, requests_per_second=1000)
+
+    with response_mock([
+        b'GET https://here/1.ts -> 200:' + b'x' * 1000,
+        b'GET https://here/2.ts -> 200:' + b'x' * 500,
+    ]):
+        started = monotonic()
+        WebinarRu(target_dir=tmp_path, rate_limiter=limiter)._chunks_download(
+            url_video_root='https://here',
+            dump_dir=tmp_path,
+            chunk_names=['1.ts', '2.ts'],
+            start_chunk='',
+            concurrent=2,
+        )
+
+    assert (tmp_path / '2_2.ts').read_bytes() == b'x' * 500
+    assert monotonic() - started >= 0.45  # 1500 bytes with 1000 bytes burst
+
+
+def test_hedge_policy():
+    policy = HedgePolicy(percentile=0.9, budget=0.1, samples_min=10)
+
+    for idx in range(9):
+        policy.observe('https://here/1.ts', idx / 10)
+    assert policy.get_delay('https://here/2.ts') is None  # not enough samples
+
+    policy.observe('https://here/1.ts', 5)
+    assert policy.get_delay('https://here/2.ts') == 0.8
+    assert policy.get_delay('https://other/2.ts') is None
+
+    assert policy.try_spend()
+    assert not policy.try_spend()  # 10% of 10 requests
+
+    policy.reset()
+    assert policy.try_spend()
+    assert policy.get_delay('https://here/2.ts') == 0.8
+
+
+def test_race():
+    race = Race()
+    assert race.started is None  # waiting for a request slot
+    assert race.start() == 0
+    started = race.started
+    assert started
+    assert race.start() == 1
+    assert race.started == started
+    assert list(race.iter_unsettled([b'a', b'b'])) == [b'a', b'b']
+
+    assert race.claim()
+    assert not race.claim()
+    assert list(race.iter_unsettled([b'a', b'b'])) == []
+
+
+def test_chunks_download_hedged(response_mock, tmp_path):
+    dumper = WebinarRu(target_dir=tmp_path, concurrent=2, hedge=0.9)
+    dumper._hedging = HedgePolicy(percentile=0.9, budget=1, samples_min=3)
+    for _ in range(10):
+        dumper._hedging.observe('https://here/0.ts', 0.3)  # fast chunks finish long before being hedged
+    calls = []
+
+    def stall(request):
+        calls.append(request.url)
+        if len(calls) == 1:
+            sleep(1)  # the original request stalls
+        return 200, {}, b'six'
+
+    with response_mock([f'GET https://here/{idx}.ts -> 200:{idx}' for idx in range(1, 6)]) as mock:
+        mock.add_callback('GET', 'https://here/6.ts', callback=stall)
+
+        started = monotonic()
+        dumper._chunks_download(
+            url_video_root='https://here',
+            dump_dir=tmp_path,
+            chunk_names=[f'{idx}.ts' for idx in range(1, 7)],
+            start_chunk='',
+            concurrent=2,
+        )
+        assert monotonic() - started < 0.9  # the stalled request is not waited for
+
+    assert len(calls) == 2
+    assert (tmp_path / '6_6.ts').read_bytes() == b'six'
+    assert len((tmp_path / 'files.txt').read_text().splitlines()) == 6
+    assert dumper.metrics.counters['hedges_won'] == 1
+    assert not list(tmp_path.glob('*.hedge'))
+
+
+def test_chunks_download_hedged_queued(response_mock, tmp_path):
+    # the only request slot is taken by a slow request: the other one waits for its turn
+    dumper = WebinarRu(target_dir=tmp_path, concurrent=2, hedge=0.5, limits=RequestLimits(total=1))
+    dumper._hedging = HedgePolicy(percentile=0.5, budget=1, samples_min=3)
+    for _ in range(3):
+        dumper._hedging.observe('https://here/0.ts', 0.2)
+
+    def stall(request):
+        sleep(0.6)
+        return 200, {}, b'one'
+
+    with response_mock([b'GET https://here/2.ts -> 200:two'], assert_all_requests_are_fired=False) as mock:
+        mock.add_callback('GET', 'https://here/1.ts', callback=stall)
+
+        dumper._chunks_download(
+            url_video_root='https://here',
+            dump_dir=tmp_path,
+            chunk_names=['1.ts', '2.ts'],
+            start_chunk='',
+            concurrent=2,
+        )
+
+    # only the slow request is hedged, not the one waiting for a slot
+    assert dumper.metrics.counters['hedged'] == 1
+    assert (tmp_path / '2_2.ts').read_bytes() == b'two'
+
+
+def test_chunks_stream_hedged_slow_sink(response_mock, tmp_path):
+    dumper = WebinarRu(target_dir=tmp_path, concurrent=4, hedge=0.5)
+    dumper._hedging = HedgePolicy(percentile=0.5, budget=1, samples_min=3)
+    for _ in range(20):
+        dumper._hedging.observe('https://here/0.ts', 0.05)  # requests themselves are not to be hedged
+
+    class Sink:
+        def __init__(self):
+            self.written = []
+
+        def write(self, data):
+            sleep(0.1)
+            self.written.append(data)
+
+    sink = Sink()
+
+    with response_mock([f'GET https://here/{idx}.ts -> 200:{idx}' for idx in range(1, 9)]):
+        dumper._chunks_stream(
+            sink,
+            url_video_root='https://here',
+            chunk_names=[f'{idx}.ts' for idx in range(1, 9)],
+            start_chunk='',
+        )
+        # chunks are all written before return
+        assert b''.join(sink.written) == b'12345678'
+
+    # chunks downloaded already and waiting for the sink are not hedged
+    assert 'hedged' not in dumper.metrics.counters
+
+
+def test_retry_scheduler(tmp_path):
+    response = requests.Response()
+    response.status_code = 503
+    error = requests.HTTPError(response=response)
+
+    assert is_transient(error)
+    assert is_transient(requests.exceptions.ChunkedEncodingError())
+    assert get_retry_after(error) is None
+
+    response.headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+    assert get_retry_after(error) == 0  # in the past
+
+    response.headers['Retry-After'] = '120'
+    assert get_retry_after(error) == 120
+
+    retries = RetryScheduler(attempts=2, backoff=0)
+    assert retries.get_wait() is None
+
+    assert retries.schedule('1.ts', 'one', error, transient=True)
+    assert retries.get_wait() > 100  # Retry-After is honored
+    assert retries.pop_due() is None
+
+    assert retries.schedule('2.ts', 'two', ValueError('broken'), transient=True)
+    assert retries.pop_due() == 'two'
+    assert not retries.schedule('2.ts', 'two', ValueError('broken'), transient=True)  # attempts exhausted
+    assert not retries.schedule('3.ts', 'three', ValueError('bad'), transient=False)
+
+    retries.write_report(tmp_path / 'failed.json')
+    assert (tmp_path / 'failed.json').read_text().count('"chunk"') == 2
+    assert retries.failed == [
+        {'chunk': '2.ts', 'error': 'broken', 'attempts': 2},
+        {'chunk': '3.ts', 'error': 'bad', 'attempts': 1},
+    ]
+
+
+@pytest.mark.parametrize('hedge', [0, 0.9])
+def test_chunks_download_retries(response_mock, tmp_path, hedge):
+    dumper = WebinarRu(target_dir=tmp_path, chunk_retries=2, hedge=hedge)
+
+    with response_mock([
+        b'GET https://here/1.ts -> 200:one',
+        b"""
+            GET https://here/2.ts
+            Retry-After: 0
+            -> 502:
+        """,
+        b'GET https://here/2.ts -> 200:two',
+        b'GET https://here/3.ts -> 404:',
+        b'GET https://here/4.ts -> 200:four',
+    ]), pytest.raises(RuntimeError, match='Failed to download 1 chunk'):
+        dumper._chunks_download(
+            url_video_root='https://here',
+            dump_dir=tmp_path,
+            chunk_names=['1.ts', '2.ts', '3.ts', '4.ts'],
+            start_chunk='',
+            concurrent=2,
+        )
+
+    # other chunks are downloaded
+    assert (tmp_path / '2_2.ts').read_bytes() == b'two'
+    assert (tmp_path / '4_4.ts').read_bytes() == b'four'
+    assert '"chunk": "3.ts"' in (tmp_path / 'failed.json').read_text()
+    assert dumper.metrics.counters['chunks_retried'] == 1
+    assert dumper.metrics.counters['chunks_failed'] == 1
+    assert 'hedges_won' not in dumper.metrics.counters  # a retry is not a hedge
+
+
+def test_chunks_download_retries_async(tmp_path):
+    httpx = pytest.importorskip('httpx')
+
+    requested = []
+
+    def handle(request):
+        requested.append(request.url.path)
+        if request.url.path == '/1.ts' and len(requested) == 1:
+            return httpx.Response(503, headers={'Retry-After': '0'})
+        return httpx.Response(200, content=b'one')
+
+    dumper = WebinarRu(target_dir=tmp_path, engine='async', concurrent=1)
+    dumper._get_async_client = lambda concurrent: httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+    dumper._chunks_download(
+        url_video_root='https://here',
+        dump_dir=tmp_path,
+        chunk_names=['1.ts', '2.ts'],
+        start_chunk='',
+        concurrent=1,
+    )
+    assert requested == ['/1.ts', '/1.ts', '/2.ts']  # due retry goes first
+    assert (tmp_path / '1_1.ts').read_bytes() == b'one'
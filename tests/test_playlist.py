@@ -0,0 +1,122 @@
+from webinardump.playlist import parse_attributes, parse_playlist, plan_range_requests
+
+MASTER = '''
+#EXTM3U
+#EXT-X-VERSION:7
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio",AUTOSELECT=YES,NAME="xxx, yyy",URI="a1/index.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=5205192,RESOLUTION=1920x1080,CODECS="avc1.42C02A,mp4a.40.2",AUDIO="audio"
+v1/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=1205192,RESOLUTION=640x360
+v2/index.m3u8
+'''
+
+MEDIA = '''
+#EXTM3U
+#EXT-X-VERSION:6
+#EXT-X-MEDIA-SEQUENCE:10
+#EXT-X-DISCONTINUITY-SEQUENCE:2
+#EXT-X-TARGETDURATION:12
+#EXT-X-MAP:URI="init/1.m4s"
+#EXTINF:2.000,
+media/1.m4s
+#EXTINF:2.5,title
+media/2.m4s
+#EXT-X-DISCONTINUITY
+#EXT-X-MAP:URI="init/2.m4s",BYTERANGE="100@0"
+#EXTINF:2,
+#EXT-X-BYTERANGE:300@100
+all.m4s
+#EXTINF:2,
+#EXT-X-BYTERANGE:200
+all.m4s
+#EXT-X-ENDLIST
+'''
+
+
+def test_parse_attributes():
+    assert parse_attributes('TYPE=AUDIO,NAME="a, b",BANDWIDTH=10') == {
+        'TYPE': 'AUDIO', 'NAME': 'a, b', 'BANDWIDTH': '10',
+    }
+
+
+def test_master():
+    playlist = parse_playlist(MASTER)
+    assert playlist.is_master
+    assert playlist.version == 7
+    assert not playlist.segments
+
+    variant1, variant2 = playlist.variants
+    assert variant1.uri == 'v1/index.m3u8'
+    assert variant1.bandwidth == 5205192
+    assert variant1.resolution == (1920, 1080)
+    assert variant1.codecs == 'avc1.42C02A,mp4a.40.2'
+    assert variant1.audio == 'audio'
+    assert variant2.resolution == (640, 360)
+    assert not variant2.audio
+
+    rendition, = playlist.renditions
+    assert rendition.type == 'AUDIO'
+    assert rendition.group_id == 'audio'
+    assert rendition.name == 'xxx, yyy'
+    assert rendition.uri == 'a1/index.m3u8'
+    assert rendition.autoselect
+    assert not rendition.default
+
+
+def test_media():
+    playlist = parse_playlist(MEDIA.splitlines())
+    assert not playlist.is_master
+    assert playlist.endlist
+    assert playlist.target_duration == 12
+    assert playlist.media_sequence == 10
+    assert playlist.duration == 8.5
+
+    seg1, seg2, seg3, seg4 = playlist.segments
+    assert [seg.uri for seg in playlist.segments] == ['media/1.m4s', 'media/2.m4s', 'all.m4s', 'all.m4s']
+    assert [seg.sequence for seg in playlist.segments] == [10, 11, 12, 13]
+    assert [seg.discontinuity for seg in playlist.segments] == [2, 2, 3, 3]
+    assert seg2.duration == 2.5
+
+    assert seg1.init is seg2.init
+    assert seg1.init.uri == 'init/1.m4s'
+    assert seg3.init is seg4.init
+    assert seg3.init.byterange == (100, 0)
+
+    assert seg1.byterange is None
+    assert seg3.byterange == (300, 100)
+    assert seg4.byterange == (200, 400)
+
+
+def test_init_byterange_no_offset():
+    playlist = parse_playlist('#EXTM3U\n#EXT-X-MAP:URI="v.mp4",BYTERANGE="100"\n#EXTINF:2,\nv.ts')
+    assert playlist.segments[0].init.byterange == (100, 0)
+
+
+def test_feed_streaming():
+    playlist = parse_playlist('')
+    segments = playlist.feed(iter(MEDIA.splitlines()))
+    assert next(segments).uri == 'media/1.m4s'
+    assert not playlist.segments
+    assert len(list(segments)) == 3
+
+
+def test_plan_range_requests():
+    requests = list(plan_range_requests(
+        [
+            (1, 'init.m4s', None),
+            (2, 'all.m4s', (10, 0)),
+            (3, 'all.m4s', (10, 10)),
+            (4, 'all.m4s', (10, 20)),
+            (5, 'all.m4s', (10, 40)),  # gap
+            (6, 'other.m4s', (10, 50)),
+            (7, 'other.m4s', (10, 60)),
+        ],
+        size_max=25,
+    ))
+    assert [(req.uri, req.range_header, req.parts) for req in requests] == [
+        ('init.m4s', '', [(1, None)]),
+        ('all.m4s', 'bytes=0-19', [(2, 10), (3, 10)]),
+        ('all.m4s', 'bytes=20-29', [(4, 10)]),
+        ('all.m4s', 'bytes=40-49', [(5, 10)]),
+        ('other.m4s', 'bytes=50-69', [(6, 10), (7, 10)]),
+    ]
@@ -0,0 +1,122 @@
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from socket import gethostname
+
+import pytest
+
+from webinardump.dumpers import WebinarRu
+from webinardump.shard import run_shard, run_sharded
+
+
+def test_shards(response_mock, tmp_path, datafix_read, mock_call):
+    data_manifest = datafix_read('manifest_webinarru.json')
+    playlist = '\n'.join(f'{idx}.ts' for idx in range(1, 6))
+
+    rules_common = [
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f'recordAccessToken=bbb -> 200:{data_manifest}'
+        ),
+        f'GET https://here/there.m3u8 -> 200:{playlist}',
+    ]
+    params = {
+        'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+        'url_playlist': 'https://here/there.m3u8',
+    }
+    dumper_kwargs = {'target_dir': tmp_path}
+
+    # second shard may run before the first one and on another host
+    with response_mock([*rules_common, b'GET https://here/2.ts -> 200:2', b'GET https://here/3.ts -> 200:3']):
+        result = run_shard(WebinarRu, dumper_kwargs=dumper_kwargs, params=params, shard=(2, 3))
+
+    assert result == tmp_path / 'yatst'
+    assert sorted(path.name for path in result.iterdir()) == ['2_2.ts', '3_3.ts', 'files.2.txt', 'shard_2_of_3.done']
+
+    with response_mock([*rules_common, b'GET https://here/4.ts -> 200:4', b'GET https://here/5.ts -> 200:5']):
+        assert run_shard(WebinarRu, dumper_kwargs=dumper_kwargs, params=params, shard=(3, 3)) == result
+
+    with response_mock([*rules_common, b'GET https://here/1.ts -> 200:1']):
+        result = run_shard(WebinarRu, dumper_kwargs=dumper_kwargs, params=params, shard=(1, 3))
+
+    assert result == tmp_path / 'yatst.mp4'
+    assert len(mock_call) == 1
+    assert not (tmp_path / 'yatst').exists()
+
+
+def test_run_sharded_ts(response_mock, tmp_path, datafix_read, mock_call, monkeypatch):
+    monkeypatch.setattr('webinardump.shard.ProcessPoolExecutor', ThreadPoolExecutor)  # to share mocks
+
+    with response_mock([
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f"recordAccessToken=bbb -> 200:{datafix_read('manifest_webinarru.json')}"
+        ),
+        'GET https://here/there.m3u8 -> 200:1.ts\n2.ts',
+        b'GET https://here/1.ts -> 200:1',
+        b'GET https://here/2.ts -> 200:2',
+    ]):
+        result = run_sharded(
+            WebinarRu,
+            dumper_kwargs={'target_dir': tmp_path, 'container': 'ts'},
+            params={
+                'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+                'url_playlist': 'https://here/there.m3u8',
+            },
+            shards=2,
+        )
+
+    assert result == tmp_path / 'yatst.ts'
+    assert result.read_bytes() == b'12'
+
+
+def test_shard_merge_retried(response_mock, tmp_path, datafix_read, mock_call, monkeypatch):
+    params = {
+        'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+        'url_playlist': 'https://here/there.m3u8',
+    }
+    rules = [
+        (
+            'GET https://events.webinar.ru/api/eventsessions/aaa/record/isviewable?'
+            f"recordAccessToken=bbb -> 200:{datafix_read('manifest_webinarru.json')}"
+        ),
+        'GET https://here/there.m3u8 -> 200:1.ts\n2.ts',
+    ]
+    dumper_kwargs = {'target_dir': tmp_path, 'container': 'ts'}
+    dump_dir = tmp_path / 'yatst'
+
+    def run(shard_num):
+        return run_shard(WebinarRu, dumper_kwargs=dumper_kwargs, params=params, shard=(shard_num, 2))
+
+    with response_mock([*rules, b'GET https://here/2.ts -> 200:2']):
+        run(2)
+
+    def fail(*args, **kwargs):
+        raise OSError('No space left')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(WebinarRu, '_video_concat', fail)
+
+        with response_mock([*rules, b'GET https://here/1.ts -> 200:1']), pytest.raises(OSError, match='space'):
+            run(1)
+
+    assert not (dump_dir / 'merge.lock').exists()
+
+    # lock left by a killed process
+    process = subprocess.Popen(['true'])
+    process.wait()
+    (dump_dir / 'merge.lock').write_text(f'{gethostname()} {process.pid}')
+
+    with response_mock(rules):
+        assert run(2) == tmp_path / 'yatst.ts'
+
+    assert (tmp_path / 'yatst.ts').read_bytes() == b'12'
+
+
+def test_shard_merge_locked(tmp_path):
+    dumper = WebinarRu(target_dir=tmp_path, shard=(1, 1))
+    (tmp_path / 'merge.lock').write_text(f'{gethostname()} {os.getpid()}')  # alive
+    assert not dumper._shard_complete(tmp_path)
+
+    (tmp_path / 'merge.lock').write_text(f'otherhost {os.getpid()}')
+    assert not dumper._shard_complete(tmp_path)
@@ -0,0 +1,72 @@
+import os
+
+from webinardump.dumpers import YandexDisk
+from webinardump.store import ChunkStore, get_chunk_key
+
+
+def test_get_chunk_key():
+    assert get_chunk_key('HTTPS://Here/a/1.ts?token=x') == 'https://here/a/1.ts'
+    # chunks addressed by query don't collide
+    assert get_chunk_key('https://here/get?seg=1&token=x') != get_chunk_key('https://here/get?seg=2&token=x')
+    assert get_chunk_key('https://here/get?X-Amz-Signature=a&seg=1&Expires=1') == 'https://here/get?seg=1'
+    assert get_chunk_key('https://here/a.mp4', byterange=(10, 20)) == 'https://here/a.mp4 10@20'
+
+
+def test_store(tmp_path):
+    store = ChunkStore(tmp_path / 'store', size_max=10)
+
+    chunk_1 = tmp_path / '1.ts'
+    chunk_1.write_bytes(b'12345')
+    chunk_2 = tmp_path / '2.ts'
+    chunk_2.write_bytes(b'12345')
+
+    store.add('https://here/1.ts?token=a', chunk_1)
+    store.add('https://here/2.ts?token=a', chunk_2)
+    assert store.get('https://here/1.ts?token=b') == store.get('https://here/2.ts')  # deduplicated
+    assert store.get('https://here/3.ts') is None
+
+    target = tmp_path / 'target.ts'
+    target.write_bytes(b'123')  # partial
+    assert store.link('https://here/1.ts', target)
+    assert target.read_bytes() == b'12345'
+    assert not store.link('https://here/1.ts', target, byterange=(5, 0))
+
+    chunk_3 = tmp_path / '3.ts'
+    chunk_3.write_bytes(b'abcdefgh')
+    store.add('https://here/3.ts', chunk_3)
+    os.utime(store.get('https://here/3.ts'), (0, 0))  # the least recently used
+
+    store.evict()
+    assert store.get('https://here/3.ts') is None
+    assert store.get('https://here/1.ts')
+
+
+def test_store_dumper(response_mock, tmp_path, datafix_read, datafix_readbin, mock_call):
+    data_manifest = datafix_read('manifest_yadisk.html')
+    data_m3u = datafix_read('vid.m3u')
+    data_ts = datafix_readbin('empty.ts')
+
+    rules_pages = [
+        f'GET https://disk.yandex.ru/i/xxx -> 200:{data_manifest}',
+        f'GET https://here/there.m3u8 -> 200:{data_m3u}',
+    ]
+
+    def run(target_dir):
+        target_dir.mkdir()
+        dumper = YandexDisk(target_dir=target_dir, store_dir=tmp_path / 'store')
+        assert dumper.run({'url_video': 'https://disk.yandex.ru/i/xxx'})
+        return dumper
+
+    with response_mock([
+        *rules_pages,
+        b'GET https://here/1.ts?some=other1 -> 200:' + data_ts,
+        b'GET https://here/2.ts?some=other2 -> 200:' + data_ts,
+    ]):
+        assert run(tmp_path / 'first').metrics.counters['chunks_downloaded'] == 2
+
+    # chunks are not requested again
+    with response_mock(rules_pages):
+        dumper = run(tmp_path / 'second')
+
+    assert dumper.metrics.counters['chunks_stored'] == 2
+    assert 'chunks_downloaded' not in dumper.metrics.counters
@@ -1,4 +1,18 @@
-from webinardump.utils import get_files_sorted
+from io import BytesIO
+from threading import Event
+
+import pytest
+
+from webinardump.utils import (
+    BackgroundFeed,
+    ChunkSequencer,
+    ProgressJournal,
+    QueueSink,
+    concat_files,
+    get_files_sorted,
+    get_shard_range,
+    split_stream,
+)
 
 
 def test_get_files_sorted(tmp_path):
@@ -13,3 +27,110 @@ def test_get_files_sorted(tmp_path):
 
     fnames = get_files_sorted(tmp_path, suffixes={'.a'})
     assert fnames == ['01.a', '1.a', '02.a', '9.a', '10.a', '11.a']
+
+
+def test_chunk_sequencer():
+    sink = BytesIO()
+    sequencer = ChunkSequencer(sink, start=3)
+
+    sequencer.put(5, b'c')
+    sequencer.put(4, b'b')
+    assert sink.getvalue() == b''
+    assert sequencer.pending == 2
+
+    sequencer.put(3, b'a')
+    assert sink.getvalue() == b'abc'
+    assert not sequencer.pending
+
+    sequencer.abort()
+    with pytest.raises(RuntimeError):
+        sequencer.put(6, b'd')
+
+
+def test_progress_journal(tmp_path):
+    fpath = tmp_path / 'files.txt'
+    fpath.write_text('legacy.ts\ntorn.ts\t1')
+
+    with ProgressJournal(fpath, sync_every=1) as journal:
+        assert journal.done == {'legacy.ts': -1, 'torn.ts': 1}
+        journal.add('new.ts', 10)
+
+    assert ProgressJournal(fpath).done == {'legacy.ts': -1, 'torn.ts': 1, 'new.ts': 10}
+
+
+def test_get_shard_range():
+    assert [get_shard_range(10, shard=(num, 3)) for num in range(1, 4)] == [(1, 3), (4, 6), (7, 10)]
+    assert get_shard_range(10, shard=(1, 1)) == (1, 10)
+
+
+def test_split_stream():
+    assert list(split_stream([b'ab', b'cdef', b'g'], [1, 3, None])) == [b'a', b'bcd', b'efg']
+    assert list(split_stream([b'abc'], [3])) == [b'abc']
+
+    with pytest.raises(ValueError, match='size'):
+        list(split_stream([b'ab'], [3]))
+
+    with pytest.raises(ValueError, match='size'):
+        list(split_stream([b'abcd'], [3]))
+
+
+def test_concat_files(tmp_path):
+    paths = []
+
+    for idx, data in enumerate([b'one', b'', b'two' * 1000]):
+        path = tmp_path / f'{idx}.ts'
+        path.write_bytes(data)
+        paths.append(path)
+
+    target = tmp_path / 'all.ts'
+    target.write_bytes(b'previous contents to be replaced' * 1000)
+
+    assert concat_files(paths, target) == target
+    assert target.read_bytes() == b'one' + b'two' * 1000
+
+
+def test_background_feed():
+    resume = Event()
+
+    def produce():
+        yield 1
+        yield 2
+        resume.wait(timeout=5)  # e.g. polling a playlist
+        yield 3
+        raise ValueError('broken')
+
+    feed = BackgroundFeed(produce())
+
+    taken = []
+    while len(taken) < 2:
+        taken.extend(feed.take(5))  # doesn't wait for items to appear
+    assert taken == [1, 2]
+    assert feed.take(5) == []
+    assert not feed.exhausted
+
+    resume.set()
+    taken = []
+
+    def take_all():
+        while True:
+            taken.extend(feed.take(5))
+
+    with pytest.raises(ValueError, match='broken'):
+        take_all()
+    assert taken == [3]  # items taken before the failure are not lost
+    assert feed.exhausted
+    assert feed.take(5) == []
+
+
+def test_queue_sink():
+    sink = QueueSink(size=1)
+    assert sink.write(b'one') == 3
+    assert sink.queue.get() == b'one'
+
+    sink.abandon()
+
+    with pytest.raises(ValueError, match='closed'):
+        sink.write(b'two')
+
+    sink.queue.put(b'late')  # put by a writer racing with abandon()
+    sink.close()  # doesn't block on the full queue
@@ -0,0 +1,117 @@
+from webinardump.dumpers import YandexDisk
+from webinardump.net import RequestLimits
+from webinardump.playlist import parse_playlist
+from webinardump.variants import ThroughputHistory, VariantCandidate, VariantPolicy
+
+PLAYLIST_MASTER = '''#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360
+lo/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=8000000,RESOLUTION=1920x1080
+hi/index.m3u8
+'''
+
+PLAYLIST_MEDIA = '''#EXTM3U
+#EXT-X-TARGETDURATION:10
+#EXTINF:10.0,
+1.ts
+#EXTINF:10.0,
+2.ts
+#EXT-X-ENDLIST
+'''
+
+
+def test_variant_policy(tmp_path):
+    candidate = VariantCandidate('https://here/hi.m3u8', bitrate=8_000_000, label='1080p')
+    assert f'{candidate}' == '1080p'
+
+    policy = VariantPolicy(deadline=10, bitrate_max=5_000_000, headroom=1)
+    assert not policy.fits(candidate, bitrate=8_000_000, size=0, throughput=0)
+    assert not policy.fits(candidate, bitrate=1_000_000, size=2000, throughput=100)  # 20 seconds
+    assert not policy.fits(candidate, bitrate=1_000_000, size=500, throughput=100, elapsed=6)
+    assert policy.fits(candidate, bitrate=1_000_000, size=500, throughput=100)
+    assert policy.fits(candidate, bitrate=0, size=0, throughput=0)  # unknown
+
+    history = ThroughputHistory(tmp_path / 'throughput.json')
+    assert history.get('https://here/1.ts') == 0
+
+    history.record('https://here/1.ts', 100)
+    history.record('https://Here/2.ts', 200)
+    history.record('https://there/1.ts', 0)
+    assert history.get('https://here/3.ts') == 150
+    assert history.get('https://there/1.ts') == 0
+
+
+def test_variant_select_advertised(response_mock, tmp_path):
+    dumper = YandexDisk(target_dir=tmp_path, cache_dir=tmp_path / 'cache', deadline=10)
+    ThroughputHistory(tmp_path / 'cache' / 'throughput.json').record('https://here/', 100_000)
+
+    with response_mock([
+        f'GET https://here/master.m3u8 -> 200:{PLAYLIST_MASTER}',
+        f'GET https://here/hi/index.m3u8 -> 200:{PLAYLIST_MEDIA}',
+        f'GET https://here/lo/index.m3u8 -> 200:{PLAYLIST_MEDIA}',
+    ]):
+        # 1080p is 2 MB (25 seconds at 100 KB/s), so no chunks are probed
+        segments, _ = dumper._chunks_get_tracks('https://here/master.m3u8')
+
+    assert [segment.uri for segment in segments] == ['lo/1.ts', 'lo/2.ts']
+    assert 'bytes_probed' not in dumper.metrics.counters
+
+
+def test_variant_select_probed(response_mock, tmp_path):
+    candidates = [
+        VariantCandidate('https://here/hi/index.m3u8', label='1080p'),
+        VariantCandidate('https://here/lo/index.m3u8', label='360p'),
+    ]
+
+    def select(deadline):
+        dumper = YandexDisk(target_dir=tmp_path, deadline=deadline)
+        return dumper._variant_select(candidates), dumper.metrics.counters
+
+    with response_mock([
+        f'GET https://here/hi/index.m3u8 -> 200:{PLAYLIST_MEDIA}',
+        'GET https://here/hi/1.ts -> 200:' + 'x' * 1000,
+        'GET https://here/hi/2.ts -> 200:' + 'x' * 1000,
+    ]):
+        variant, counters = select(3600)
+        assert variant is candidates[0]
+        assert counters['bytes_probed'] == 2000
+
+        variant, _ = select(0.000001)
+        assert variant is candidates[1]  # switched down without probing 360p
+
+
+def test_variant_select_bitrate_max(response_mock, tmp_path):
+    dumper = YandexDisk(target_dir=tmp_path, bitrate_max=1_000_000)
+
+    with response_mock([
+        f'GET https://here/master.m3u8 -> 200:{PLAYLIST_MASTER}',
+        f'GET https://here/hi/index.m3u8 -> 200:{PLAYLIST_MEDIA}',
+        f'GET https://here/lo/index.m3u8 -> 200:{PLAYLIST_MEDIA}',
+    ]):
+        # bitrate is advertised, and throughput is not needed with no deadline
+        segments, _ = dumper._chunks_get_tracks('https://here/master.m3u8')
+
+    assert [segment.uri for segment in segments] == ['lo/1.ts', 'lo/2.ts']
+    assert 'bytes_probed' not in dumper.metrics.counters
+
+
+def test_variant_probe_limited(response_mock, tmp_path):
+    slots = []
+
+    class Limits(RequestLimits):
+
+        def acquire(self, url):
+            slots.append(url)
+            super().acquire(url)
+
+    dumper = YandexDisk(target_dir=tmp_path, limits=Limits(total=1))
+
+    with response_mock([
+        'GET https://here/hi/1.ts -> 200:' + 'x' * 1000,
+        'GET https://here/hi/2.ts -> 200:' + 'x' * 1000,
+    ]):
+        size, duration, _ = dumper._variant_probe('https://here/hi', parse_playlist(PLAYLIST_MEDIA).segments)
+
+    assert (size, duration) == (2000, 20)
+    assert sorted(slots) == ['https://here/hi/1.ts', 'https://here/hi/2.ts']
+    assert dumper.metrics.counters['requests'] == 2
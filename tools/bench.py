@@ -0,0 +1,275 @@
+"""Offline download benchmark against a local synthetic HLS server.
+
+Serves generated webinar.ru and Yandex.Disk shaped manifests and playlists,
+runs dumpers end to end with external commands (ffmpeg) stubbed
+and reports throughput, peak memory and time per phase.
+
+    python tools/bench.py --dumper webinarru yadisk --engine thread async --segments 1000 --size 262144
+
+Each run is made in a separate process for peak RSS to be comparable.
+
+"""
+import argparse
+import json
+import logging
+import random
+import resource
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import perf_counter, sleep
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from webinardump import utils
+from webinardump.dumpers import Dumper, WebinarRu, YandexDisk
+from webinardump.dumpers import base as dumpers_base
+
+DUMPERS = {
+    'webinarru': WebinarRu,
+    'yadisk': YandexDisk,
+}
+
+PHASES = {
+    '_chunks_get_segments': 'playlist',
+    '_chunks_download': 'download',
+    '_video_concat': 'concat',
+    '_video_stream': 'download+concat',
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Synthetic HLS server.
+
+    * /i/video - Yandex.Disk page with a manifest
+    * /api/eventsessions/.../isviewable - webinar.ru manifest
+    * /yadisk/master.m3u8 -> /yadisk/720p/index.m3u8 - Yandex.Disk like playlists
+    * /webinarru/chunklist.m3u8 - webinar.ru like playlist
+    * /<any>/<n>.ts - segments
+
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, data: bytes, *, status: int = 200, content_type: str = 'application/octet-stream'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', f'{len(data)}')
+        self.end_headers()
+
+        bandwidth = self.server.opts.bandwidth
+
+        if not bandwidth:
+            self.wfile.write(data)
+            return
+
+        # per connection bandwidth cap
+        step = max(bandwidth // 20, 1)
+        for pos in range(0, len(data), step):
+            self.wfile.write(data[pos:pos + step])
+            sleep(step / bandwidth)
+
+    def get_playlist(self, *, suffix: str) -> bytes:
+        opts = self.server.opts
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{opts.duration}']
+        for idx in range(1, opts.segments + 1):
+            lines.extend([f'#EXTINF:{opts.duration:.3f},', f'{idx}.ts{suffix}'])
+        lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines).encode()
+
+    def do_GET(self):
+        opts = self.server.opts
+        path = urlsplit(self.path).path
+        base = f'http://{self.headers["Host"]}'
+
+        if path.endswith('.ts'):
+            sleep(opts.latency)
+
+            if random.random() < opts.errors:
+                self.respond(b'error', status=opts.error_status)
+                return
+
+            self.respond(self.server.payload)
+
+        elif path == '/i/video':
+            manifest = {'resources': {'a': {'name': 'bench', 'videoStreams': {'videos': [
+                {'dimension': 'adaptive', 'url': f'{base}/yadisk/master.m3u8'},
+                {'dimension': '720p', 'url': f'{base}/yadisk/master.m3u8'},
+            ]}}}}
+            page = f'<html><script id="store-prefetch">{json.dumps(manifest)}</script></html>'
+            self.respond(page.encode(), content_type='text/html')
+
+        elif path.endswith('/isviewable'):
+            self.respond(b'{"name": "bench"}', content_type='application/json')
+
+        elif path == '/yadisk/master.m3u8':
+            self.respond(
+                b'#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=2000000,RESOLUTION=1280x720\n720p/index.m3u8\n',
+                content_type='application/vnd.apple.mpegurl',
+            )
+
+        elif path.endswith('.m3u8'):
+            suffix = '?session=bench' if path.startswith('/webinarru') else ''
+            self.respond(self.get_playlist(suffix=suffix), content_type='application/vnd.apple.mpegurl')
+
+        else:
+            self.respond(b'not found', status=404)
+
+
+class RedirectAdapter(HTTPAdapter):
+    """Sends requests for any host to the local server."""
+
+    def __init__(self, *args, netloc: str, **kwargs):
+        self.netloc = netloc
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = urlsplit(request.url)._replace(scheme='http', netloc=self.netloc).geturl()
+        return super().send(request, **kwargs)
+
+
+@contextmanager
+def serve(opts):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.request_queue_size = 1024
+    server.daemon_threads = True
+    server.opts = opts
+    server.payload = bytes(opts.size)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        yield f'127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+
+
+def stub_commands():
+    """Replaces external commands with stubs creating empty output."""
+
+    def check_call(cmd, *, cwd, **kwargs):
+        if 'ffmpeg' in cmd:
+            (Path(cwd) / 'all_chunks.mp4').write_bytes(b'')
+
+    @contextmanager
+    def call_piped(cmd, *, path):
+        with (path / 'all_chunks.mp4').open('wb') as f:
+            yield f
+
+    utils.check_call = check_call
+    dumpers_base.call_piped = call_piped
+
+
+def time_phases(timings: dict[str, float]):
+    """Wraps dumper methods to measure time per phase."""
+
+    def wrap(func, phase):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[phase] = timings.get(phase, 0) + perf_counter() - started
+        return wrapper
+
+    for name, phase in PHASES.items():
+        setattr(Dumper, name, wrap(getattr(Dumper, name), phase))
+
+
+def run(*, dumper_alias: str, engine: str, netloc: str, opts) -> dict:
+    logging.basicConfig(level=logging.ERROR)
+    stub_commands()
+
+    timings = {}
+    time_phases(timings)
+
+    get_session = Dumper._get_session
+
+    def get_session_local(self, **kwargs):
+        session = get_session(self, **kwargs)
+        session.mount('https://', RedirectAdapter(netloc=netloc, pool_maxsize=kwargs.get('pool_size', 10)))
+        return session
+
+    Dumper._get_session = get_session_local
+
+    params = {
+        'webinarru': {
+            'url_video': 'https://events.webinar.ru/xxx/yyy/record-new/aaa/bbb',
+            'url_playlist': f'http://{netloc}/webinarru/chunklist.m3u8',
+        },
+        'yadisk': {
+            'url_video': f'http://{netloc}/i/video',
+        },
+    }[dumper_alias]
+
+    with TemporaryDirectory() as tmp:
+        dumper = DUMPERS[dumper_alias](
+            target_dir=Path(tmp),
+            concurrent=opts.rmax,
+            engine=engine,
+            pipelined=opts.pipelined,
+            adaptive=opts.adaptive,
+        )
+        started = perf_counter()
+        dumper.run(params)
+        took = perf_counter() - started
+
+    megabytes = opts.segments * opts.size / 1024 / 1024
+
+    return {
+        'dumper': dumper_alias,
+        'engine': engine,
+        'seconds': round(took, 3),
+        'segments_per_s': round(opts.segments / took, 1),
+        'mb_per_s': round(megabytes / took, 1),
+        'rss_peak_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'phases': {phase: round(val, 3) for phase, val in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dumper', nargs='+', choices=list(DUMPERS), default=list(DUMPERS))
+    parser.add_argument('--engine', nargs='+', choices=Dumper.engines, default=['thread'])
+    parser.add_argument('--segments', type=int, default=500, help='Segments number')
+    parser.add_argument('--size', type=int, default=128 * 1024, help='Segment size in bytes')
+    parser.add_argument('--duration', type=int, default=2, help='Segment duration in seconds')
+    parser.add_argument('--latency', type=float, default=0.01, help='Segment response latency in seconds')
+    parser.add_argument('--bandwidth', type=int, default=0, help='Bandwidth cap per connection, bytes/s')
+    parser.add_argument('--errors', type=float, default=0.0, help='Fraction of segment requests to fail')
+    parser.add_argument('--error-status', type=int, default=500, help='HTTP status for failed requests')
+    parser.add_argument('--rmax', type=int, default=10, help='Max concurrent requests number')
+    parser.add_argument('--pipelined', action='store_true')
+    parser.add_argument('--adaptive', action='store_true')
+    parser.add_argument('--json', action='store_true', help='Output results as JSON lines')
+    opts = parser.parse_args()
+
+    with serve(opts) as netloc:
+        for dumper_alias in opts.dumper:
+            for engine in opts.engine:
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    result = executor.submit(
+                        run, dumper_alias=dumper_alias, engine=engine, netloc=netloc, opts=opts
+                    ).result()
+
+                if opts.json:
+                    print(json.dumps(result))
+                    continue
+
+                phases = ' '.join(f'{phase}={val}s' for phase, val in result['phases'].items())
+                print(
+                    f'{result["dumper"]:>10} {result["engine"]:>7} {result["seconds"]:>8.2f}s '
+                    f'{result["segments_per_s"]:>8.1f} seg/s {result["mb_per_s"]:>7.1f} MB/s '
+                    f'rss {result["rss_peak_mb"]:>6.1f} MB  {phases}'
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Micro-benchmark of JS objects extraction from a Yandex.Disk share page.
+
+The page from `yadisk_shared_page.html` fixture is padded with inline scripts
+to resemble a real one (megabytes of JS) and objects are extracted
+both by scanning script tags and by parsing the whole document.
+
+    python tools/bench_extract.py --size 4194304 --repeat 5
+
+"""
+import argparse
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+from webinardump.dumpers import YandexDisk
+
+FIXTURE = Path(__file__).parent.parent / 'tests' / 'datafixtures' / 'yadisk_shared_page.html'
+
+
+def make_page(size: int) -> str:
+    page = FIXTURE.read_text()
+    script = '<script>window.x = function() { return {"a": [1, 2, 3], "b": "<div>text</div>"}; };</script>\n'
+    # real pages have the object after a lot of scripts and markup
+    filler = (f'<div class="item"><span>{"x" * 50}</span></div>\n' + script) * (size // (len(script) + 80))
+    return page.replace('<body>', f'<body>\n{filler}', 1)
+
+
+def measure(func, *, repeat: int) -> tuple[float, float]:
+    """Returns best time (seconds) and peak memory (MiB) of a call."""
+    times = []
+
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        times.append(perf_counter() - started)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(times), peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=4 * 1024 * 1024, help='Page size in bytes')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    contents = make_page(args.size)
+    dumper = YandexDisk(target_dir=Path())
+
+    methods = {
+        'scan': lambda: dumper._extract_js_objects_scan(contents, key='environment', first=True),
+        'soup': lambda: dumper._extract_js_objects_soup(contents, key='environment'),
+    }
+
+    assert methods['scan']() == methods['soup']()
+
+    print(f'Page: {round(len(contents) / 1024 / 1024, 1)} MiB')
+
+    for name, func in methods.items():
+        seconds, memory = measure(func, repeat=args.repeat)
+        print(f'{name:<6} {seconds * 1000:10.1f} ms {memory:10.1f} MiB peak')
+
+
+if __name__ == '__main__':
+    main()